@@ -0,0 +1,42 @@
+# Loads the images used by the platformer, the level builder and circle_game.
+# Each image is loaded from the disk and converted to the screen's pixel format once, so blits never have to convert pixels, and every size it is drawn at is scaled once and kept.
+# The programs each add this folder to sys.path to import it.
+
+import os
+import pygame
+
+
+class AssetCache:
+	def __init__(self):
+		self.images = {} # Maps the absolute path of each image to the image
+		self.converted = set() # The paths of the images that have been converted to the screen's pixel format. Images loaded before the window opens can't be converted yet
+		self.scaled_images = {} # Maps (absolute path, (width, height)) to the converted image scaled to that size
+
+		# Counters for checking how well the cache is working
+		self.loads = 0 # Images read from the disk
+		self.scales = 0 # Images scaled to a new size
+
+	# Returns the image at a path, relative to the current folder
+	def image(self, path):
+		path = os.path.abspath(path)
+		image = self.images.get(path)
+		if image is None:
+			image = self.images[path] = pygame.image.load(path)
+			self.loads += 1
+		if path not in self.converted and pygame.display.get_surface() is not None:
+			image = image.convert_alpha() if image.get_flags() & pygame.SRCALPHA or image.get_colorkey() is not None else image.convert()
+			self.images[path] = image
+			self.converted.add(path)
+		return image
+
+	# Returns the image at a path scaled to a size. Sizes are rounded to whole pixels, so that sizes that only differ by a fraction of a pixel share one image
+	def scaled(self, path, size):
+		size = (round(size[0]), round(size[1]))
+		key = (os.path.abspath(path), size)
+		image = self.scaled_images.get(key)
+		if image is None:
+			image = pygame.transform.scale(self.image(path), size) # Scaling keeps the pixel format, so a converted image stays converted
+			self.scales += 1
+			if key[0] in self.converted: # Until the window opens, scaled images aren't kept, so they can be scaled again from the converted image later
+				self.scaled_images[key] = image
+		return image
@@ -0,0 +1,314 @@
+# Measures how circle_game's simulation scales with the number of circles and the game mode, phase by phase.
+# Usage: python benchmark.py [--counts 0 100 500] [--modes 0 1 2 3 4] [--ticks 600] [--no-draw] [--sprites] [--dirty-rects] [--list] [--separation] [--collisions] [--spectate] [--startup] [--text] [--output results.json]
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+import socket
+import time
+import types
+import headless
+import spatial_hash
+import spectate
+game = headless.game
+
+STARTUP_BUDGET = 1.0 # --startup fails if starting the game up to its first drawn frame takes longer than this many seconds
+STARTUP_SCRIPT = """
+import json, time
+import circle_game as game
+game.open_window()
+start = time.perf_counter()
+game.draw_start_screen()
+game.record_startup("start screen", start)
+game.STARTUP_TIMES["total"] = time.perf_counter() - game.START_TIME
+print(json.dumps(game.STARTUP_TIMES))
+""" # Starts the game up to the start screen and prints the startup times
+
+
+# Runs one headless game per (game mode, circle count) pair and returns the results as a list of dictionaries
+def sweep(modes, counts, ticks, draw = True):
+	results = []
+	for mode_index in modes:
+		for count in counts:
+			result = headless.run(game.GAME_MODES[mode_index], max_ticks = ticks, draw = draw, min_circles = count, invincible = True) # Keeps the game running for every tick
+			result["circles"] = count
+			results.append(result)
+	return results
+
+# Prints the milliseconds spent in each phase per tick as a table
+def report(results):
+	print(f"{'mode':>4} {'circles':>7} {'avg':>7} {'ticks/s':>9} {'spawn':>8} {'move':>8} {'collide':>8} {'draw':>8}")
+	for result in results:
+		per_tick = {phase: 1000*seconds/result["ticks"] for phase, seconds in result["phases"].items()}
+		print(f"{result['game_mode']:>4} {result['circles']:>7} {result['average_circles']:>7.0f} {result['ticks_per_second']:>9.0f} {per_tick['spawn']:>8.4f} {per_tick['move']:>8.4f} {per_tick['collide']:>8.4f} {per_tick['draw']:>8.4f}")
+
+
+# Returns every overlapping pair by comparing every circle with every other circle, for checking the spatial hash against
+def brute_force_overlaps(xs, ys, radii):
+	overlaps = set()
+	for i in range(len(xs)):
+		for j in range(i + 1, len(xs)):
+			if (xs[j] - xs[i])**2 + (ys[j] - ys[i])**2 < (radii[i] + radii[j])**2:
+				overlaps.add((i, j))
+	return overlaps
+
+# Returns every overlapping pair using the spatial hash to find the candidates
+def hashed_overlaps(xs, ys, radii):
+	grid = spatial_hash.SpatialHash(game.CELL_SIZE)
+	grid.rebuild(xs, ys)
+	overlaps = set()
+	for i, j in grid.pairs():
+		if (xs[j] - xs[i])**2 + (ys[j] - ys[i])**2 < (radii[i] + radii[j])**2:
+			overlaps.add((min(i, j), max(i, j)))
+	return overlaps
+
+# Returns every overlapping pair using the NumPy grid, the way the Swarm finds them
+def grid_overlaps(xs, ys, radii):
+	x, y, radius = spatial_hash.np.array(xs), spatial_hash.np.array(ys), spatial_hash.np.array(radii)
+	i, j = spatial_hash.grid_pairs(x, y, game.CELL_SIZE)
+	touching = (x[j] - x[i])**2 + (y[j] - y[i])**2 < (radius[i] + radius[j])**2
+	return set(zip(spatial_hash.np.minimum(i, j)[touching].tolist(), spatial_hash.np.maximum(i, j)[touching].tolist()))
+
+# Pushes the same circles apart once with the list of Circle objects and once with the Swarm. Returns the number of circles that ended up in different places
+def separation_differences(xs, ys, radii):
+	vectorized = game.VECTORIZED
+	game.VECTORIZED = False
+	circles = [types.SimpleNamespace(x = x, y = y, radius = radius) for x, y, radius in zip(xs, ys, radii)] # separate_circles() only reads and moves these three
+	game.separate_circles(circles)
+	game.VECTORIZED = vectorized
+
+	count = len(xs)
+	circle_swarm = game.swarm.Swarm(game.WIDTH, game.HEIGHT, game.SPEED_RANGE, game.LIFE_LENGTH, max(count, 1))
+	circle_swarm.x[:count], circle_swarm.y[:count], circle_swarm.radius[:count] = xs, ys, radii
+	circle_swarm.count = count
+	circle_swarm.separate(game.CELL_SIZE)
+	return sum(circle.x != x or circle.y != y for circle, x, y in zip(circles, circle_swarm.x[:count].tolist(), circle_swarm.y[:count].tolist()))
+
+# Times finding the overlapping pairs among randomly placed circles with brute force and with the spatial hash, checking that they agree,
+# and checks that one push apart moves every circle to exactly the same place with the list of Circle objects and with the Swarm. Returns the number of counts where something disagreed
+def separation_sweep(counts):
+	failures = 0
+	print(f"{'circles':>7} {'overlaps':>8} {'brute ms':>9} {'hash ms':>9} {'grid ms':>9} {'pushed apart':>12}")
+	for count in counts:
+		xs = [random.uniform(0, game.WIDTH) for _ in range(count)]
+		ys = [random.uniform(0, game.HEIGHT) for _ in range(count)]
+		radii = [random.randint(game.MOUSE_RADIUS - game.CIRCLE_RADIUS_LIMIT, game.MOUSE_RADIUS + game.CIRCLE_RADIUS_LIMIT) for _ in range(count)]
+		timings = []
+		for find_overlaps in (brute_force_overlaps, hashed_overlaps, grid_overlaps if spatial_hash.np is not None else None):
+			if find_overlaps is None:
+				timings.append((float("nan"), None))
+				continue
+			start = perf_counter()
+			overlaps = find_overlaps(xs, ys, radii)
+			timings.append((1000*(perf_counter() - start), overlaps))
+		disagreed = False
+		for _, overlaps in timings[1:]:
+			if overlaps is not None and overlaps != timings[0][1]:
+				print(f"The spatial hash disagrees with brute force for {count} circles")
+				disagreed = True
+		if spatial_hash.np is not None:
+			differences = separation_differences(xs, ys, radii)
+			pushed = "the same" if not differences else f"{differences} differ"
+			disagreed = disagreed or differences > 0
+		else:
+			pushed = "no NumPy"
+		failures += disagreed
+		print(f"{count:>7} {len(timings[0][1]):>8} {timings[0][0]:>9.2f} {timings[1][0]:>9.2f} {timings[2][0]:>9.2f} {pushed:>12}")
+	return failures
+
+# Plays the same games with the list of Circle objects, checking collisions against every circle every tick and with the collision schedule,
+# with the mouse going round at a steady speed and with it speeding up gradually, for each seed, and times both. That the two pop the same circles is checked by test_simulation.py.
+# Afterwards, prints the circle counts where the schedule stops (or starts) being faster than brute force on each path
+def collision_sweep(mode_index, counts, ticks, seeds = (0, 1, 2)):
+	vectorized, scheduled = game.VECTORIZED, game.SCHEDULED_COLLISIONS
+	game.VECTORIZED = False
+	crossovers = []
+	print(f"{'path':>12} {'seed':>4} {'circles':>7} {'brute checks':>12} {'scheduled':>9} {'ratio':>6} {'resets':>6} {'brute ms':>9} {'sched ms':>9}")
+	for path_name, path in (("orbit", headless.orbit_path), ("accelerating", headless.accelerating_path)):
+		timings = {count: [] for count in counts} # The brute force and scheduled collide milliseconds and checks per tick of each seed, for each count
+		for seed in seeds:
+			for count in counts:
+				timings[count].append(collision_game(mode_index, count, ticks, path_name, path(), seed))
+		crossovers.append(schedule_crossover(path_name, timings))
+	game.VECTORIZED, game.SCHEDULED_COLLISIONS = vectorized, scheduled
+	for line in crossovers:
+		print(line)
+
+# Describes where the schedule pays off on one path of collision_sweep(), from the median brute force and scheduled times of each circle count.
+# A scheduled check costs more than a brute force one, so the schedule only pays off while it checks less than the share of circles where the two cost the same
+def schedule_crossover(path_name, timings):
+	counts = sorted(timings)
+	faster = {count: statistics.median(timing[1] for timing in timings[count]) < statistics.median(timing[0] for timing in timings[count]) for count in counts}
+	changes = [(count, faster[count]) for previous, count in zip(counts, counts[1:]) if faster[count] != faster[previous]]
+	if not changes:
+		line = f"{path_name}: the schedule is {'faster' if faster[counts[0]] else 'slower'} than brute force at every count from {counts[0]} to {counts[-1]} circles"
+	else:
+		line = f"{path_name}: the schedule " + ", then ".join(f"{'starts' if now_faster else 'stops'} paying off at {count} circles" for count, now_faster in changes)
+
+	largest = [timing for timing in timings[counts[-1]] if timing[0] and timing[1] and timing[2] and timing[3]] # The cost of a check is steadiest with the most circles
+	if largest:
+		cost = statistics.median((scheduled_ms/scheduled_checks)/(brute_ms/brute_checks) for brute_ms, scheduled_ms, brute_checks, scheduled_checks in largest)
+		checked = statistics.median(scheduled_checks/brute_checks for _, _, brute_checks, scheduled_checks in largest)
+		line += f". At {counts[-1]} circles a scheduled check costs {cost:.1f} times a brute force one, so the schedule only pays off below {1/cost:.0%} of circles checked, and it checked {checked:.0%}"
+	return line
+
+# Plays one game of collision_sweep() with brute force and with the collision schedule and prints how they compare.
+# Returns the milliseconds per tick each spent colliding and the checks per tick each made
+def collision_game(mode_index, count, ticks, path_name, path, seed):
+	results = []
+	for game.SCHEDULED_COLLISIONS in (False, True):
+		circle_counts = []
+		result = headless.run(game.GAME_MODES[mode_index], path = path, max_ticks = ticks, draw = False, min_circles = count, invincible = True, seed = seed, counts = circle_counts)
+		result["checks"] = game.SCHEDULE.checks if game.SCHEDULE is not None else sum(circle_counts) # Brute force checks every circle left after moving, which is close to the count after colliding
+		result["resets"] = game.SCHEDULE.resets if game.SCHEDULE is not None else 0
+		results.append(result)
+	brute, scheduled_result = results
+	brute_checks, scheduled_checks = brute["checks"]/brute["ticks"], scheduled_result["checks"]/scheduled_result["ticks"]
+	brute_ms, scheduled_ms = 1000*brute["phases"]["collide"]/brute["ticks"], 1000*scheduled_result["phases"]["collide"]/scheduled_result["ticks"]
+	print(f"{path_name:>12} {seed:>4} {count:>7} {brute_checks:>12.1f} {scheduled_checks:>9.1f} {scheduled_checks/brute_checks if brute_checks else 0:>6.1%} {scheduled_result['resets']:>6} {brute_ms:>9.4f} {scheduled_ms:>9.4f}")
+	return brute_ms, scheduled_ms, brute_checks, scheduled_checks
+
+# Encodes every tick of a game for spectators, decodes it again and checks the spectator sees exactly the circles that were sent.
+# Prints the encode and decode time and the bytes per tick of deltas and keyframes
+def spectate_benchmark(mode_index, counts, ticks):
+	print(f"{'circles':>7} {'encode us':>9} {'decode us':>9} {'delta B':>8} {'keyframe B':>10} {'B/circle':>8} {'keyframes':>9}")
+	for count in counts:
+		encoder, state = spectate.SnapshotEncoder(), spectate.SpectatorState()
+		totals = {"encode": 0, "decode": 0, "delta_bytes": 0, "deltas": 0, "keyframe_bytes": 0, "keyframes": 0, "circles": 0, "mismatches": 0}
+
+		def observe(tick, mouse, circles):
+			start = perf_counter()
+			message = encoder.encode(tick, mouse, circles, game.WIDTH, game.HEIGHT, tick % spectate.KEYFRAME_TICKS == 1)
+			totals["encode"] += perf_counter() - start
+			kind = "keyframe" if message[0:1] == spectate.KEYFRAME else "delta"
+			totals[kind + "_bytes"] += len(message)
+			totals[kind + "s"] += 1
+			totals["circles"] += len(circles)
+
+			start = perf_counter()
+			state.feed(bytearray(message))
+			totals["decode"] += perf_counter() - start
+			_, xs, ys, radii, colors = spectate.circle_columns(circles)
+			if (list(state.xs), list(state.ys), list(state.radii), bytes(state.colors)) != (xs, ys, radii, colors):
+				totals["mismatches"] += 1
+
+		result = headless.run(game.GAME_MODES[mode_index], max_ticks = ticks, draw = False, min_circles = count, invincible = True, observe = observe)
+		if totals["mismatches"]:
+			print(f"The spectator saw different circles to the game on {totals['mismatches']} ticks with {count} circles")
+		deltas, keyframes = max(totals["deltas"], 1), max(totals["keyframes"], 1)
+		print(f"{count:>7} {1000000*totals['encode']/result['ticks']:>9.1f} {1000000*totals['decode']/result['ticks']:>9.1f} {totals['delta_bytes']/deltas:>8.0f} {totals['keyframe_bytes']/keyframes:>10.0f} {(totals['delta_bytes'] + totals['keyframe_bytes'])/max(totals['circles'], 1):>8.2f} {totals['keyframes']:>9}")
+
+# Plays a game through a real SpectatorServer on a loopback socket and checks the spectator ends up with the game's last tick
+def spectate_loopback(mode_index, ticks):
+	server = spectate.SpectatorServer("127.0.0.1:0")
+	viewer = socket.create_connection(server.address)
+	while not server.watched: # Wait for the server's thread to accept the spectator
+		time.sleep(0.01)
+	last = {}
+
+	def observe(tick, mouse, circles):
+		server.broadcast(tick, mouse, circles, game.WIDTH, game.HEIGHT)
+		last["tick"], last["columns"] = tick, spectate.circle_columns(circles)[1:]
+	headless.run(game.GAME_MODES[mode_index], max_ticks = ticks, draw = False, min_circles = 100, invincible = True, observe = observe)
+
+	state = spectate.SpectatorState()
+	buffer = bytearray()
+	viewer.settimeout(1)
+	while state.tick != last["tick"]:
+		try:
+			data = viewer.recv(1 << 16)
+		except socket.timeout:
+			break
+		buffer += data
+		state.feed(buffer)
+	viewer.close()
+	server.close()
+	matches = state.tick == last["tick"] and (list(state.xs), list(state.ys), list(state.radii), bytes(state.colors)) == last["columns"]
+	print(f"Loopback spectator {'matches' if matches else 'does not match'} the game after {last['tick']} ticks")
+	return matches
+
+# Starts the game in a fresh Python process the given number of times and prints the median time of each startup phase.
+# Returns False if the median total is over the budget
+def startup_benchmark(runs, budget):
+	environment = dict(os.environ, SDL_VIDEODRIVER = "dummy", PYGAME_HIDE_SUPPORT_PROMPT = "1")
+	timings = []
+	for _ in range(runs):
+		output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], env = environment, capture_output = True, text = True, check = True).stdout
+		timings.append(json.loads(output.splitlines()[-1]))
+	for phase in timings[0]:
+		print(f"{phase:<13}{1000*statistics.median(timing[phase] for timing in timings):8.1f} ms")
+	total = statistics.median(timing["total"] for timing in timings)
+	if total > budget:
+		print(f"Starting up took {total:.3f} s, which is over the budget of {budget} s")
+		return False
+	return True
+
+# Times drawing the "Time survived" text for a run of frames with the font every frame (the old way) and with the text cache
+def text_benchmark(frames):
+	cache = game.text_cache.TextCache(game.FONT, game.TEXT_COLOR)
+	start = perf_counter()
+	for timer in range(1, frames + 1):
+		game.WIN.blit(game.FONT.render(f"Time survived:  {round(timer/60, 1)} s", 1, game.TEXT_COLOR), (10, 10))
+	font_time = perf_counter() - start
+
+	start = perf_counter()
+	for timer in range(1, frames + 1):
+		cache.draw(game.WIN, (10, 10), "Time survived:  ", round(timer/60, 1), " s")
+	cache_time = perf_counter() - start
+
+	print(f"Font every frame: {1000000*font_time/frames:.1f} us per frame")
+	print(f"Text cache:       {1000000*cache_time/frames:.1f} us per frame ({cache.misses} strings rendered with the font)")
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Benchmark the circle_game simulation")
+	parser.add_argument("--counts", type = int, nargs = "+", default = [0, 100, 500, 1000, 2000], help = "circle counts to keep onscreen")
+	parser.add_argument("--modes", type = int, nargs = "+", default = [0, 1, 2, 3, 4], help = "game modes to run (0 is easy, 3 is hardcore, 4 is crowded)")
+	parser.add_argument("--ticks", type = int, default = 600, help = "ticks to run for each combination")
+	parser.add_argument("--no-draw", action = "store_true", help = "skip the draw phase")
+	parser.add_argument("--dirty-rects", action = "store_true", help = "draw with the dirty rectangle renderer")
+	parser.add_argument("--list", action = "store_true", help = "store circles in a list of Circle objects even if NumPy is installed")
+	parser.add_argument("--sprites", action = "store_true", help = "draw the circles from the sprite cache instead of with pygame.draw.circle")
+	parser.add_argument("--separation", action = "store_true", help = "compare the spatial hash against brute force, and pushing circles apart with the list against the swarm, instead of running games")
+	parser.add_argument("--collisions", action = "store_true", help = "compare the collision schedule against checking every circle every tick, in the first of --modes, instead of running games")
+	parser.add_argument("--spectate", action = "store_true", help = "time encoding every tick for spectators and check a spectator over a loopback socket, in the first of --modes, instead of running games")
+	parser.add_argument("--startup", action = "store_true", help = "time starting the game in new processes and check it against --budget, instead of running games")
+	parser.add_argument("--runs", type = int, default = 5, help = "how many times --startup starts the game")
+	parser.add_argument("--budget", type = float, default = STARTUP_BUDGET, help = "the most seconds --startup may take")
+	parser.add_argument("--text", action = "store_true", help = "compare drawing the timer text with and without the text cache instead of running games")
+	parser.add_argument("--output", help = "also write the results to this JSON file")
+	args = parser.parse_args()
+	if args.list:
+		game.VECTORIZED = False
+	game.DIRTY_RECTS = args.dirty_rects
+	if args.sprites:
+		game.SPRITES = game.sprite_cache.SpriteCache()
+
+	if args.separation:
+		raise SystemExit(1 if separation_sweep(args.counts) else 0)
+	if args.collisions:
+		collision_sweep(args.modes[0], args.counts, args.ticks)
+		raise SystemExit
+	if args.spectate:
+		spectate_benchmark(args.modes[0], args.counts, args.ticks)
+		raise SystemExit(0 if spectate_loopback(args.modes[0], args.ticks) else 1)
+	if args.startup:
+		raise SystemExit(0 if startup_benchmark(args.runs, args.budget) else 1)
+	if args.text:
+		text_benchmark(args.ticks)
+		raise SystemExit
+
+	print(f"Storage: {'NumPy swarm' if game.VECTORIZED else 'list of Circle objects'}, renderer: {'dirty rectangles' if game.DIRTY_RECTS else 'full screen'}, screen {game.WIDTH}x{game.HEIGHT}")
+	results = sweep(args.modes, args.counts, args.ticks, not args.no_draw)
+	report(results)
+	if game.SPRITES is not None:
+		stats = game.SPRITES.stats()
+		print(f"Sprite cache: {stats['sprites']} sprites, {stats['hit_rate']:.1%} hit rate, {stats['evictions']} evictions, {stats['bytes']/1024:.0f} KiB")
+	if args.output:
+		with open(args.output, "w") as output_file:
+			json.dump(results, output_file, indent = 1)
@@ -1,18 +1,75 @@
 # Setup and settings
 
+import time
+START_TIME = time.perf_counter() # When the game started loading, for the startup timing breakdown
 import pygame
 import os
-from random import randint, random
+import random
 import math
+import itertools
+import json
+import argparse
+import atexit
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # The asset module is shared with the platformer, so it lives in the folder above
+import assets
+import swarm
+import spatial_hash
+import sprite_cache
+import text_cache
+import replay
+import profiler
+import collision_schedule
+import score_store
+import telemetry
+import spectate
 os.chdir(os.path.dirname(os.path.abspath(__file__))) # Allows referencing other files within the same folder without specifying the exact path to the file
-pygame.init() # Initiates pygame
+
+STARTUP_TIMES = {} # The seconds spent in each phase of starting the game. Print them with the --startup-times command line option
+
+# Records how long a startup phase took, given the time it started at
+def record_startup(phase, start):
+	STARTUP_TIMES[phase] = time.perf_counter() - start
+
+record_startup("imports", START_TIME)
+
+phase_start = time.perf_counter()
+pygame.display.init() # Only the parts of pygame the game uses are started. pygame.init() would also start the sound system, which can take longer than everything else put together
 pygame.font.init() # Initiates the library that allows the code to render text
+record_startup("pygame init", phase_start)
 
-SCREEN_INFO = pygame.display.Info()
-WIN = pygame.display.set_mode((0, 0), pygame.FULLSCREEN) # Creates the window the game runs in
-WIDTH, HEIGHT = WIN.get_width(), WIN.get_height() # Gets the width and height of the window in pixels
+WIN = None # The window the game runs in. Created by open_window()
+WIDTH, HEIGHT = 0, 0 # The width and height of the window in pixels. Set by open_window()
 TITLE = "Circle Game"
-pygame.display.set_caption(TITLE)
+
+# Creates the window. This isn't done on import, so that tools can import the game without opening a window until they need one
+def open_window():
+	global WIN, WIDTH, HEIGHT
+	start = time.perf_counter()
+	WIN = pygame.display.set_mode((0, 0), pygame.FULLSCREEN) # Creates the window the game runs in
+	WIDTH, HEIGHT = WIN.get_width(), WIN.get_height() # Gets the width and height of the window in pixels
+	pygame.display.set_caption(TITLE)
+	pygame.event.set_blocked(pygame.MOUSEMOTION) # The cursor is read with pygame.mouse.get_pos(), so motion events would only wake the menus up for nothing
+	record_startup("window", start)
+
+FONT_CACHE = "font_cache.json" # Remembers which file each system font is in, since searching the system fonts is the slowest part of starting on some machines
+
+# Loads a system font the same way as pygame.font.SysFont(), but looks its file up in FONT_CACHE instead of searching every font on the system each time
+def load_font(name, size):
+	try:
+		with open(FONT_CACHE) as cache_file:
+			paths = json.load(cache_file)
+	except (OSError, ValueError):
+		paths = {}
+
+	if name not in paths or (paths[name] and not os.path.exists(paths[name])): # Search again if the font has never been looked up or its file has gone
+		paths[name] = pygame.font.match_font(name) or "" # An empty path means the font isn't installed, so pygame's default font is used like SysFont() would
+		try:
+			with open(FONT_CACHE, "w") as cache_file:
+				json.dump(paths, cache_file)
+		except OSError:
+			pass # The game still works from a read-only folder, it just searches the fonts every time
+	return pygame.font.Font(paths[name] or None, size)
 
 BG_COLOR = (0, 0, 0, 230) # Background color. This has four values, but the fourth value (opacity) only applies for surfaces with the pygame.SRCALPHA tag, such as the ending screen
 MOUSE_COLOR = (255, 255, 255) # Mouse color
@@ -24,55 +81,117 @@ SPEED_RANGE = [0, 0] # The range of speeds (in pixels per tick) that a circle ca
 CIRCLE_RADIUS_LIMIT = 5 # A given circles radius is at most this much larger or smaller than the player
 LIFE_LENGTH = 0 # The amount of seconds a given circle will last. Initialized here but will be assigned a value later
 
-FONT = pygame.font.SysFont("futura", 45) # The font and font size used to render text
+phase_start = time.perf_counter()
+FONT = load_font("futura", 45) # The font and font size used to render text
 TEXT_COLOR = (240, 240, 240) # The text color
+TEXT = text_cache.TextCache(FONT, TEXT_COLOR) # Renders each piece of text once and reuses it, so the font isn't used every frame
+record_startup("font", phase_start)
 
-HEART = pygame.transform.scale(pygame.image.load("heart.png"), (45, 45)) # The image used to display heart icons in the top right of the screen
+ASSETS = assets.AssetCache() # Loads and converts the game's images
+HEART = None # The image used to display heart icons in the top right of the screen. Loaded by heart_image() the first time it is needed, so it isn't part of starting the game
 LIVES = 0 # The number of lives the player has. Initialized here but will be assigned a value later
 
 IFRAMES_DURATION = 6 # The number of ticks after taking damage before the player can lose another heart
 
-HIGH_SCORES = [0, 0, 0, 0] # The player's high scores across different game modes. Initialized here but will be assigned a value later
-GAME_MODE = -1 # The game mode that the player is in. (0 is easy, 1 is medium, 2 is hard, and 3 is hardcore.) Initialized here but will be assigned a value later
+HIGH_SCORES = [0, 0, 0, 0, 0] # The player's high scores across different game modes. Initialized here but will be assigned a value later
+SCORES_FOLDER = "scores" # Where every player's scores are saved, relative to the circle_game folder
+STORE = None # Saves finished games and loads the high scores. Set up when the game is run directly, with the player profile from the --player command line option
+GAME_MODE = -1 # The game mode that the player is in. (0 is easy, 1 is medium, 2 is hard, 3 is hardcore, and 4 is crowded.) Initialized here but will be assigned a value later
+
+# The settings of each game mode, in the order SPAWN_CHANCE, LIVES, SPEED_RANGE, LIFE_LENGTH, GAME_MODE
+GAME_MODES = [
+	(2, 6, [1, 3], 20, 0), # Easy
+	(3.5, 6, [2, 4], 30, 1), # Medium
+	(5, 5, [3, 5], 60, 2), # Hard
+	(4, 1, [3, 5.5], 100, 3), # Hardcore
+	(12, 6, [1, 2.5], 45, 4), # Crowded
+]
+
+SPRITES = None # A sprite_cache.SpriteCache to draw the circles from pre-rendered images in one batched blit instead of a pygame.draw.circle call per circle. Turned on with the --sprites command line option
+DIRTY_RECTS = False # Only erase and update the parts of the screen that change each frame instead of the whole screen. Turned on with the --dirty-rects command line option
+
+MODE_KEYS = [pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4, pygame.K_5] # The key that picks each of the GAME_MODES on the start screen
+
+START_SCENE, PLAY_SCENE, END_SCENE = "start", "play", "end" # The screens the game moves between (see run_scenes())
+
+CROWDED_MODE = 4 # In this game mode, circles push each other apart instead of passing through each other
+SCHEDULED_COLLISIONS = True # Only check circles for collisions once they could have reached the mouse (see collision_schedule.py), instead of checking every circle every tick. Only used by the list of Circle objects (with --no-vectorized, or when NumPy isn't installed) outside of the crowded game mode, since pushing circles apart can move them faster than their speed
+SCHEDULE = None # The collision schedule of the current game, if it uses one
+CELL_SIZE = 2*(MOUSE_RADIUS + CIRCLE_RADIUS_LIMIT) # The size of a spatial hash cell. This is the diameter of the largest possible circle, so overlapping circles are always in the same or neighbouring cells
+
+RNG = random.Random() # Every random number in a game comes from this, so that seeding it at the start of a game makes the game reproducible from its seed and mouse path
+RECORD_FOLDER = None # If this is set to a folder, every game is saved there as a replay file. Set with the --record command line option
+SPECTATORS = None # A spectate.SpectatorServer that sends every tick to anyone watching. Started with the --spectate command line option
+TELEMETRY_FOLDER = None # If this is set to a folder, the circle count, spawns, hits and frame time of every tick are saved there (see telemetry.py). Set with the --telemetry command line option
 
+VECTORIZED = swarm.np is not None # Stores the circles in a NumPy-backed Swarm (see swarm.py) instead of a list of Circle objects. Only possible when NumPy is installed. Set with the --vectorized and --no-vectorized command line options
 
+TICK_RATE = 60 # The game simulates this many ticks per second no matter how fast frames are drawn. SPEED_RANGE, LIFE_LENGTH and IFRAMES_DURATION are all measured in these ticks
+FRAME_RATE = 60 # The most frames drawn per second, or 0 to draw as many as possible. Set with the --fps command line option
+MAX_TICKS_PER_FRAME = 5 # If the game falls further behind than this, it slows down instead of freezing the screen to catch up
+
+PROFILER = None # Set to a profiler.FrameProfiler to time each phase of every frame. Turned on with the --profile and --trace command line options
+
+
+
+# Picks the random color, speed and starting position of a new circle. Both the Circle class and the Swarm use this, so the two storage paths spawn identical circles
+def roll_circle(radius):
+	color = (RNG.randint(55, 200), RNG.randint(55, 200), RNG.randint(55, 200)) # Instead of each value ranging from 0-255, these range from 55-200 in order to contrast them against both the mouse and the black background
+	speed = RNG.random()*(SPEED_RANGE[1]-SPEED_RANGE[0]) + SPEED_RANGE[0] # Covers the SPEED_RANGE, but uses RNG.random() instead of RNG.randint() to return a float for more diverse possibilities
+
+	# The following if/else statements pick a position somewhere on the edge of the screen for the circle to spawn, out of view by exactly a radius
+	if RNG.randint(0, 1) == 0:
+		if RNG.randint(0, 1) == 0:
+			x = -radius
+		else:
+			x = WIDTH + radius
+		y = RNG.randint(-radius, HEIGHT + radius)
+	else:
+		if RNG.randint(0, 1) == 0:
+			y = -radius
+		else:
+			y = HEIGHT + radius
+		x = RNG.randint(-radius, WIDTH + radius)
+	return color, speed, x, y
 
 # Definining the enemy class
 class Circle:
+	__slots__ = ("color", "speed", "radius", "birth", "x", "y", "last_x", "last_y", "vx", "vy", "check", "id") # Fixed attributes instead of a per-circle __dict__, which makes circles smaller and faster to create
+
 	def __init__(self, radius, mouse, timer):
-		self.color = (randint(55, 200), randint(55, 200), randint(55, 200)) # Instead of each value ranging from 0-255, these range from 55-200 in order to contrast them against both the mouse and the black background
-		self.speed = random()*(SPEED_RANGE[1]-SPEED_RANGE[0]) + SPEED_RANGE[0] # Covers the SPEED_RANGE, but uses random() instead of randint() to return a float for more diverse possibilities
+		self.reset(radius, mouse, timer)
+
+	# Sets up the circle as a brand new circle. The CirclePool calls this to reuse a circle that was removed instead of creating a new one
+	def reset(self, radius, mouse, timer):
+		self.color, self.speed, self.x, self.y = roll_circle(radius)
+		self.last_x, self.last_y = self.x, self.y # Where the circle was before the last tick, so that frames between ticks can be drawn in between
 		self.radius = radius
 		self.birth = timer
-
-		# The following if/else statements pick a position somewhere on the edge of the screen for the circle to spawn, out of view by exactly a radius
-		if randint(0, 1) == 0:
-			if randint(0, 1) == 0:
-				self.x = -self.radius
-			else:
-				self.x = WIDTH + self.radius
-			self.y = randint(-self.radius, HEIGHT + self.radius)
-		else:
-			if randint(0, 1) == 0:
-				self.y = -self.radius
-			else:
-				self.y = HEIGHT + self.radius
-			self.x = randint(-self.radius, WIDTH + self.radius)
+		self.check = None # The serial number of the circle's entry in the collision schedule, if there is one
+		self.id = next(CIRCLE_IDS) # A number no other circle has, so spectators can follow the circle from tick to tick even though the circle object gets reused
 
 		distance = ((mouse.x-self.x)**2 + (mouse.y-self.y)**2)**0.5 # Calculates the distance between the circle and the mouse
-		self.vector = [self.speed*(mouse.x-self.x)/distance, self.speed*(mouse.y-self.y)/distance] # Points towards the player using the unit distance vector times the circle's speed
+		self.vx = self.speed*(mouse.x-self.x)/distance # Points towards the player using the unit distance vector times the circle's speed
+		self.vy = self.speed*(mouse.y-self.y)/distance
 
-	def draw(self):
-		pygame.draw.circle(WIN, self.color, (self.x, self.y), self.radius)
+	# Draws the circle alpha of the way from where it was before the last tick to where it is now
+	def draw(self, alpha = 1):
+		x = self.last_x + (self.x - self.last_x)*alpha
+		y = self.last_y + (self.y - self.last_y)*alpha
+		return pygame.draw.circle(WIN, self.color, (x, y), self.radius) # Returns the area of the screen that was drawn on
 
 	def move(self, mouse, timer):
 		# This moves the circle according to its velocity vector
-		self.x += self.vector[0]
-		self.y += self.vector[1]
+		self.last_x, self.last_y = self.x, self.y
+		self.x += self.vx
+		self.y += self.vy
 		
-		# This is the same velocity vector calculation as earlier, so that the circle constantly adjusts its direction to be facing the player
-		distance = ((mouse.x-self.x)**2 + (mouse.y-self.y)**2)**0.5
-		self.vector = [self.speed*(mouse.x-self.x)/distance, self.speed*(mouse.y-self.y)/distance]
+		# This is the same velocity vector calculation as earlier, so that the circle constantly adjusts its direction to be facing the player.
+		# dx*dx and math.sqrt() are rounded the same as NumPy's sums, which **2 and **0.5 aren't always, so Swarm.move() gets exactly the same vector
+		dx, dy = mouse.x-self.x, mouse.y-self.y
+		distance = math.sqrt(dx*dx + dy*dy)
+		self.vx = self.speed*dx/distance
+		self.vy = self.speed*dy/distance
 
 		# Here, returning True tells the function from which move() is being run that the circle should die of old age
 		if timer >= self.birth + LIFE_LENGTH*60: # Multiply LIFE_LENGTH by 60 to convert it from seconds into ticks
@@ -88,7 +207,8 @@ class Circle:
 		return False
 
 	def collide(self, mouse):
-		distance = ((mouse.x-self.x)**2 + (mouse.y-self.y)**2)**0.5
+		dx, dy = mouse.x-self.x, mouse.y-self.y
+		distance = math.sqrt(dx*dx + dy*dy)
 		radii_sum = mouse.radius + self.radius
 
 		# If the distance between the centers is less than the sum of the two circles' radii, we know the circles are overlapping
@@ -96,6 +216,26 @@ class Circle:
 			return True # This means that the circle and the mouse are colliding
 		return False # This means that the circle and the mouse are not colliding
 
+# Keeps removed circles so that new circles can reuse them instead of allocating new objects, which keeps garbage collection out of the game loop
+class CirclePool:
+	def __init__(self):
+		self.free = [] # Circles that have been removed from the game and can be reused
+
+	# Returns a new circle, reusing a removed one if there is one
+	def acquire(self, radius, mouse, timer):
+		if self.free:
+			circle = self.free.pop()
+			circle.reset(radius, mouse, timer)
+			return circle
+		return Circle(radius, mouse, timer)
+
+	def release(self, circle):
+		circle.check = None # Any collision check still queued for it is now out of date
+		self.free.append(circle)
+
+CIRCLE_IDS = itertools.count() # Hands out the circle ids
+POOL = CirclePool() # Every circle in the list path comes from and goes back to this pool
+
 # Defining the player class
 class Mouse:
 	def __init__(self):
@@ -111,11 +251,9 @@ class Mouse:
 		self.y = mouse_coords[1]
 
 	def draw(self):
-		self.set_pos() # Update position before drawing to the screen
-		pygame.draw.circle(WIN, self.color, (self.x, self.y), self.radius)
+		return pygame.draw.circle(WIN, self.color, (self.x, self.y), self.radius)
 
 	def collide(self, circle, since_hit):
-		self.set_pos() # Update position before colliding with a circle
 		if circle.collide(self):
 			if since_hit > IFRAMES_DURATION: # If the player is not within their invincibility frames, they lose a life
 				self.lives -= 1
@@ -124,77 +262,357 @@ class Mouse:
 			return "pop" # Tells the function from which this is being run that the player was hit and the colliding circle can now be removed
 		return "" # Return an empty string since we never do anything if no collision occured
 
-
-# This function draws all of the objects present to the screen, then updates the screen to show the change
-def draw_screen(mouse, circles, timer):
-	WIN.fill(BG_COLOR) # Fills the background of the screen with the background color
-
-	mouse.draw()
-
-	for circle in circles:
-		circle.draw()
+	# The same as collide(), but checks every circle in a Swarm at once. Every circle touching the mouse is removed from the swarm, unless the player died, when they are kept for the final frame like collide_circles() does
+	def collide_swarm(self, circles, since_hit):
+		hit = circles.collide(self)
+		if hit.any():
+			if since_hit > IFRAMES_DURATION:
+				self.lives -= 1
+			if self.lives <= 0:
+				return "dead"
+			circles.keep(~hit)
+			return "pop"
+		return ""
+
+
+# Returns the heart image, loading and scaling it the first time
+def heart_image():
+	global HEART
+	if HEART is None:
+		start = time.perf_counter()
+		HEART = ASSETS.scaled("heart.png", (45, 45)) # Converted to the screen's pixel format so blits don't have to convert every pixel
+		record_startup("heart", start)
+	return HEART
+
+# Draws the mouse, circles, timer and hearts, and returns a list of the areas of the screen they were drawn on.
+# alpha is how far the frame is between the last tick and the next one. The circles are drawn that far between where they were before the last tick and where they are now, so that motion stays smooth when frames and ticks don't line up
+def draw_objects(mouse, circles, timer, alpha = 1):
+	rects = [mouse.draw()]
+
+	if SPRITES is not None:
+		rects.extend(SPRITES.draw(WIN, circles.items(alpha) if VECTORIZED else ((circle.color, circle.last_x + (circle.x - circle.last_x)*alpha, circle.last_y + (circle.y - circle.last_y)*alpha, circle.radius) for circle in circles), DIRTY_RECTS))
+	elif VECTORIZED:
+		rects.extend(circles.draw(WIN, alpha))
+	else:
+		for circle in circles:
+			rects.append(circle.draw(alpha))
 
 	if timer: # Check if the game is running and the timer is still active
-		timer_text = FONT.render(f"Time survived:  {round(timer/60, 1)} s", 1, TEXT_COLOR) # The timer is in ticks, so we must divde by 60. This value is rounded to look nicer and take up less space
-		WIN.blit(timer_text, (10, 10)) # Places the timer text in the upper-left corner
+		rects.append(TEXT.draw(WIN, (10, 10), "Time survived:  ", round(timer/60, 1), " s")) # The timer is in ticks, so we must divde by 60. This value is rounded to look nicer and take up less space. The text is placed in the upper-left corner
 
 	# Display the number of lives a player has remaining visually with hearts
+	heart = heart_image()
 	for i in range(mouse.lives):
 		y = 10
-		x = WIDTH - y - (i+1)*HEART.get_width()
-		WIN.blit(HEART, (x, y))
+		x = WIDTH - y - (i+1)*heart.get_width()
+		rects.append(WIN.blit(heart, (x, y)))
 
+	if PROFILER is not None:
+		rects.append(PROFILER.draw(WIN)) # The performance overlay, if there is one
+	return rects
+
+# This function draws all of the objects present to the screen, then updates the screen to show the change
+def draw_screen(mouse, circles, timer, alpha = 1):
+	WIN.fill(BG_COLOR) # Fills the background of the screen with the background color
+	draw_objects(mouse, circles, timer, alpha)
+	if PROFILER is not None:
+		PROFILER.mark("draw")
 	pygame.display.update() # Update the screen to show all of the changes made
 
+# Draws the same frame as draw_screen(), but only erases and updates the parts of the screen where something was drawn last frame or this frame.
+# Since most of the screen is empty background, this sends far fewer pixels to the display on large screens
+class DirtyRenderer:
+	TILE_SIZE = 64 # The screen is split into tiles this many pixels wide. Filling thousands of tiny rectangles is slower than filling a few larger ones, so dirty areas are rounded out to whole tiles and merged
+
+	def __init__(self):
+		self.previous = None # The areas drawn on last frame. None means the whole screen needs to be drawn
+		self.columns = -(-WIDTH//self.TILE_SIZE) + 2 # Rounds up so that the tiles cover the whole screen, plus a border column on each side for objects hanging just off the screen
+		self.rows = -(-HEIGHT//self.TILE_SIZE) + 2
+		self.max_rects = self.columns*self.rows//4 # With more objects than this, redrawing the whole screen is cheaper than working out the dirty areas
+
+	# Turns a list of rectangles into a shorter list of tile-aligned rectangles that covers all of them
+	def merge(self, rects):
+		size, columns = self.TILE_SIZE, self.columns
+		grid = bytearray(columns*self.rows) # Marks which tiles are dirty
+		for rect in rects:
+			if rect.width and rect.height:
+				left, right = rect.left//size + 1, (rect.right - 1)//size + 2 # Shifted by one for the border
+				for row in range(rect.top//size + 1, (rect.bottom - 1)//size + 2):
+					grid[row*columns + left:row*columns + right] = b"\x01"*(right - left)
+
+		# Each run of dirty tiles in a row becomes one rectangle
+		areas = []
+		for row in range(1, self.rows - 1):
+			line = grid[row*columns:(row + 1)*columns]
+			start = line.find(1)
+			while start != -1:
+				end = line.find(0, start)
+				if end == -1:
+					end = columns
+				areas.append(pygame.Rect((start - 1)*size, (row - 1)*size, (end - start)*size, size))
+				start = line.find(1, end)
+		return areas
+
+	def draw(self, mouse, circles, timer, alpha = 1):
+		if self.previous is None:
+			WIN.fill(BG_COLOR)
+		else:
+			for area in self.merge(self.previous):
+				WIN.fill(BG_COLOR, area) # Erase everything drawn last frame
+
+		rects = draw_objects(mouse, circles, timer, alpha)
+		if PROFILER is not None:
+			PROFILER.mark("draw")
 
-# This function runs the main game loop
-def main():
+		if self.previous is None:
+			pygame.display.update()
+		else:
+			pygame.display.update(self.merge(self.previous + rects)) # Update the erased areas as well as the newly drawn ones
+		self.previous = rects if len(rects) <= self.max_rects else None
+
+
+# Creates the empty container that holds every circle for one game. Passing the container of a finished game empties and returns it instead, so that restarting reuses its memory
+def new_circles(circles = None):
+	global SCHEDULE
+	SCHEDULE = None
+	if VECTORIZED:
+		if circles is None:
+			return swarm.Swarm(WIDTH, HEIGHT, SPEED_RANGE, LIFE_LENGTH)
+		circles.reset(SPEED_RANGE, LIFE_LENGTH)
+		return circles
+
+	if circles is None:
+		circles = []
+	for circle in circles:
+		POOL.release(circle)
+	circles.clear()
+	if SCHEDULED_COLLISIONS and GAME_MODE != CROWDED_MODE:
+		SCHEDULE = collision_schedule.CollisionSchedule()
+	return circles
+
+# Adds a single new circle to the game
+def add_circle(mouse, circles, timer):
+	circle_radius = RNG.randint(mouse.radius - CIRCLE_RADIUS_LIMIT, mouse.radius + CIRCLE_RADIUS_LIMIT) # Set the new circle's radius to a random value within CIRCLE_RADIUS_LIMIT of MOUSE_RADIUS
+	if VECTORIZED:
+		circles.spawn(*roll_circle(circle_radius), circle_radius, mouse, timer)
+	else:
+		circle = POOL.acquire(circle_radius, mouse, timer) # Make the new circle, passing it the randomly assigned radius and the position of the mouse (it needs the mouse position to know where to face)
+		circles.append(circle)
+		if SCHEDULE is not None:
+			SCHEDULE.add(circle)
+
+# Spawn circles at an average rate of SPAWN_CHANCE circles per second
+def spawn_circles(mouse, circles, timer):
+	if RNG.randint(0, 60)//(SPAWN_CHANCE) == 0: # If a circle should be spawned
+		add_circle(mouse, circles, timer)
+
+# Moves and ages every circle, removing the ones that are offscreen or have shrunk away
+def move_circles(mouse, circles, timer):
+	if VECTORIZED:
+		circles.move(mouse, timer) # Move and age every circle in the swarm at once
+		if GAME_MODE == CROWDED_MODE:
+			separate_circles(circles)
+		return
+
+	# Circles that stay are moved down over the removed ones, and the leftover end of the list is cut off after the loop. This removes any number of circles in one pass without skipping any
+	kept = 0
+	for circle in circles:
+		if circle.move(mouse, timer): # If a circle is offscreen, remove it
+			POOL.release(circle)
+		else:
+			circles[kept] = circle
+			kept += 1
+	del circles[kept:]
+	if GAME_MODE == CROWDED_MODE:
+		separate_circles(circles)
+
+# Pushes overlapping circles apart. The spatial hash means only circles in neighbouring cells are compared, instead of every pair of circles.
+# Every push is worked out from where the circles were at the start of the tick and only applied once all of them are known, the same way as Swarm.separate(), so crowded games play out the same with or without NumPy
+def separate_circles(circles):
+	if VECTORIZED:
+		circles.separate(CELL_SIZE)
+		return
+	grid = spatial_hash.SpatialHash(CELL_SIZE)
+	for circle_index, circle in enumerate(circles):
+		grid.insert(circle_index, circle.x, circle.y)
+	pushes = [] # (i, j, x push, y push) for every overlapping pair, with i < j
+	for i, j in grid.pairs():
+		if i > j:
+			i, j = j, i
+		a, b = circles[i], circles[j]
+		dx, dy = b.x - a.x, b.y - a.y
+		distance = math.sqrt(dx*dx + dy*dy)
+		overlap = a.radius + b.radius - distance
+		if overlap > 0 and distance > 0:
+			# Move each circle half of the overlap away from the other
+			push = overlap/distance/2
+			pushes.append((i, j, dx*push, dy*push))
+	pushes.sort()
+	for i, j, push_x, push_y in pushes: # Taken away from every first circle of a pair and then added to every second one, in the same order as Swarm.separate()
+		circle = circles[i]
+		circle.x -= push_x
+		circle.y -= push_y
+	for i, j, push_x, push_y in pushes:
+		circle = circles[j]
+		circle.x += push_x
+		circle.y += push_y
+
+# Checks every circle against the mouse. Returns "dead", "pop" or "" in the same way as Mouse.collide()
+def collide_circles(mouse, circles, since_hit):
+	if VECTORIZED:
+		return mouse.collide_swarm(circles, since_hit)
+	if SCHEDULE is not None:
+		return collide_scheduled(mouse, circles, since_hit)
+	result = ""
+	kept = 0 # Removes the popped circles in one pass, the same way as move_circles()
+	for circle in circles:
+		if result != "dead": # Once the player is dead, the rest of the circles are just kept for the final frame
+			collision = mouse.collide(circle, since_hit) # Check if a circle has collided with the mouse and if the player is not still within their invincibility frames
+			if collision == "pop": # If the player lost a life
+				POOL.release(circle) # Remove the colliding circle
+				since_hit = 0 # Reset the time since the player was last hit, so later circles this tick don't take another life
+				result = "pop"
+				continue
+			if collision == "dead": # If player runs out of hearts
+				result = "dead"
+		circles[kept] = circle
+		kept += 1
+	del circles[kept:]
+	return result
+
+# The same as collide_circles(), but only checks the circles whose turn has come up in the collision schedule
+def collide_scheduled(mouse, circles, since_hit):
+	result = ""
+	for circle in SCHEDULE.due(mouse, circles):
+		if SCHEDULE.schedule(circle, mouse): # Not touching, so it is queued for a later tick
+			continue
+		collision = mouse.collide(circle, since_hit)
+		if collision == "pop":
+			circles.remove(circle) # Collisions are rare, so searching the list here is cheaper than going over every circle every tick
+			POOL.release(circle)
+			since_hit = 0
+			result = "pop"
+		else: # The player is dead, and the rest of the circles are kept for the final frame
+			return "dead"
+	return result
+
+# Shows the final frame and records the high score once the player runs out of lives
+def game_over(mouse, circles, timer):
+	draw_screen(mouse, circles, False) # Renders the screen with no hearts left and no timer
+	if timer > HIGH_SCORES[GAME_MODE]:
+		HIGH_SCORES[GAME_MODE] = timer # Individual values of the global array HIGH_SCORES may be changed without writing global HIGH_SCORES
+	if STORE is not None:
+		STORE.submit(GAME_MODE, timer) # Saved on a background thread, so the end screen appears straight away
+	return timer # Return the amount of time the player survived in order to display it on the end screen
+
+# Returns a path for a new file in a folder, named after the current time and game mode. A game started within the same second as the last one gets a number added to the name, instead of overwriting the last game's file
+def new_game_path(folder, extension):
+	name = f"{time.strftime('%Y%m%d-%H%M%S')}-mode{GAME_MODE}"
+	path = os.path.join(folder, name + extension)
+	number = 1
+	while os.path.exists(path):
+		number += 1
+		path = os.path.join(folder, f"{name}-{number}{extension}")
+	return path
+
+# This function runs the main game loop. Passing a seed replays the same circles as an earlier game with that seed, and passing a container from new_circles() plays the game in it
+def main(seed = None, circles = None):
 	clock = pygame.time.Clock()
+
+	if seed is None:
+		seed = random.getrandbits(64) # Picks a new seed from Python's global random number generator
+	RNG.seed(seed)
+	recorder = None
+	if RECORD_FOLDER is not None:
+		recorder = replay.ReplayWriter(new_game_path(RECORD_FOLDER, ".cgr"), seed, (SPAWN_CHANCE, LIVES, SPEED_RANGE, LIFE_LENGTH, GAME_MODE), VECTORIZED, (WIDTH, HEIGHT))
+	session = None
+	if TELEMETRY_FOLDER is not None:
+		session = telemetry.TelemetryWriter(new_game_path(TELEMETRY_FOLDER, ".cgt"), GAME_MODE, seed, TICK_RATE)
 	
 	mouse = Mouse()
-	circles = []
+	if circles is None:
+		circles = new_circles()
+	draw = DirtyRenderer().draw if DIRTY_RECTS else draw_screen # Picks which way to draw each frame
 
 	timer = 0
 	since_hit = 0
+	if PROFILER is not None:
+		PROFILER.pause() # Don't count the time spent in the menus as a frame
+
+	# Real time is added to the accumulator every frame, and one tick is simulated for every tick's worth of time in it.
+	# This keeps the game running at TICK_RATE whether the frames are drawn faster or slower than that
+	tick_length = 1/TICK_RATE
+	accumulator = 0
+	last_time = time.perf_counter()
 
 	while True:
-		fps = round(((clock.tick(60) * 60) / 1000) * 60, 2) # Sets the ticks per second to 60. This also measures the actual frames per second (if needed)
-		#print("FPS: ", fps) # If needed for debugging
-		
-		timer += 1 # Increment timer every tick
-		since_hit += 1 # Increment the time since the player was hit every tick
+		clock.tick(FRAME_RATE) # Limits the frames per second. Run with --profile to see the actual frame times
+		if PROFILER is not None:
+			PROFILER.start_frame()
+		now = time.perf_counter()
+		frame_time = now - last_time
+		accumulator += frame_time
+		last_time = now
 
 		# This allows the player to close the program at any time, either by closing it manually or by pressing "q"
+		closing = pygame.key.get_pressed()[pygame.K_q]
 		for event in pygame.event.get():
 			if event.type == pygame.QUIT:
-				pygame.quit()
-				quit()
-		keys = pygame.key.get_pressed()
-		if keys[pygame.K_q]:
+				closing = True
+		if closing:
+			if recorder is not None:
+				recorder.close()
+			if session is not None:
+				session.close() # Saves the ticks played so far, without an end chunk since the player didn't die
 			pygame.quit()
 			quit()
 
-		# Spawn circles at an average rate of SPAWN_CHANCE circles per second
-		if randint(0, 60)//(SPAWN_CHANCE) == 0: # If a circle should be spawned
-			circle_radius = randint(mouse.radius - CIRCLE_RADIUS_LIMIT, mouse.radius + CIRCLE_RADIUS_LIMIT) # Set the new circle's radius to a random value within CIRCLE_RADIUS_LIMIT of MOUSE_RADIUS
-			circles.append(Circle(circle_radius, mouse, timer)) # Add the new circle to the list of circles, passing it the randomly assigned radius and the position of the mouse (it needs the mouse position to know where to face)
-
-		# Handle circles array, removing circles as needed
-		for circle_index, circle in enumerate(circles):
-			if circle.move(mouse, timer): # If a circle is offscreen, remove it
-				circles.pop(circle_index)
-
-			collision = mouse.collide(circle, since_hit) # Check if a circle has collided with the mouse and if the player is not still within their invincibility frames
-			if collision == "pop": # If the player lost a life
-				circles.pop(circle_index) # Remove the colliding circle from the list
+		if PROFILER is not None:
+			PROFILER.mark("input")
+
+		ticks = 0
+		while accumulator >= tick_length and ticks < MAX_TICKS_PER_FRAME:
+			accumulator -= tick_length
+			ticks += 1
+			timer += 1 # Increment timer every tick
+			since_hit += 1 # Increment the time since the player was hit every tick
+
+			mouse.set_pos() # Read the cursor once per tick, so that everything this tick sees the same mouse position
+			if recorder is not None:
+				recorder.record(mouse.x, mouse.y)
+
+			if session is not None:
+				count = len(circles)
+			spawn_circles(mouse, circles, timer)
+			if session is not None:
+				spawns = len(circles) - count
+			if PROFILER is not None:
+				PROFILER.mark("spawn") # Added to the frame's spawn time, which covers every tick the frame runs
+			move_circles(mouse, circles, timer)
+
+			if session is not None:
+				count = len(circles)
+			collision = collide_circles(mouse, circles, since_hit)
+			if session is not None:
+				session.record(timer, len(circles), spawns, max(count - len(circles), collision == "dead"), int(frame_time*1000000)) # The circle that kills the player stays onscreen, but still counts as a hit
+			if SPECTATORS is not None:
+				SPECTATORS.broadcast(timer, mouse, circles, WIDTH, HEIGHT)
+			if collision == "pop":
 				since_hit = 0 # Reset the time since the player was last hit
-			elif collision == "dead": # If player runs out of hearts, end the script
-				draw_screen(mouse, circles, False) # Renders the screen with no hearts left and no timer
-				if timer > HIGH_SCORES[GAME_MODE]:
-					HIGH_SCORES[GAME_MODE] = timer # Individual values of the global array HIGH_SCORES may be changed without writing global HIGH_SCORES
-				return timer # Return the amount of time the player survived in order to display it on the end screen
-
-		draw_screen(mouse, circles, timer)
+			elif collision == "dead": # If player runs out of hearts, end the game
+				if recorder is not None:
+					recorder.close()
+				if session is not None:
+					session.close(timer)
+				return game_over(mouse, circles, timer)
+			if PROFILER is not None:
+				PROFILER.mark("update")
+		if ticks == MAX_TICKS_PER_FRAME:
+			accumulator = min(accumulator, tick_length) # Drop the time the game couldn't catch up on
+
+		draw(mouse, circles, timer, accumulator/tick_length)
+		if PROFILER is not None:
+			PROFILER.end_frame(len(circles))
 
 
 # Defining end screen drawing function
@@ -203,117 +621,167 @@ def draw_end_screen(timer):
 	transparent_layer.fill(BG_COLOR) # Fills the semi-transparent layer with the background color
 	WIN.blit(transparent_layer, (0, 0)) # Displays the semi-transparent layer, covering the entire screen by positioning the top left corner at (0, 0)
 
-	end_text = FONT.render(f"You survived {round(timer/60, 1)} seconds!", 1, TEXT_COLOR)
+	end_text = TEXT.render(f"You survived {round(timer/60, 1)} seconds!")
 	end_x = WIDTH/2 - end_text.get_width()/2
 	end_y = HEIGHT/2 - end_text.get_height()/2 - 75
 	WIN.blit(end_text, (end_x, end_y))
 
-	record_text = FONT.render(f"Your best time for this gamemode is {round(HIGH_SCORES[GAME_MODE]/60, 1)} seconds!", 1, TEXT_COLOR)
+	record_text = TEXT.render(f"Your best time for this gamemode is {round(HIGH_SCORES[GAME_MODE]/60, 1)} seconds!")
 	record_x = WIDTH/2 - record_text.get_width()/2
 	record_y = HEIGHT/2 - record_text.get_height()/2
 	WIN.blit(record_text, (record_x, record_y))
 
-	close_text = FONT.render(f'Press "r" to restart, "d" for difficulty selector, or "q" to quit', 1, TEXT_COLOR)
+	close_text = TEXT.render(f'Press "r" to restart, "d" for difficulty selector, or "q" to quit')
 	close_x = WIDTH/2 - close_text.get_width()/2
 	close_y = HEIGHT/2 - close_text.get_height()/2 + 75
 	WIN.blit(close_text, (close_x, close_y))
 
 	pygame.display.update()
 
-# Keeps end screen active until player quits
-def end_screen(timer):
-	clock = pygame.time.Clock()
-
-	draw_end_screen(timer)
-
+# Waits for the next key press on a menu and returns its key. Nothing on a menu moves, so this sleeps until an event arrives instead of checking the keyboard every frame
+def wait_for_key():
 	while True:
-		fps = round(((clock.tick(60) * 60) / 1000) * 60, 2)
-		#print("FPS: ", fps)
-		
+		event = pygame.event.wait()
+
 		# This allows the player to close the program at any time, either by closing it manually or by pressing "q"
-		for event in pygame.event.get():
-			if event.type == pygame.QUIT:
-				pygame.quit()
-				quit()
-		keys = pygame.key.get_pressed()
-		if keys[pygame.K_q]:
+		if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_q):
 			pygame.quit()
 			quit()
+		if event.type == pygame.KEYDOWN:
+			return event.key
+		if event.type == pygame.WINDOWEXPOSED:
+			pygame.display.update() # Show the menu again after the window was covered or minimized
 
-		if keys[pygame.K_r]: # Checks if player presses "r"
-			end_screen(main()) # Restarts game loop without switching difficulties
+# Keeps end screen active until the player picks what to do next, and returns the scene to go to
+def end_screen(timer):
+	draw_end_screen(timer)
 
-		if keys[pygame.K_d]: # Checks if player presses "d"
-			# Allow editing of global variables in order to switch gamemodes
-			global SPAWN_CHANCE
-			global LIVES
-			global SPEED_RANGE
-			global LIFE_LENGTH
-			global GAME_MODE
-			SPAWN_CHANCE, LIVES, SPEED_RANGE, LIFE_LENGTH, GAME_MODE = start_screen() # Difficulty selector
-			end_screen(main()) # Restarts game loop after switching difficulties
+	while True:
+		key = wait_for_key()
+		if key == pygame.K_r: # Checks if player presses "r"
+			return PLAY_SCENE # Restarts game loop without switching difficulties
+		if key == pygame.K_d: # Checks if player presses "d"
+			return START_SCENE # Difficulty selector
 
 
 # Defining start screen drawing function
 def draw_start_screen():
 	WIN.fill(BG_COLOR)
 
-	instructions_text = FONT.render(f"Avoid the circles to survive!", 1, TEXT_COLOR)
+	instructions_text = TEXT.render(f"Avoid the circles to survive!")
 	instructions_x = WIDTH/2 - instructions_text.get_width()/2
 	instructions_y = HEIGHT/2 - instructions_text.get_height()/2 - 140
 	WIN.blit(instructions_text, (instructions_x, instructions_y))
 
-	easy_text = FONT.render(f"Easy: Press 1", 1, TEXT_COLOR)
+	easy_text = TEXT.render(f"Easy: Press 1")
 	easy_x = WIDTH/2 - easy_text.get_width()/2
 	easy_y = HEIGHT/2 - easy_text.get_height()/2 - 10
 	WIN.blit(easy_text, (easy_x, easy_y))
 
-	medium_text = FONT.render(f"Medium: Press 2", 1, TEXT_COLOR)
+	medium_text = TEXT.render(f"Medium: Press 2")
 	medium_x = WIDTH/2 - medium_text.get_width()/2
 	medium_y = HEIGHT/2 - medium_text.get_height()/2 + 40
 	WIN.blit(medium_text, (medium_x, medium_y))
 
-	hard_text = FONT.render(f"Hard: Press 3", 1, TEXT_COLOR)
+	hard_text = TEXT.render(f"Hard: Press 3")
 	hard_x = WIDTH/2 - hard_text.get_width()/2
 	hard_y = HEIGHT/2 - hard_text.get_height()/2 + 90
 	WIN.blit(hard_text, (hard_x, hard_y))
 
-	hardcore_text = FONT.render(f"Hardcore: Press 4", 1, TEXT_COLOR)
+	hardcore_text = TEXT.render(f"Hardcore: Press 4")
 	hardcore_x = WIDTH/2 - hardcore_text.get_width()/2
 	hardcore_y = HEIGHT/2 - hardcore_text.get_height()/2 + 140
 	WIN.blit(hardcore_text, (hardcore_x, hardcore_y))
 
+	crowded_text = TEXT.render(f"Crowded: Press 5")
+	crowded_x = WIDTH/2 - crowded_text.get_width()/2
+	crowded_y = HEIGHT/2 - crowded_text.get_height()/2 + 190
+	WIN.blit(crowded_text, (crowded_x, crowded_y))
+
 	pygame.display.update()
 
 # Keeps start screen active until the player chooses a difficulty
 def start_screen():
-	clock = pygame.time.Clock()
-
 	draw_start_screen()
 
 	while True:
-		fps = round(((clock.tick(60) * 60) / 1000) * 60, 2)
-		#print("FPS: ", fps)
-
-		# This allows the player to close the program at any time, either by closing it manually or by pressing "q"
-		for event in pygame.event.get():
-			if event.type == pygame.QUIT:
-				pygame.quit()
-				quit()
-		keys = pygame.key.get_pressed()
-		if keys[pygame.K_q]:
-			pygame.quit()
-			quit()
-		
-		# Check which gamemode was selected and return SPAWN_CHANCE, LIVES, SPEED_RANGE, LIFE_LENGTH, and GAME_MODE
-		if keys[pygame.K_1]:
-			return 2, 6, [1, 3], 20, 0
-		if keys[pygame.K_2]:
-			return 3.5, 6, [2, 4], 30, 1
-		if keys[pygame.K_3]:
-			return 5, 5, [3, 5], 60, 2
-		if keys[pygame.K_4]:
-			return 4, 1, [3, 5.5], 100, 3
-
-SPAWN_CHANCE, LIVES, SPEED_RANGE, LIFE_LENGTH, GAME_MODE = start_screen() # Render the difficulty selector screen and set the values returned to their corresponding variables
-end_screen(main()) # Run the main game loop and pass the timer variable it returns into the end screen to display
\ No newline at end of file
+		key = wait_for_key()
+
+		# Check which gamemode was selected and return its SPAWN_CHANCE, LIVES, SPEED_RANGE, LIFE_LENGTH, and GAME_MODE
+		if key in MODE_KEYS:
+			return GAME_MODES[MODE_KEYS.index(key)]
+
+# Sets the globals that control the difficulty from one of the GAME_MODES tuples
+def set_game_mode(mode):
+	global SPAWN_CHANCE
+	global LIVES
+	global SPEED_RANGE
+	global LIFE_LENGTH
+	global GAME_MODE
+	SPAWN_CHANCE, LIVES, SPEED_RANGE, LIFE_LENGTH, GAME_MODE = mode
+
+# Runs the game by moving between the start, play and end scenes. Each scene returns when the player leaves it and this loop starts the next one,
+# so the call stack stays the same size however many games are played (instead of every restart calling the next game from inside the last one)
+def run_scenes():
+	scene = START_SCENE
+	circles = None # The circles of the last game, reused by the next one
+	timer = 0 # How long the player survived in the last game
+	while True:
+		if scene == START_SCENE:
+			set_game_mode(start_screen()) # Render the difficulty selector screen and set the values returned to their corresponding variables
+			scene = PLAY_SCENE
+		elif scene == PLAY_SCENE:
+			circles = new_circles(circles)
+			timer = main(circles = circles) # Run the main game loop and keep the timer it returns for the end screen to display
+			scene = END_SCENE
+		else:
+			scene = end_screen(timer)
+
+# Only start the game when this file is run directly, so that other scripts (such as headless.py) can import it
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Avoid the circles to survive!")
+	parser.add_argument("--player", default = "default", help = "the profile to save and load high scores as")
+	parser.add_argument("--dirty-rects", action = "store_true", help = "only redraw the parts of the screen that change each frame")
+	parser.add_argument("--sprites", action = "store_true", help = "draw the circles from a cache of pre-rendered images instead of drawing each circle every frame")
+	parser.add_argument("--vectorized", action = argparse.BooleanOptionalAction, default = VECTORIZED, help = "store the circles in NumPy arrays instead of a list of Circle objects (on by default when NumPy is installed)")
+	parser.add_argument("--record", metavar = "FOLDER", help = "save a replay of every game to this folder, relative to the circle_game folder (play them back with replay.py)")
+	parser.add_argument("--spectate", metavar = "ADDRESS", help = "let other machines watch with spectate.py, listening on host:port or a Unix socket path")
+	parser.add_argument("--telemetry", metavar = "FOLDER", help = "save the circle count, spawns, hits and frame time of every tick of every game to this folder, relative to the circle_game folder (summarise them with telemetry.py)")
+	parser.add_argument("--fps", type = int, default = FRAME_RATE, help = f"the most frames to draw per second, or 0 for no limit. The game itself always runs at {TICK_RATE} ticks per second")
+	parser.add_argument("--profile", action = "store_true", help = "show how long each phase of a frame takes in an overlay")
+	parser.add_argument("--startup-times", action = "store_true", help = "print how long each phase of starting the game took")
+	parser.add_argument("--trace", metavar = "FILE", help = "save a timeline of every frame to this file when the game closes, relative to the circle_game folder (open it in chrome://tracing or ui.perfetto.dev)")
+	args = parser.parse_args()
+	if args.vectorized and swarm.np is None:
+		parser.error("--vectorized needs NumPy to be installed")
+	try:
+		STORE = score_store.ScoreStore(SCORES_FOLDER, args.player)
+	except ValueError as error:
+		parser.error(str(error))
+	HIGH_SCORES[:] = STORE.best[:len(GAME_MODES)]
+	atexit.register(STORE.close) # Finish saving any games still waiting to be written before the program closes
+	DIRTY_RECTS = args.dirty_rects
+	VECTORIZED = args.vectorized
+	if args.sprites:
+		SPRITES = sprite_cache.SpriteCache()
+	FRAME_RATE = args.fps
+	RECORD_FOLDER = args.record
+	if RECORD_FOLDER is not None:
+		os.makedirs(RECORD_FOLDER, exist_ok = True)
+	if args.spectate is not None:
+		SPECTATORS = spectate.SpectatorServer(args.spectate)
+		atexit.register(SPECTATORS.close) # Disconnects the spectators and removes a Unix socket file
+	TELEMETRY_FOLDER = args.telemetry
+	if TELEMETRY_FOLDER is not None:
+		os.makedirs(TELEMETRY_FOLDER, exist_ok = True)
+	if args.profile or args.trace:
+		PROFILER = profiler.FrameProfiler(load_font("futura", 20) if args.profile else None, TEXT_COLOR, args.trace is not None)
+		if args.trace:
+			atexit.register(PROFILER.export, args.trace) # The game closes by calling quit(), so the trace is saved on the way out
+
+	open_window()
+	if args.startup_times:
+		for phase, seconds in STARTUP_TIMES.items():
+			print(f"{phase:<12}{1000*seconds:8.1f} ms")
+		print(f"{'total':<12}{1000*(time.perf_counter() - START_TIME):8.1f} ms")
+	run_scenes()
\ No newline at end of file
@@ -0,0 +1,78 @@
+# Works out the earliest tick each circle could possibly reach the mouse, so that circles far away from the mouse aren't checked for collisions every tick.
+# A circle moves at most its speed each tick and the mouse is assumed to move at most mouse_speed_limit each tick, so the gap between them can't close faster than the sum of the two.
+# Each circle waits in a priority queue until its gap could have closed, and only then gets a real distance check.
+# The mouse speed limit follows how fast the mouse has been moving lately, and new checks are scheduled with the current limit. Circles already queued were scheduled with the limit of their time,
+# so the schedule remembers the lowest limit any queued circle was scheduled with. Whenever the mouse moves further than that in a tick, every circle is checked and rescheduled, so the schedule is never wrong
+
+import heapq
+import itertools
+import math
+
+MIN_MOUSE_SPEED = 2 # The mouse speed limit never drops below this many pixels per tick
+HEADROOM = 2 # The limit is set this many times higher than the mouse's current speed, so that speeding up a little doesn't break it
+DECAY = 0.98 # Each tick the limit shrinks by this factor towards the mouse's current speed, so that a fast flick doesn't slow the schedule down for long
+
+
+class CollisionSchedule:
+	def __init__(self):
+		self.mouse_speed_limit = MIN_MOUSE_SPEED # How far the mouse is expected to move at most in one tick, which new checks are scheduled with
+		self.queued_limit = MIN_MOUSE_SPEED # The lowest limit any queued circle was scheduled with. If the mouse moves further than this in one tick, the schedule can't be trusted and every circle is checked
+		self.queue = [] # A heap of (tick, serial, circle). The serial breaks ties and matches the circle's check attribute while the entry is current
+		self.serials = itertools.count()
+		self.tick = 0
+		self.last_x, self.last_y = None, None # Where the mouse was last tick
+
+		# Counters for checking how well the schedule is working
+		self.checks = 0 # Distance checks handed out
+		self.resets = 0 # Ticks where the mouse moved too far and every circle was checked
+
+	# Adds a new circle, to be checked on the next tick
+	def add(self, circle):
+		circle.check = next(self.serials)
+		heapq.heappush(self.queue, (self.tick + 1, circle.check, circle))
+
+	# Moves on to the next tick and returns the circles that could be touching the mouse on it.
+	# Each returned circle must be either removed or passed back to schedule()
+	def due(self, mouse, circles):
+		self.tick += 1
+		last_x, last_y = self.last_x, self.last_y
+		self.last_x, self.last_y = mouse.x, mouse.y
+		moved = ((mouse.x-last_x)**2 + (mouse.y-last_y)**2)**0.5 if last_x is not None else 0
+		if moved > self.queued_limit:
+			# Some of the circles queued so far assumed a slower mouse, so throw the queue away and check them all. Comparing with the queued circles' limit
+			# instead of the current one catches a mouse that speeds up gradually, raising the current limit a little every tick
+			self.mouse_speed_limit = self.queued_limit = HEADROOM*moved
+			self.resets += 1
+			self.queue.clear()
+			self.checks += len(circles)
+			return list(circles)
+		self.mouse_speed_limit = max(self.mouse_speed_limit*DECAY, HEADROOM*moved, MIN_MOUSE_SPEED) # Only circles scheduled from now on use the new limit
+
+		found = []
+		queue = self.queue
+		while queue and queue[0][0] <= self.tick:
+			_, serial, circle = heapq.heappop(queue)
+			if circle.check == serial: # Circles that have been removed or rescheduled since leave their old entries behind, which are skipped here
+				found.append(circle)
+		self.checks += len(found)
+		return found
+
+	# Queues a circle to be checked again on the first tick its gap to the mouse could have closed and returns True.
+	# If the circle is already touching the mouse, returns False without queuing it
+	def schedule(self, circle, mouse):
+		dx, dy = mouse.x-circle.x, mouse.y-circle.y
+		distance = math.sqrt(dx*dx + dy*dy) # The same sum as Circle.collide(), so that the two always agree on whether a circle is touching
+		radii_sum = mouse.radius + circle.radius
+		if distance <= radii_sum:
+			return False
+		wait = int((distance - radii_sum) // (circle.speed + self.mouse_speed_limit)) # Rounding down can only make the check early, never late
+		circle.check = next(self.serials)
+		heapq.heappush(self.queue, (self.tick + max(wait, 1), circle.check, circle))
+		if self.mouse_speed_limit < self.queued_limit:
+			self.queued_limit = self.mouse_speed_limit
+		return True
+
+	# Forgets a circle that has been removed from the game
+	@staticmethod
+	def remove(circle):
+		circle.check = None
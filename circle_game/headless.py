@@ -0,0 +1,117 @@
+# Runs circle_game without a real window or a real-time clock, so that the simulation can be stepped as fast as possible and measured.
+# Usage: python headless.py [mode] [ticks]
+
+import os
+import sys
+import math
+from time import perf_counter
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # SDL's dummy driver renders to memory instead of opening a window. This must be set before pygame is imported
+import circle_game as game
+game.open_window()
+
+
+# A mouse that follows a scripted path instead of the player's cursor
+class ScriptedMouse(game.Mouse):
+	def __init__(self, path):
+		super().__init__()
+		self.path = path # A function that takes the current tick and the circles, and returns the (x, y) position of the mouse
+		self.tick = 0
+		self.circles = None # The circles of the game being played, so that a path can react to them like a player would
+
+	def set_pos(self):
+		self.x, self.y = self.path(self.tick, self.circles)
+
+# A mouse path that circles the middle of the screen, which keeps the player moving like a real player would
+def orbit_path(radius = 200, period = 240):
+	def path(tick, circles):
+		angle = 2*math.pi*tick/period
+		return game.WIDTH/2 + radius*math.cos(angle), game.HEIGHT/2 + radius*math.sin(angle)
+	return path
+
+# A mouse path that sits still in the middle of the screen and then goes round in a circle faster and faster, so the mouse speeds up a little every tick
+def accelerating_path(radius = 200, still_ticks = 60, acceleration = 0.0005):
+	def path(tick, circles):
+		moving = max(tick - still_ticks, 0)
+		angle = acceleration*moving*moving/2
+		return game.WIDTH/2 + radius*math.cos(angle), game.HEIGHT/2 + radius*math.sin(angle)
+	return path
+
+# Plays one game with the given game mode tuple (the same values start_screen() returns) and returns a dictionary of measurements.
+# The game ends when the player dies or after max_ticks ticks. Setting min_circles tops the circles up to that count every tick, and an invincible player never loses a life.
+# The same seed and path always play out the same game. If counts is a list, the number of circles after every tick is appended to it, and observe is called with the tick, mouse and circles after every tick
+def run(mode, path = None, max_ticks = 3600, draw = True, min_circles = 0, invincible = False, seed = 0, counts = None, observe = None):
+	game.set_game_mode(mode)
+	game.RNG.seed(seed)
+	mouse = ScriptedMouse(path or orbit_path())
+	circles = game.new_circles()
+	mouse.circles = circles
+	draw_frame = game.DirtyRenderer().draw if game.DIRTY_RECTS else game.draw_screen
+
+	timer = 0
+	since_hit = 0
+	survived = None # The tick the player died on, if they died
+	circle_ticks = 0 # The sum of the circle count over every tick, used to get the average number of circles
+	phases = {"spawn": 0, "move": 0, "collide": 0, "draw": 0} # The total seconds spent in each phase
+
+	start = perf_counter()
+	while timer < max_ticks:
+		timer += 1
+		since_hit = 0 if invincible else since_hit + 1 # Keeping the player inside their invincibility frames means circles still pop but never take a life
+		mouse.tick = timer
+		mouse.set_pos()
+
+		phase_start = perf_counter()
+		game.spawn_circles(mouse, circles, timer)
+		while len(circles) < min_circles:
+			game.add_circle(mouse, circles, timer)
+		phase_end = perf_counter()
+		phases["spawn"] += phase_end - phase_start
+
+		phase_start = phase_end
+		game.move_circles(mouse, circles, timer)
+		phase_end = perf_counter()
+		phases["move"] += phase_end - phase_start
+
+		phase_start = phase_end
+		collision = game.collide_circles(mouse, circles, since_hit)
+		phase_end = perf_counter()
+		phases["collide"] += phase_end - phase_start
+
+		circle_ticks += len(circles)
+		if counts is not None:
+			counts.append(len(circles))
+		if observe is not None:
+			observe(timer, mouse, circles)
+		if collision == "pop":
+			since_hit = 0
+		elif collision == "dead":
+			survived = timer
+			break
+
+		if draw:
+			phase_start = phase_end
+			draw_frame(mouse, circles, timer)
+			phases["draw"] += perf_counter() - phase_start
+	seconds = perf_counter() - start
+
+	return {
+		"game_mode": mode[4],
+		"ticks": timer,
+		"seconds": seconds,
+		"ticks_per_second": timer/seconds if seconds else 0,
+		"survived": survived,
+		"average_circles": circle_ticks/timer if timer else 0,
+		"phases": phases,
+		"sprites": game.SPRITES.stats() if game.SPRITES is not None else None,
+	}
+
+
+if __name__ == "__main__":
+	mode = game.GAME_MODES[int(sys.argv[1]) if len(sys.argv) > 1 else 0]
+	ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 3600
+	result = run(mode, max_ticks = ticks)
+	print(f"Game mode {result['game_mode']}: {result['ticks']} ticks in {result['seconds']:.3f} s ({result['ticks_per_second']:.0f} ticks per second)")
+	if result["survived"] is not None:
+		print(f"The scripted mouse died after {round(result['survived']/60, 1)} seconds")
+	for phase, seconds in result["phases"].items():
+		print(f"  {phase:<8}{1000*seconds/result['ticks']:.4f} ms per tick")
@@ -0,0 +1,116 @@
+# Measures how long each phase of every frame takes, shows the results in an overlay and saves them as a trace file.
+# Trace files use the Chrome trace event format, so they can be opened in chrome://tracing or https://ui.perfetto.dev to see every frame on a timeline.
+# The game only calls into the profiler when one is switched on, so the game runs at full speed without it.
+# A frame can run any number of simulation ticks, so the spawn and update phases of every tick in a frame are added up, and the stats and trace both hold one entry per phase per frame.
+
+import json
+import sys
+from collections import deque
+from time import perf_counter_ns
+import pygame
+import text_cache
+
+PHASES = ("input", "spawn", "update", "draw", "present") # The phases of a frame, in the order they run
+WINDOW = 600 # Percentiles are worked out from this many of the most recent frames (10 seconds at 60 frames per second)
+REFRESH_FRAMES = 30 # The overlay's numbers are only worked out again every this many frames, so they are readable and cheap to draw
+TRACE_FRAMES = 60*60*10 # The trace keeps the phases of this many of the most recent frames (10 minutes at 60 frames per second)
+
+
+# Returns the value at the given fraction of the way through a list of numbers
+def percentile(values, fraction):
+	values = sorted(values)
+	return values[min(int(fraction*len(values)), len(values) - 1)] if values else 0
+
+
+class FrameProfiler:
+	def __init__(self, font = None, color = (240, 240, 240), trace = False):
+		self.frame_times = deque(maxlen = WINDOW) # The nanoseconds from the start of each frame to the start of the next one
+		self.phase_times = {phase: deque(maxlen = WINDOW) for phase in PHASES} # The nanoseconds spent in each phase of each frame. A phase that didn't run in a frame counts as 0
+		self.allocations = deque(maxlen = WINDOW) # The change in the number of memory blocks Python has allocated over each frame
+		self.trace = deque(maxlen = TRACE_FRAMES) if trace else None # A list of the (phase, start, duration) of every phase of each frame, in nanoseconds
+		self.counters = deque(maxlen = TRACE_FRAMES) if trace else None # (time, circle count) of every frame, shown as a graph under the phases in the trace
+
+		self.frame_start = None # When the current frame started
+		self.last_mark = 0 # When the last phase ended
+		self.frame_phases = dict.fromkeys(PHASES, 0) # The nanoseconds spent in each phase of the current frame so far
+		self.frame_events = [] # The trace events of the current frame
+		self.blocks = 0 # The number of allocated memory blocks at the start of the current frame
+		self.circles = 0 # The number of circles in the last frame
+		self.frames = 0
+
+		self.text = text_cache.TextCache(font, color) if font is not None else None # Draws the overlay. Without a font there is no overlay
+		self.lines = [] # The overlay's text, worked out every REFRESH_FRAMES frames
+
+	# Forgets when the last frame started, so that time spent outside the game loop (such as in a menu) isn't counted as one long frame
+	def pause(self):
+		self.frame_start = None
+
+	def start_frame(self):
+		now = perf_counter_ns()
+		if self.frame_start is not None:
+			self.frame_times.append(now - self.frame_start)
+		self.frame_start = self.last_mark = now
+		self.blocks = sys.getallocatedblocks()
+		self.frame_phases = dict.fromkeys(PHASES, 0)
+		self.frame_events = []
+
+	# Ends the given phase. The phase is counted as starting where the previous one ended. Marking a phase more than once in a frame (once per tick) adds up its time
+	def mark(self, phase):
+		now = perf_counter_ns()
+		self.frame_phases[phase] += now - self.last_mark
+		if self.trace is not None:
+			self.frame_events.append((phase, self.last_mark, now - self.last_mark))
+		self.last_mark = now
+
+	# Ends the present phase and the frame. Call this after the screen has been updated
+	def end_frame(self, circles):
+		self.mark("present")
+		for phase, duration in self.frame_phases.items():
+			self.phase_times[phase].append(duration)
+		if self.trace is not None:
+			self.trace.append(self.frame_events)
+		self.allocations.append(sys.getallocatedblocks() - self.blocks)
+		self.circles = circles
+		self.frames += 1
+		if self.counters is not None:
+			self.counters.append((self.frame_start, circles))
+
+	def stats(self):
+		frame_times = self.frame_times
+		return {
+			"frames": self.frames,
+			"frame_ms": sum(frame_times)/len(frame_times)/1e6 if frame_times else 0,
+			"frame_p50_ms": percentile(frame_times, 0.5)/1e6,
+			"frame_p99_ms": percentile(frame_times, 0.99)/1e6,
+			"phases_ms": {phase: sum(times)/len(times)/1e6 if times else 0 for phase, times in self.phase_times.items()},
+			"phases_p99_ms": {phase: percentile(times, 0.99)/1e6 for phase, times in self.phase_times.items()},
+			"allocations_per_frame": sum(self.allocations)/len(self.allocations) if self.allocations else 0,
+			"circles": self.circles,
+		}
+
+	# Draws the overlay in the bottom left of the surface and returns the area drawn on
+	def draw(self, surface):
+		if self.text is None:
+			return pygame.Rect(0, 0, 0, 0)
+		if not self.lines or self.frames % REFRESH_FRAMES == 0:
+			stats = self.stats()
+			fps = 1000/stats["frame_ms"] if stats["frame_ms"] else 0
+			self.lines = [
+				f"Frame {stats['frame_ms']:.2f} ms   p99 {stats['frame_p99_ms']:.2f} ms   {fps:.0f} fps",
+				f"Circles {stats['circles']}   allocations {stats['allocations_per_frame']:+.0f} per frame",
+				"   ".join(f"{phase} {milliseconds:.2f}" for phase, milliseconds in stats["phases_ms"].items()) + " ms",
+			]
+
+		line_height = self.text.font.get_linesize()
+		y = surface.get_height() - 10 - len(self.lines)*line_height
+		area = self.text.draw(surface, (10, y), self.lines[0])
+		for i, line in enumerate(self.lines[1:], 1):
+			area.union_ip(self.text.draw(surface, (10, y + i*line_height), line))
+		return area
+
+	# Writes every recorded phase to a Chrome trace event file
+	def export(self, path):
+		events = [{"name": "circles", "ph": "C", "ts": time/1000, "pid": 1, "args": {"circles": circles}} for time, circles in self.counters or ()]
+		events.extend({"name": phase, "cat": "frame", "ph": "X", "ts": start/1000, "dur": duration/1000, "pid": 1, "tid": 1} for frame_events in self.trace or () for phase, start, duration in frame_events)
+		with open(path, "w") as trace_file:
+			json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
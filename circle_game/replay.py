@@ -0,0 +1,93 @@
+# Records the mouse position of every tick of a game to a small binary replay file, and plays replays back without a window.
+# Since every random number in a game comes from circle_game.RNG, a replay only needs the seed, the game settings and the mouse path to reproduce the whole game.
+# Usage: python replay.py replay_file [replay_file ...]
+
+import struct
+import sys
+from array import array
+
+MAGIC = b"CGRP" # Marks the start of every replay file
+VERSION = 1
+HEADER = struct.Struct("<4sBQdHddHBBHH") # Magic, version, seed, SPAWN_CHANCE, LIVES, SPEED_RANGE (two values), LIFE_LENGTH, GAME_MODE, vectorized, screen width and screen height
+FLUSH_TICKS = 600 # The writer saves its buffer to the file every this many ticks
+
+
+# Streams mouse positions to a replay file. Each tick is stored as the change in x and y since the last tick, as two 16-bit integers
+class ReplayWriter:
+	def __init__(self, path, seed, mode, vectorized, screen_size):
+		self.file = open(path, "xb") # Never overwrites another replay
+		spawn_chance, lives, speed_range, life_length, game_mode = mode
+		self.file.write(HEADER.pack(MAGIC, VERSION, seed, spawn_chance, lives, speed_range[0], speed_range[1], life_length, game_mode, vectorized, *screen_size))
+		self.buffer = array("h") # Holds the deltas that haven't been written to the file yet
+		self.last_x, self.last_y = 0, 0
+
+	def record(self, x, y):
+		x, y = round(x), round(y)
+		self.buffer.append(x - self.last_x)
+		self.buffer.append(y - self.last_y)
+		self.last_x, self.last_y = x, y
+		if len(self.buffer) >= 2*FLUSH_TICKS:
+			self.flush()
+
+	def flush(self):
+		if sys.byteorder != "little": # Replay files are always little-endian, so they can be shared between machines
+			self.buffer.byteswap()
+		self.buffer.tofile(self.file)
+		del self.buffer[:]
+
+	def close(self):
+		self.flush()
+		self.file.close()
+
+
+# Reads a whole replay file. The settings are available as attributes and positions holds the (x, y) mouse position of every tick
+class Replay:
+	def __init__(self, path):
+		with open(path, "rb") as replay_file:
+			header = replay_file.read(HEADER.size)
+			deltas = array("h")
+			deltas.frombytes(replay_file.read())
+		magic, version, self.seed, spawn_chance, lives, speed_min, speed_max, life_length, game_mode, vectorized, width, height = HEADER.unpack(header)
+		if magic != MAGIC or version != VERSION:
+			raise ValueError(f"{path} is not a version {VERSION} circle_game replay")
+		if sys.byteorder != "little":
+			deltas.byteswap()
+		self.mode = (spawn_chance, lives, [speed_min, speed_max], life_length, game_mode)
+		self.vectorized = bool(vectorized)
+		self.screen_size = (width, height)
+
+		# Add the deltas back up into positions
+		self.positions = []
+		x, y = 0, 0
+		for i in range(0, len(deltas) - 1, 2):
+			x += deltas[i]
+			y += deltas[i + 1]
+			self.positions.append((x, y))
+
+	# Returns a mouse path for headless.run() that follows the recorded positions
+	def path(self):
+		positions = self.positions
+		return lambda tick, circles: positions[min(tick, len(positions)) - 1]
+
+
+# Re-simulates a replay without a window as fast as possible and returns headless.run()'s measurements
+def play(replay):
+	import headless
+	game = headless.game
+	game.WIDTH, game.HEIGHT = replay.screen_size # Circles spawn relative to the screen size, so use the one the game was recorded on
+	game.VECTORIZED = replay.vectorized and game.swarm.np is not None
+	return headless.run(replay.mode, replay.path(), max_ticks = len(replay.positions), draw = False, seed = replay.seed)
+
+
+if __name__ == "__main__":
+	for path in sys.argv[1:]:
+		replay = Replay(path)
+		result = play(replay)
+		speed = result["ticks"]/60/result["seconds"] if result["seconds"] else 0
+		print(f"{path}: game mode {replay.mode[4]}, seed {replay.seed}, {len(replay.positions)} ticks recorded")
+		if result["survived"] is None:
+			print(f"  The player was still alive after {round(result['ticks']/60, 1)} seconds (re-simulated at {speed:.0f}x real time)")
+		else:
+			print(f"  The player survived {round(result['survived']/60, 1)} seconds (re-simulated at {speed:.0f}x real time)")
+			if result["survived"] != len(replay.positions):
+				print("  Warning: the recording doesn't end on the tick the player died, so this replay doesn't match its game")
@@ -0,0 +1,139 @@
+# Saves every finished game and the best time of each game mode, one set of files per player profile.
+# Each game is appended to a log file on a background thread, so the game never waits for the disk. The best times are also kept in a small snapshot file,
+# so that starting the game only reads the snapshot (and any games logged after it was written) instead of the whole history.
+# Both files are replaced atomically when rewritten, so a crash part way through a write never loses the scores that were already saved.
+
+import os
+import queue
+import struct
+import threading
+import time
+
+SNAPSHOT = struct.Struct("<4sBQ16I") # Magic, version, the length of the log the snapshot includes, and the best time (in ticks) of up to 16 game modes
+RECORD = struct.Struct("<BId") # One logged game: its game mode, the ticks survived and when it was played (seconds since the epoch)
+MAGIC = b"CGHS"
+VERSION = 1
+MAX_MODES = 16
+MAX_LOG_RECORDS = 20000 # Once the log holds this many games it is compacted
+KEEP_PER_MODE = 1000 # Compacting keeps this many of the latest games of each game mode
+
+
+# Writes data to a file so that the file always holds either its old contents or all of the new ones, even if the game crashes part way through
+def write_atomically(path, data):
+	temporary_path = path + ".tmp"
+	with open(temporary_path, "wb") as temporary_file:
+		temporary_file.write(data)
+		temporary_file.flush()
+		os.fsync(temporary_file.fileno())
+	os.replace(temporary_path, path)
+
+# Returns the (mode, ticks, time) of every whole record in data. A record cut short by a crash is ignored
+def read_records(data):
+	return list(RECORD.iter_unpack(data[:len(data) - len(data) % RECORD.size]))
+
+# Raises ValueError if a profile name can't safely be used as the start of a file name in the scores folder.
+# Names with a path separator could point the files anywhere on the disk, and names starting with a dot would be hidden files or ".." itself
+def check_profile(profile):
+	if not profile or profile.startswith("."):
+		raise ValueError(f"The profile name {profile!r} can't be empty or start with a dot")
+	if "/" in profile or "\\" in profile: # Both are refused on every system, so a scores folder can be copied between Windows and everything else
+		raise ValueError(f"The profile name {profile!r} can't contain a path separator")
+
+
+class ScoreStore:
+	def __init__(self, folder, profile = "default"):
+		check_profile(profile)
+		os.makedirs(folder, exist_ok = True)
+		self.log_path = os.path.join(folder, f"{profile}.log")
+		self.snapshot_path = os.path.join(folder, f"{profile}.best")
+		self.best = [0]*MAX_MODES # The best ticks survived in each game mode
+		self.log_length = 0 # The length of the log file in bytes, counting whole records only
+		self.lock = threading.Lock() # Held while the background thread changes the log and log_length, so history() never reads the log part way through a write or a compaction
+		self.load()
+
+		self.queue = queue.Queue() # Games waiting to be written by the background thread. None tells the thread to stop
+		self.thread = threading.Thread(target = self.write_games, daemon = True)
+		self.thread.start()
+
+	# Reads the best times from the snapshot, then adds in any games that were logged after the snapshot was written
+	def load(self):
+		covered = 0
+		try:
+			with open(self.snapshot_path, "rb") as snapshot_file:
+				magic, version, covered, *best = SNAPSHOT.unpack(snapshot_file.read(SNAPSHOT.size))
+			if magic == MAGIC and version == VERSION:
+				self.best = best
+			else:
+				covered = 0
+		except (OSError, struct.error):
+			covered = 0 # No snapshot (or a damaged one), so the best times are worked out from the whole log
+
+		try:
+			size = os.path.getsize(self.log_path)
+		except OSError:
+			size = 0
+		if size < covered: # The log was compacted after the snapshot was written, so the snapshot can't say which games it includes
+			self.best = [0]*MAX_MODES
+			covered = 0
+		with open(self.log_path, "ab+") as log_file:
+			log_file.seek(covered)
+			for mode, ticks, _ in read_records(log_file.read()):
+				self.add_best(mode, ticks)
+		self.log_length = size - size % RECORD.size
+
+	def add_best(self, mode, ticks):
+		if 0 <= mode < MAX_MODES and ticks > self.best[mode]:
+			self.best[mode] = ticks
+
+	# Queues a finished game to be saved and returns straight away
+	def submit(self, mode, ticks):
+		self.add_best(mode, ticks)
+		self.queue.put((mode, ticks, time.time()))
+
+	# Waits for every queued game to be saved, then stops the background thread
+	def close(self):
+		self.queue.put(None)
+		self.thread.join()
+
+	# Runs on the background thread, saving each queued game
+	def write_games(self):
+		while True:
+			game = self.queue.get()
+			if game is None:
+				return
+			with self.lock:
+				with open(self.log_path, "r+b" if os.path.exists(self.log_path) else "wb") as log_file:
+					log_file.seek(self.log_length) # Writing after the last whole record overwrites a record a crash cut short
+					log_file.write(RECORD.pack(*game))
+					log_file.truncate()
+					log_file.flush()
+					os.fsync(log_file.fileno())
+				self.log_length += RECORD.size
+				if self.log_length >= MAX_LOG_RECORDS*RECORD.size:
+					self.compact()
+				log_length = self.log_length
+			write_atomically(self.snapshot_path, SNAPSHOT.pack(MAGIC, VERSION, log_length, *self.best))
+
+	# Rewrites the log with only the latest KEEP_PER_MODE games of each game mode, plus the best game of each mode so the log can always rebuild the snapshot.
+	# Only called by write_games() while it holds the lock
+	def compact(self):
+		with open(self.log_path, "rb") as log_file:
+			records = read_records(log_file.read())
+		kept = []
+		counts = {}
+		for record in reversed(records):
+			counts[record[0]] = counts.get(record[0], 0) + 1
+			if counts[record[0]] <= KEEP_PER_MODE or record[1] == self.best[record[0]]:
+				kept.append(record)
+		kept.reverse()
+		write_atomically(self.log_path, b"".join(RECORD.pack(*record) for record in kept))
+		self.log_length = len(kept)*RECORD.size
+
+	# Returns the latest games of a game mode as (ticks, time) pairs, newest first. This reads the log, so it is meant for a scores screen rather than every frame
+	def history(self, mode, count = 10):
+		try:
+			with self.lock, open(self.log_path, "rb") as log_file:
+				records = read_records(log_file.read(self.log_length))
+		except OSError:
+			return []
+		return [(ticks, played) for record_mode, ticks, played in reversed(records) if record_mode == mode][:count]
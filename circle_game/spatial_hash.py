@@ -0,0 +1,101 @@
+# A uniform grid that buckets circles by position, so that finding the circles near each other only looks at neighbouring grid cells instead of comparing every pair of circles.
+# The cell size must be at least the diameter of the largest circle, so that two overlapping circles are always in the same or neighbouring cells.
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+# The cell itself and the four neighbours after it. Checking only these (instead of all nine) finds every neighbouring pair of cells exactly once
+HALF_NEIGHBOURHOOD = ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+
+class SpatialHash:
+	def __init__(self, cell_size):
+		self.cell_size = cell_size
+		self.cells = {} # Maps (column, row) to a list of the indices inside that cell
+
+	def clear(self):
+		self.cells.clear()
+
+	def insert(self, index, x, y):
+		key = (int(x // self.cell_size), int(y // self.cell_size))
+		cell = self.cells.get(key)
+		if cell is None:
+			self.cells[key] = [index]
+		else:
+			cell.append(index)
+
+	# Empties the grid and fills it with every position, using each position's index in the lists as its index in the grid
+	def rebuild(self, xs, ys):
+		self.clear()
+		for index, (x, y) in enumerate(zip(xs, ys)):
+			self.insert(index, x, y)
+
+	# Returns every index in the cells touching the square of the given radius around (x, y)
+	def query(self, x, y, radius):
+		found = []
+		for column in range(int((x - radius) // self.cell_size), int((x + radius) // self.cell_size) + 1):
+			for row in range(int((y - radius) // self.cell_size), int((y + radius) // self.cell_size) + 1):
+				found.extend(self.cells.get((column, row), ()))
+		return found
+
+	# Yields every pair of indices (i, j) that share a cell or sit in neighbouring cells. These are the only pairs that can be overlapping
+	def pairs(self):
+		cells = self.cells
+		for (column, row), cell in cells.items():
+			for offset_x, offset_y in HALF_NEIGHBOURHOOD:
+				if offset_x == 0 and offset_y == 0:
+					for a in range(len(cell)):
+						for b in range(a + 1, len(cell)):
+							yield cell[a], cell[b]
+					continue
+				other = cells.get((column + offset_x, row + offset_y))
+				if other:
+					for i in cell:
+						for j in other:
+							yield i, j
+
+
+# The NumPy version of SpatialHash.pairs(), used by the Swarm. Returns two arrays i and j holding every candidate pair
+def grid_pairs(x, y, cell_size):
+	n = len(x)
+	if n < 2:
+		return np.zeros(0, dtype = np.intp), np.zeros(0, dtype = np.intp)
+
+	# Work out which cell each circle is in, shifted so that the smallest column and row are 1. This leaves an empty border around the grid for the neighbour offsets
+	column = np.floor(x / cell_size).astype(np.intp)
+	row = np.floor(y / cell_size).astype(np.intp)
+	column -= column.min() - 1
+	row -= row.min() - 1
+	columns = int(column.max()) + 2
+	cell = row*columns + column
+
+	# Sort the circles by cell, then find where each cell's run of circles starts and ends in the sorted order
+	order = np.argsort(cell, kind = "stable")
+	sorted_cell = cell[order]
+	cells = np.arange((int(row.max()) + 2)*columns)
+	starts = np.searchsorted(sorted_cell, cells, side = "left")
+	ends = np.searchsorted(sorted_cell, cells, side = "right")
+	position = np.arange(n)
+
+	found_i, found_j = [], []
+	for offset_x, offset_y in HALF_NEIGHBOURHOOD:
+		neighbour = sorted_cell + offset_y*columns + offset_x
+		first = starts[neighbour]
+		if offset_x == 0 and offset_y == 0:
+			first = position + 1 # Within the same cell, only pair each circle with the circles sorted after it
+		counts = np.maximum(ends[neighbour] - first, 0)
+		total = int(counts.sum())
+		if not total:
+			continue
+
+		# Expand each circle into one entry per circle in the neighbouring cell
+		i = np.repeat(position, counts)
+		group_start = np.repeat(np.cumsum(counts) - counts, counts)
+		j = np.repeat(first, counts) + np.arange(total) - group_start
+		found_i.append(order[i])
+		found_j.append(order[j])
+	if not found_i:
+		return np.zeros(0, dtype = np.intp), np.zeros(0, dtype = np.intp)
+	return np.concatenate(found_i), np.concatenate(found_j)
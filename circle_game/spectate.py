@@ -0,0 +1,328 @@
+# Lets other machines watch a game live. The game sends the mouse and every circle to spectators over a TCP or Unix socket, and the viewer in this file draws them.
+# Most messages are deltas: they list which circles were removed, how far each remaining circle moved (one byte per axis) and any new circles. Every KEYFRAME_TICKS ticks,
+# and whenever a spectator joins, a keyframe with every circle in full is sent instead, so a spectator can start watching (or recover) from any keyframe.
+# Usage: python spectate.py ADDRESS, where ADDRESS is host:port or the path of a Unix socket, the same as circle_game.py --spectate ADDRESS
+
+import argparse
+import os
+import queue
+import select
+import socket
+import stat
+import struct
+import sys
+import threading
+from array import array
+
+MESSAGE = struct.Struct("<cII") # Starts every message: its kind, the tick and the length of the rest of the message
+KEYFRAME, DELTA = b"K", b"D"
+MOUSE = struct.Struct("<hhB") # The mouse position and lives, at the start of every message
+SCREEN = struct.Struct("<HHH") # After the mouse in a keyframe: the screen width and height, and the number of circles
+COUNT = struct.Struct("<H")
+KEYFRAME_TICKS = 120 # A keyframe is sent at least this often
+RADIUS_STEPS = 10 # Radii are sent in tenths of a pixel, so that shrinking circles can be seen shrinking
+QUEUE_MESSAGES = 120 # If the sending thread falls this far behind, messages are dropped and the next message is a keyframe
+MAX_CIRCLES = 65535
+
+
+# Returns the id, x, y, radius and color columns of the circles in either kind of storage, with the positions and radii rounded the way they are sent
+def circle_columns(circles):
+	if hasattr(circles, "ids"): # A Swarm
+		n = circles.count
+		ids = circles.ids[:n].tolist()
+		xs = circles.x[:n].round().astype(int).clip(-32768, 32767).tolist()
+		ys = circles.y[:n].round().astype(int).clip(-32768, 32767).tolist()
+		radii = (circles.radius[:n]*RADIUS_STEPS).round().astype(int).clip(0, 255).tolist()
+		colors = circles.color[:n].tobytes()
+		return ids, xs, ys, radii, colors
+	ids = [circle.id for circle in circles]
+	xs = [min(max(round(circle.x), -32768), 32767) for circle in circles]
+	ys = [min(max(round(circle.y), -32768), 32767) for circle in circles]
+	radii = [min(max(round(circle.radius*RADIUS_STEPS), 0), 255) for circle in circles]
+	colors = bytes(value for circle in circles for value in circle.color)
+	return ids, xs, ys, radii, colors
+
+
+# Turns each tick's circles into keyframe or delta messages. It remembers the last message it encoded, so every message must be delivered in order
+class SnapshotEncoder:
+	def __init__(self):
+		self.index = None # Maps the id of every circle in the last message to its position in that message. None means the next message must be a keyframe
+		self.xs, self.ys = [], [] # The rounded positions in the last message, which the next delta is worked out from
+
+	# Makes the next message a keyframe, for when a message couldn't be delivered
+	def reset(self):
+		self.index = None
+
+	def encode(self, tick, mouse, circles, width, height, keyframe = False):
+		ids, xs, ys, radii, colors = circle_columns(circles)
+		if len(ids) > MAX_CIRCLES:
+			ids, xs, ys, radii, colors = ids[:MAX_CIRCLES], xs[:MAX_CIRCLES], ys[:MAX_CIRCLES], radii[:MAX_CIRCLES], colors[:3*MAX_CIRCLES]
+		mouse_data = MOUSE.pack(min(max(round(mouse.x), -32768), 32767), min(max(round(mouse.y), -32768), 32767), min(max(mouse.lives, 0), 255))
+		payload = None if keyframe or self.index is None else self.delta(mouse_data, ids, xs, ys, radii, colors)
+		if payload is None:
+			kind = KEYFRAME
+			payload = b"".join((mouse_data, SCREEN.pack(width, height, len(ids)), pack_array("h", xs), pack_array("h", ys), pack_array("B", radii), colors))
+		else:
+			kind = DELTA
+		self.index = {circle_id: position for position, circle_id in enumerate(ids)}
+		self.xs, self.ys = xs, ys
+		return MESSAGE.pack(kind, tick, len(payload)) + payload
+
+	# Returns the payload of a delta message, or None if the change can't be sent as a delta
+	def delta(self, mouse_data, ids, xs, ys, radii, colors):
+		index, last_xs, last_ys = self.index, self.xs, self.ys
+		dx, dy = array("b"), array("b") # One byte each, so byte order doesn't matter
+		kept = [] # The positions in the last message of the circles that are still here
+		previous = -1
+		first_new = len(ids)
+		for position, circle_id in enumerate(ids):
+			old = index.get(circle_id)
+			if old is None:
+				if first_new == len(ids):
+					first_new = position
+				continue
+			if old < previous or position > first_new: # Circles only ever keep their order and new circles are only ever added at the end, so anything else needs a keyframe
+				return None
+			x_change, y_change = xs[position] - last_xs[old], ys[position] - last_ys[old]
+			if not (-128 <= x_change <= 127 and -128 <= y_change <= 127): # Pushed further than one byte can hold
+				return None
+			dx.append(x_change)
+			dy.append(y_change)
+			kept.append(old)
+			previous = old
+
+		removed = sorted(set(range(len(last_xs))) - set(kept)) if len(kept) != len(last_xs) else []
+		return b"".join((
+			mouse_data,
+			COUNT.pack(len(removed)), pack_array("H", removed),
+			dx.tobytes(), dy.tobytes(), pack_array("B", radii[:first_new]),
+			COUNT.pack(len(ids) - first_new), pack_array("h", xs[first_new:]), pack_array("h", ys[first_new:]), pack_array("B", radii[first_new:]), colors[3*first_new:],
+		))
+
+
+# Rebuilds the game from messages on the spectator's side
+class SpectatorState:
+	def __init__(self):
+		self.tick = 0
+		self.width, self.height = 0, 0 # The size of the game's screen. Zero until the first keyframe arrives
+		self.mouse = (0, 0, 0) # x, y and lives
+		self.xs, self.ys, self.radii = array("h"), array("h"), array("B")
+		self.colors = bytearray()
+		self.synced = False # Deltas are ignored until the first keyframe
+
+	# Applies every whole message at the start of buffer and removes them from it
+	def feed(self, buffer):
+		offset = 0
+		while len(buffer) - offset >= MESSAGE.size:
+			kind, tick, length = MESSAGE.unpack_from(buffer, offset)
+			if len(buffer) - offset - MESSAGE.size < length:
+				break
+			start = offset + MESSAGE.size
+			self.apply(kind, tick, bytes(buffer[start:start + length]))
+			offset = start + length
+		del buffer[:offset]
+
+	def apply(self, kind, tick, payload):
+		if kind == DELTA and not self.synced:
+			return
+		self.tick = tick
+		self.mouse = MOUSE.unpack_from(payload)
+		offset = MOUSE.size
+		if kind == KEYFRAME:
+			self.width, self.height, count = SCREEN.unpack_from(payload, offset)
+			offset += SCREEN.size
+			self.xs, offset = read_array("h", payload, offset, count)
+			self.ys, offset = read_array("h", payload, offset, count)
+			self.radii, offset = read_array("B", payload, offset, count)
+			self.colors = bytearray(payload[offset:offset + 3*count])
+			self.synced = True
+			return
+
+		(removed_count,) = COUNT.unpack_from(payload, offset)
+		removed, offset = read_array("H", payload, offset + COUNT.size, removed_count)
+		if removed_count:
+			gone = set(removed)
+			kept = [i for i in range(len(self.xs)) if i not in gone]
+			self.xs = array("h", (self.xs[i] for i in kept))
+			self.ys = array("h", (self.ys[i] for i in kept))
+			self.colors = bytearray(b"".join(self.colors[3*i:3*i + 3] for i in kept))
+		count = len(self.xs)
+		dx, offset = read_array("b", payload, offset, count)
+		dy, offset = read_array("b", payload, offset, count)
+		self.radii, offset = read_array("B", payload, offset, count)
+		self.xs = array("h", map(int.__add__, self.xs, dx))
+		self.ys = array("h", map(int.__add__, self.ys, dy))
+
+		(new,) = COUNT.unpack_from(payload, offset)
+		offset += COUNT.size
+		xs, offset = read_array("h", payload, offset, new)
+		ys, offset = read_array("h", payload, offset, new)
+		radii, offset = read_array("B", payload, offset, new)
+		self.xs.extend(xs)
+		self.ys.extend(ys)
+		self.radii.extend(radii)
+		self.colors.extend(payload[offset:offset + 3*new])
+
+	# Returns the (color, x, y, radius) of every circle, for drawing
+	def items(self):
+		colors = self.colors
+		return ((tuple(colors[3*i:3*i + 3]), x, y, radius/RADIUS_STEPS) for i, (x, y, radius) in enumerate(zip(self.xs, self.ys, self.radii)))
+
+# Returns a list of numbers as the bytes of an array of the given type. Messages are always little-endian, so they can be shared between machines
+def pack_array(typecode, values):
+	values = array(typecode, values)
+	if sys.byteorder != "little":
+		values.byteswap()
+	return values.tobytes()
+
+# Reads count values of the given array type starting at offset, and returns them with the offset after them
+def read_array(typecode, payload, offset, count):
+	values = array(typecode)
+	values.frombytes(payload[offset:offset + count*values.itemsize])
+	if sys.byteorder != "little":
+		values.byteswap()
+	return values, offset + count*values.itemsize
+
+
+# Turns "host:port" into a TCP address and anything else into the path of a Unix socket
+def parse_address(address):
+	host, _, port = address.rpartition(":")
+	if host and port.isdigit():
+		return socket.AF_INET, (host, int(port))
+	return socket.AF_UNIX, address
+
+
+# Sends the game to every connected spectator. Encoding happens on the game's thread, and a background thread accepts spectators and sends them the messages
+class SpectatorServer:
+	def __init__(self, address):
+		family, self.address = parse_address(address)
+		self.listener = socket.socket(family, socket.SOCK_STREAM)
+		if family == socket.AF_INET:
+			self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		elif os.path.exists(self.address) and stat.S_ISSOCK(os.stat(self.address).st_mode):
+			os.remove(self.address) # Left behind by an earlier game
+		self.listener.bind(self.address)
+		self.listener.listen()
+		self.address = self.listener.getsockname() # Picks up the real port if port 0 was asked for
+
+		self.encoder = SnapshotEncoder()
+		self.last_keyframe = None # The tick of the last keyframe
+		self.queue = queue.Queue(QUEUE_MESSAGES) # Messages waiting to be sent, as (is keyframe, message)
+		self.clients = [] # Spectators being sent every message. Only used by the background thread
+		self.waiting = [] # Spectators that joined since the last keyframe, who can't use deltas yet
+		self.watched = False # Whether anyone is watching. Nothing is encoded while nobody is
+		self.lock = threading.Lock() # Guards waiting and watched, which the background thread changes and the game's thread reads
+		self.running = True
+		self.thread = threading.Thread(target = self.send_messages, daemon = True)
+		self.thread.start()
+
+	# Encodes the state of a tick and queues it for every spectator
+	def broadcast(self, tick, mouse, circles, width, height):
+		with self.lock:
+			watched, joining = self.watched, bool(self.waiting)
+		if not watched:
+			return
+		keyframe = joining or self.last_keyframe is None or tick - self.last_keyframe >= KEYFRAME_TICKS or tick < self.last_keyframe # A new game starts the ticks again
+		message = self.encoder.encode(tick, mouse, circles, width, height, keyframe)
+		keyframe = message[0:1] == KEYFRAME # The encoder sends a keyframe whenever it can't send a delta
+		if keyframe:
+			self.last_keyframe = tick
+		try:
+			self.queue.put_nowait((keyframe, message))
+		except queue.Full:
+			self.encoder.reset() # The spectators will miss this message, so the next one has to be a keyframe
+
+	# Stops the background thread and disconnects every spectator
+	def close(self):
+		self.running = False
+		self.thread.join()
+
+	# Runs on the background thread
+	def send_messages(self):
+		while self.running:
+			readable, _, _ = select.select([self.listener], [], [], 0)
+			if readable:
+				client, _ = self.listener.accept()
+				with self.lock:
+					self.waiting.append(client)
+					self.watched = True
+			try:
+				keyframe, message = self.queue.get(timeout = 0.05)
+			except queue.Empty:
+				continue
+			if keyframe:
+				with self.lock:
+					self.clients.extend(self.waiting)
+					self.waiting.clear()
+			for client in list(self.clients):
+				try:
+					client.sendall(message)
+				except OSError: # The spectator left
+					self.clients.remove(client)
+					client.close()
+			with self.lock:
+				self.watched = bool(self.clients or self.waiting)
+		with self.lock:
+			leaving = self.clients + self.waiting
+		for client in leaving:
+			client.close()
+		self.listener.close()
+		if self.listener.family == socket.AF_UNIX:
+			os.remove(self.address)
+
+
+# Draws the game being sent to address until the window is closed
+def view(address):
+	os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+	import pygame
+	pygame.display.init()
+	pygame.font.init()
+	pygame.display.set_caption("Circle Game spectator")
+	font = pygame.font.Font(None, 36)
+
+	family, address = parse_address(address)
+	connection = socket.socket(family, socket.SOCK_STREAM)
+	connection.connect(address)
+	connection.setblocking(False)
+
+	state = SpectatorState()
+	buffer = bytearray()
+	window = None
+	clock = pygame.time.Clock()
+	while True:
+		clock.tick(60)
+		for event in pygame.event.get():
+			if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_q):
+				pygame.quit()
+				return
+
+		# Read everything that has arrived and apply it, so the view never falls behind the game
+		while True:
+			try:
+				data = connection.recv(1 << 16)
+			except BlockingIOError:
+				break
+			if not data:
+				pygame.quit()
+				print("The game stopped sending")
+				return
+			buffer += data
+		state.feed(buffer)
+		if not state.synced:
+			continue
+
+		if window is None or window.get_size() != (state.width, state.height):
+			window = pygame.display.set_mode((state.width, state.height), pygame.RESIZABLE | pygame.SCALED)
+		window.fill((0, 0, 0))
+		for color, x, y, radius in state.items():
+			pygame.draw.circle(window, color, (x, y), radius)
+		mouse_x, mouse_y, lives = state.mouse
+		pygame.draw.circle(window, (255, 255, 255), (mouse_x, mouse_y), 10)
+		window.blit(font.render(f"Time survived:  {round(state.tick/60, 1)} s   Lives: {lives}", True, (240, 240, 240)), (10, 10))
+		pygame.display.update()
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Watch a game of circle_game that was started with --spectate")
+	parser.add_argument("address", help = "host:port or the path of a Unix socket")
+	view(parser.parse_args().address)
@@ -0,0 +1,92 @@
+# Keeps pre-rendered circle images so that drawing a circle is a single blit instead of rasterizing it with pygame.draw.circle every frame.
+# Images are keyed by color and radius, with the radius rounded to the nearest 1/STEPS_PER_PIXEL of a pixel so that shrinking circles reuse the same few images.
+
+import math
+from collections import OrderedDict
+import pygame
+
+STEPS_PER_PIXEL = 2 # Radii are rounded to the nearest half pixel before looking up an image
+COLORKEY = (0, 0, 0) # The transparent color of every image. No circle is ever black, so this never hides part of a circle
+
+
+class SpriteCache:
+	def __init__(self, max_sprites = 4096):
+		self.max_sprites = max_sprites # Once this many images are stored, the least recently used one is thrown away for each new one
+		self.sprites = OrderedDict() # Maps (color, rounded radius) to (image, offset). Ordered from least to most recently used
+
+		# Counters for checking how well the cache is working
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.bytes = 0 # The memory used by the pixels of every stored image
+
+	# Returns the image for a circle and how far up and left of the circle's center to blit it
+	def get(self, color, radius):
+		key = (color, int(radius*STEPS_PER_PIXEL + 0.5))
+		sprite = self.sprites.get(key)
+		if sprite is not None:
+			self.hits += 1
+			self.sprites.move_to_end(key)
+			return sprite
+		return self.render(key)
+
+	# Draws a new image for a cache miss and stores it, evicting the least recently used image if the cache is full
+	def render(self, key):
+		self.misses += 1
+		color, steps = key
+		radius = steps/STEPS_PER_PIXEL
+		offset = math.ceil(radius)
+		image = pygame.Surface((2*offset + 1, 2*offset + 1))
+		image.fill(COLORKEY)
+		pygame.draw.circle(image, color, (offset, offset), radius)
+		if pygame.display.get_surface() is not None:
+			image = image.convert() # Match the screen's pixel format so blits don't have to convert every pixel
+		image.set_colorkey(COLORKEY, pygame.RLEACCEL) # Run-length encoding the transparent pixels makes repeated blits of the image faster
+		sprite = (image, offset)
+
+		self.sprites[key] = sprite
+		self.bytes += image.get_width()*image.get_height()*image.get_bytesize()
+		if len(self.sprites) > self.max_sprites:
+			evicted, _ = self.sprites.popitem(last = False)[1]
+			self.bytes -= evicted.get_width()*evicted.get_height()*evicted.get_bytesize()
+			self.evictions += 1
+		return sprite
+
+	# Draws every (color, x, y, radius) circle onto the surface in one batched blit call. If rects is True, returns a list of the areas drawn on.
+	# This is the same as calling get() for every circle, but with the cache hit path written out inline because it runs for every circle every frame
+	def draw(self, surface, circles, rects = False):
+		sprites = self.sprites
+		lookup, move_to_end = sprites.get, sprites.move_to_end
+		hits = 0
+		batch = []
+		for color, x, y, radius in circles:
+			if radius <= 0:
+				continue
+			key = (color, int(radius*STEPS_PER_PIXEL + 0.5))
+			sprite = lookup(key)
+			if sprite is None:
+				sprite = self.render(key)
+			else:
+				hits += 1
+				move_to_end(key)
+			image, offset = sprite
+			batch.append((image, (int(x + 0.5) - offset, int(y + 0.5) - offset)))
+		self.hits += hits
+		if rects:
+			return surface.blits(batch)
+		if hasattr(surface, "fblits"): # fblits is the faster version of blits in newer versions of pygame
+			surface.fblits(batch)
+		else:
+			surface.blits(batch, False) # Passing False skips building a list of the changed areas, since nothing uses it
+		return []
+
+	def stats(self):
+		lookups = self.hits + self.misses
+		return {
+			"sprites": len(self.sprites),
+			"hits": self.hits,
+			"misses": self.misses,
+			"hit_rate": self.hits/lookups if lookups else 0,
+			"evictions": self.evictions,
+			"bytes": self.bytes,
+		}
@@ -0,0 +1,154 @@
+# Stores every circle in parallel NumPy arrays (a "structure of arrays") instead of one Circle object per enemy.
+# Homing, aging, culling and mouse collision then run as a handful of batched array operations per tick instead of one Python method call per circle.
+
+import pygame
+import spatial_hash
+try:
+	import numpy as np
+except ImportError: # NumPy is optional. Without it, circle_game falls back to the list of Circle objects
+	np = None
+
+
+class Swarm:
+	def __init__(self, width, height, speed_range, life_length, capacity = 256):
+		self.width, self.height = width, height # The screen size, used to cull circles that have left the screen
+		self.speed_range = speed_range
+		self.life_length = life_length # In seconds, the same as LIFE_LENGTH
+		self.count = 0 # The number of live circles. Only the first self.count entries of each array are in use
+
+		self.x = np.zeros(capacity)
+		self.y = np.zeros(capacity)
+		self.last_x = np.zeros(capacity) # The positions before the last tick, the same as Circle.last_x and Circle.last_y
+		self.last_y = np.zeros(capacity)
+		self.vx = np.zeros(capacity) # The velocity vector, the same as Circle.vector
+		self.vy = np.zeros(capacity)
+		self.speed = np.zeros(capacity)
+		self.radius = np.zeros(capacity)
+		self.birth = np.zeros(capacity, dtype = np.int64)
+		self.color = np.zeros((capacity, 3), dtype = np.uint8)
+		self.ids = np.zeros(capacity, dtype = np.int64) # A number no other circle has, the same as Circle.id
+		self.next_id = 0
+
+	# Empties the swarm for a new game, keeping the arrays so that they don't have to be allocated and grown again
+	def reset(self, speed_range, life_length):
+		self.speed_range = speed_range
+		self.life_length = life_length
+		self.count = 0
+
+	def __len__(self):
+		return self.count
+
+	# Doubles the size of every array once they are full, so that spawning stays cheap on average
+	def grow(self):
+		for name in ("x", "y", "last_x", "last_y", "vx", "vy", "speed", "radius", "birth", "color", "ids"):
+			array = getattr(self, name)
+			bigger = np.zeros((len(array)*2,) + array.shape[1:], dtype = array.dtype)
+			bigger[:self.count] = array[:self.count]
+			setattr(self, name, bigger)
+
+	# Adds a circle. The random values are rolled by the caller so that both storage paths use exactly the same spawning rules
+	def spawn(self, color, speed, x, y, radius, mouse, timer):
+		if self.count == len(self.x):
+			self.grow()
+		i = self.count
+		self.x[i], self.y[i] = x, y
+		self.last_x[i], self.last_y[i] = x, y
+		self.speed[i] = speed
+		self.radius[i] = radius
+		self.birth[i] = timer
+		self.color[i] = color
+		self.ids[i] = self.next_id
+		self.next_id += 1
+
+		distance = ((mouse.x-x)**2 + (mouse.y-y)**2)**0.5
+		self.vx[i] = speed*(mouse.x-x)/distance
+		self.vy[i] = speed*(mouse.y-y)/distance
+		self.count += 1
+
+	# Keeps only the circles where mask is True, packing them into the front of the arrays in their original order
+	def keep(self, mask):
+		kept = int(mask.sum())
+		if kept == self.count:
+			return
+		for name in ("x", "y", "last_x", "last_y", "vx", "vy", "speed", "radius", "birth", "color", "ids"):
+			array = getattr(self, name)
+			array[:kept] = array[:self.count][mask]
+		self.count = kept
+
+	# The batched version of Circle.move(). Returns the number of circles that died of old age or left the screen
+	def move(self, mouse, timer):
+		n = self.count
+		x, y, vx, vy = self.x[:n], self.y[:n], self.vx[:n], self.vy[:n]
+		radius = self.radius[:n]
+
+		# Move every circle along its velocity vector
+		self.last_x[:n] = x
+		self.last_y[:n] = y
+		x += vx
+		y += vy
+
+		# Point every circle back towards the player. A circle sitting exactly on the mouse keeps a zero vector instead of dividing by zero.
+		# The sums are done in the same order as Circle.move(), so both round the same way and a game plays out the same with or without NumPy
+		dx = mouse.x - x
+		dy = mouse.y - y
+		distance = np.sqrt(dx*dx + dy*dy)
+		speed = self.speed[:n]
+		vx[:] = np.divide(speed*dx, distance, out = np.zeros(n), where = distance > 0)
+		vy[:] = np.divide(speed*dy, distance, out = np.zeros(n), where = distance > 0)
+
+		# Old circles shrink by 0.1 pixels every tick until they disappear
+		old = timer >= self.birth[:n] + self.life_length*60
+		radius[old] -= 0.1
+
+		alive = ~(old & (radius <= 0))
+		alive &= (x >= -radius) & (x <= self.width + radius)
+		alive &= (y >= -radius) & (y <= self.height + radius)
+		self.keep(alive)
+		return n - self.count
+
+	# The batched version of Circle.collide(). Returns a mask of the circles touching the mouse
+	def collide(self, mouse):
+		n = self.count
+		dx = mouse.x - self.x[:n]
+		dy = mouse.y - self.y[:n]
+		distance = np.sqrt(dx*dx + dy*dy) # The same sum as Circle.collide()
+		return distance <= mouse.radius + self.radius[:n]
+
+	# Pushes overlapping circles apart, using the spatial hash grid to find the pairs that might be overlapping
+	def separate(self, cell_size):
+		n = self.count
+		x, y, radius = self.x[:n], self.y[:n], self.radius[:n]
+		i, j = spatial_hash.grid_pairs(x, y, cell_size)
+		i, j = np.minimum(i, j), np.maximum(i, j)
+		dx = x[j] - x[i]
+		dy = y[j] - y[i]
+		distance = np.sqrt(dx*dx + dy*dy) # The same sums as separate_circles() in circle_game.py, so the two storage paths push circles apart by exactly the same amounts
+		overlap = radius[i] + radius[j] - distance
+		touching = (overlap > 0) & (distance > 0)
+		if not touching.any():
+			return
+
+		# Move each circle of an overlapping pair half of the overlap away from the other. Every push is worked out from where the circles were before any of them moved,
+		# and the pushes are added in order of (i, j), which is also how separate_circles() adds them up
+		order = np.lexsort((j[touching], i[touching]))
+		i, j = i[touching][order], j[touching][order]
+		push = (overlap[touching]/distance[touching]/2)[order]
+		push_x, push_y = dx[touching][order]*push, dy[touching][order]*push
+		np.subtract.at(x, i, push_x)
+		np.subtract.at(y, i, push_y)
+		np.add.at(x, j, push_x)
+		np.add.at(y, j, push_y)
+
+	# Returns the (color, x, y, radius) of every circle, for drawing. The positions are alpha of the way from where the circles were before the last tick to where they are now
+	def items(self, alpha = 1):
+		n = self.count
+		x, y = self.x[:n], self.y[:n]
+		if alpha != 1:
+			last_x, last_y = self.last_x[:n], self.last_y[:n]
+			x = last_x + (x - last_x)*alpha
+			y = last_y + (y - last_y)*alpha
+		return zip(map(tuple, self.color[:n].tolist()), x.tolist(), y.tolist(), self.radius[:n].tolist())
+
+	# Draws every circle and returns a list of the areas of the surface that were drawn on
+	def draw(self, surface, alpha = 1):
+		return [pygame.draw.circle(surface, color, (x, y), radius) for color, x, y, radius in self.items(alpha)]
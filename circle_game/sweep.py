@@ -0,0 +1,134 @@
+# Plays thousands of headless games across a pool of processes to help tune the game mode settings.
+# Every combination of the given SPAWN_CHANCE, LIVES, SPEED_RANGE and LIFE_LENGTH values is played by a bot, and the survival times and circle counts are summarised in a JSON results file.
+# Usage: python sweep.py --spawn-chance 2 3.5 5 --lives 1 6 --speed-range 1-3 3-5 --life-length 20 60 --games 200 --policy evade --output sweep.json
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import statistics
+from time import perf_counter
+
+headless = None # Imported inside each worker process, so that every worker sets up its own dummy display
+
+
+def start_worker():
+	global headless
+	os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1" # Stops every worker from printing pygame's welcome message
+	import headless
+
+
+# Mouse policies. Each one returns a fresh path function for headless.run(), since some of them keep state between ticks
+
+# Stays still in the middle of the screen
+def still_policy():
+	return lambda tick, circles: (headless.game.WIDTH/2, headless.game.HEIGHT/2)
+
+# Circles the middle of the screen
+def orbit_policy():
+	return headless.orbit_path()
+
+# Moves away from nearby circles at a limited speed, like a (simple) player dodging, while drifting back towards the middle of the screen
+def evade_policy(speed = 12, reach = 150):
+	game = headless.game
+	position = [game.WIDTH/2, game.HEIGHT/2]
+
+	def path(tick, circles):
+		x, y = position
+		if game.VECTORIZED:
+			n = circles.count
+			xs, ys = circles.x[:n].tolist(), circles.y[:n].tolist()
+		else:
+			xs, ys = [circle.x for circle in circles], [circle.y for circle in circles]
+
+		# Every circle within reach pushes the mouse away, with closer circles pushing harder
+		push_x = (game.WIDTH/2 - x)/game.WIDTH
+		push_y = (game.HEIGHT/2 - y)/game.HEIGHT
+		for circle_x, circle_y in zip(xs, ys):
+			dx, dy = x - circle_x, y - circle_y
+			distance_squared = dx*dx + dy*dy
+			if 0 < distance_squared < reach*reach:
+				push_x += dx/distance_squared
+				push_y += dy/distance_squared
+
+		length = (push_x**2 + push_y**2)**0.5
+		if length:
+			x = min(max(x + speed*push_x/length, 0), game.WIDTH)
+			y = min(max(y + speed*push_y/length, 0), game.HEIGHT)
+		position[:] = x, y
+		return x, y
+	return path
+
+POLICIES = {"still": still_policy, "orbit": orbit_policy, "evade": evade_policy}
+
+
+# Plays one game in a worker process and returns its summary
+def play(task):
+	mode, policy, seed, max_ticks = task
+	counts = []
+	result = headless.run(mode, POLICIES[policy](), max_ticks = max_ticks, draw = False, seed = seed, counts = counts)
+	return mode, result["survived"] or result["ticks"], result["survived"] is None, statistics.fmean(counts) if counts else 0, max(counts, default = 0)
+
+# Returns the value at the given fraction of the way through a sorted list
+def percentile(values, fraction):
+	return values[min(int(fraction*len(values)), len(values) - 1)]
+
+# Combines every game played with one set of settings into a summary
+def summarise(mode, games):
+	survived = sorted(game[0] for game in games)
+	return {
+		"spawn_chance": mode[0],
+		"lives": mode[1],
+		"speed_range": mode[2],
+		"life_length": mode[3],
+		"game_mode": mode[4],
+		"games": len(games),
+		"timeouts": sum(game[1] for game in games), # Games where the bot was still alive after max_ticks
+		"survival_seconds": {
+			"mean": statistics.fmean(survived)/60,
+			"p10": percentile(survived, 0.1)/60,
+			"median": percentile(survived, 0.5)/60,
+			"p90": percentile(survived, 0.9)/60,
+		},
+		"survival_histogram": [sum(1 for ticks in survived if second*60 <= ticks < (second + 10)*60) for second in range(0, survived[-1]//60 + 1, 10)], # Games per 10 second bucket
+		"circles_mean": statistics.fmean(game[2] for game in games),
+		"circles_max": max(game[3] for game in games),
+	}
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Sweep circle_game's difficulty settings with headless bot games")
+	parser.add_argument("--spawn-chance", type = float, nargs = "+", default = [2, 3.5, 5], help = "SPAWN_CHANCE values to try")
+	parser.add_argument("--lives", type = int, nargs = "+", default = [1, 5, 6], help = "LIVES values to try")
+	parser.add_argument("--speed-range", nargs = "+", default = ["1-3", "2-4", "3-5"], help = "SPEED_RANGE values to try, written as min-max")
+	parser.add_argument("--life-length", type = float, nargs = "+", default = [20, 60], help = "LIFE_LENGTH values to try")
+	parser.add_argument("--game-mode", type = int, default = 0, help = "the GAME_MODE the games are played as (4 makes the circles separate)")
+	parser.add_argument("--games", type = int, default = 100, help = "games to play for every combination")
+	parser.add_argument("--policy", choices = sorted(POLICIES), default = "evade", help = "how the bot moves the mouse")
+	parser.add_argument("--max-ticks", type = int, default = 60*300, help = "stop a game after this many ticks")
+	parser.add_argument("--workers", type = int, default = os.cpu_count(), help = "processes to play games in")
+	parser.add_argument("--seed", type = int, default = 0, help = "the seed of the first game. Each game after it uses the next seed")
+	parser.add_argument("--output", default = "sweep.json", help = "the file to write the results to")
+	args = parser.parse_args()
+
+	speed_ranges = [[float(value) for value in speed_range.split("-")] for speed_range in args.speed_range]
+	modes = [(spawn_chance, lives, speed_range, life_length, args.game_mode) for spawn_chance, lives, speed_range, life_length in itertools.product(args.spawn_chance, args.lives, speed_ranges, args.life_length)]
+	tasks = [(mode, args.policy, args.seed + game, args.max_ticks) for mode in modes for game in range(args.games)]
+
+	# Every game is independent, so handing them out to the workers in chunks keeps every core busy with little overhead
+	start = perf_counter()
+	results = {}
+	with multiprocessing.Pool(args.workers, initializer = start_worker) as pool:
+		for mode, *summary in pool.imap_unordered(play, tasks, chunksize = max(1, len(tasks)//(args.workers*8))):
+			results.setdefault(repr(mode), (mode, []))[1].append(summary)
+		# Let the workers exit on their own. Leaving the with block would send them SIGTERM, which pygame catches and turns into a QUIT event, so they would never exit
+		pool.close()
+		pool.join()
+	seconds = perf_counter() - start
+
+	summaries = [summarise(mode, games) for mode, games in results.values()]
+	summaries.sort(key = lambda summary: (summary["spawn_chance"], summary["lives"], summary["speed_range"], summary["life_length"]))
+	with open(args.output, "w") as output_file:
+		json.dump({"policy": args.policy, "games_per_setting": args.games, "max_ticks": args.max_ticks, "seconds": seconds, "settings": summaries}, output_file, indent = 1)
+	print(f"Played {len(tasks)} games of {len(modes)} settings on {args.workers} workers in {seconds:.1f} s. Results are in {args.output}")
@@ -0,0 +1,174 @@
+# Records what happens on every tick of a game (the circle count, spawns, hits and frame time) to a compact binary session file, and summarises many session files.
+# Samples are buffered in typed arrays, one per column, and every CHUNK_TICKS ticks the full buffers are handed to a background thread that writes them, so the game loop never waits for the disk.
+# Usage: python telemetry.py session_file [session_file ...] [--json summary.json]
+
+import argparse
+import json
+import queue
+import struct
+import sys
+import threading
+from array import array
+
+MAGIC = b"CGTL" # Marks the start of every session file
+VERSION = 1
+HEADER = struct.Struct("<4sBBQH") # Magic, version, GAME_MODE, seed and ticks per second
+CHUNK = struct.Struct("<cI") # Starts each chunk: its kind and the number of ticks in it (or the ticks survived, for the end chunk)
+SAMPLES, END = b"S", b"E" # The kinds of chunk. A samples chunk holds each column in turn, and the end chunk marks a game that ended with the player dying
+COLUMNS = (("tick", "I"), ("circles", "H"), ("spawns", "B"), ("hits", "B"), ("frame_us", "I")) # The name and array type code of each column, in the order they are stored
+CHUNK_TICKS = 600 # The writer hands its buffers to the background thread every this many ticks
+FRAME_BUCKET_US = 250 # Frame times are counted in buckets this many microseconds wide when summarising, so that percentiles don't need every frame time in memory
+MAX_FRAME_BUCKET = 400 # Frame times of 100 ms or more all go in the last bucket
+
+
+# Streams the samples of one game to a session file
+class TelemetryWriter:
+	def __init__(self, path, game_mode, seed, tick_rate):
+		self.file = open(path, "xb") # Never overwrites another session
+		self.file.write(HEADER.pack(MAGIC, VERSION, game_mode, seed, tick_rate))
+		self.columns = self.new_columns()
+		self.queue = queue.Queue() # Chunks waiting to be written. None tells the thread to stop
+		self.thread = threading.Thread(target = self.write_chunks, daemon = True)
+		self.thread.start()
+
+	@staticmethod
+	def new_columns():
+		return [array(typecode) for _, typecode in COLUMNS]
+
+	def record(self, tick, circles, spawns, hits, frame_us):
+		tick_column, circle_column, spawn_column, hit_column, frame_column = self.columns
+		tick_column.append(tick)
+		circle_column.append(min(circles, 65535))
+		spawn_column.append(min(spawns, 255))
+		hit_column.append(min(hits, 255))
+		frame_column.append(min(frame_us, 4294967295))
+		if len(tick_column) >= CHUNK_TICKS:
+			self.flush()
+
+	# Hands the buffered samples to the background thread and starts new buffers
+	def flush(self):
+		if len(self.columns[0]):
+			self.queue.put((SAMPLES, self.columns))
+			self.columns = self.new_columns()
+
+	# Writes the last samples and, if the player died, how many ticks they survived, then waits for the file to be written
+	def close(self, survived = None):
+		self.flush()
+		if survived is not None:
+			self.queue.put((END, survived))
+		self.queue.put(None)
+		self.thread.join()
+
+	# Runs on the background thread, writing each chunk it is given
+	def write_chunks(self):
+		while True:
+			chunk = self.queue.get()
+			if chunk is None:
+				self.file.close()
+				return
+			kind, contents = chunk
+			if kind == END:
+				self.file.write(CHUNK.pack(END, contents))
+				continue
+			self.file.write(CHUNK.pack(SAMPLES, len(contents[0])))
+			for column in contents:
+				if sys.byteorder != "little": # Session files are always little-endian, so they can be shared between machines
+					column.byteswap()
+				column.tofile(self.file)
+
+
+# Reads a session file one chunk at a time. Yields ("header", (game_mode, seed, tick_rate)) first, then ("samples", columns) for each chunk and ("end", survived) if the player died.
+# A chunk cut short (by the game closing before the file was finished) ends the file early
+def read_session(path):
+	with open(path, "rb") as session_file:
+		magic, version, game_mode, seed, tick_rate = HEADER.unpack(session_file.read(HEADER.size))
+		if magic != MAGIC or version != VERSION:
+			raise ValueError(f"{path} is not a version {VERSION} circle_game session file")
+		yield "header", (game_mode, seed, tick_rate)
+
+		while True:
+			data = session_file.read(CHUNK.size)
+			if len(data) < CHUNK.size:
+				return
+			kind, count = CHUNK.unpack(data)
+			if kind == END:
+				yield "end", count
+				continue
+			columns = {}
+			for name, typecode in COLUMNS:
+				column = array(typecode)
+				data = session_file.read(count*column.itemsize)
+				if len(data) < count*column.itemsize:
+					return
+				column.frombytes(data)
+				if sys.byteorder != "little":
+					column.byteswap()
+				columns[name] = column
+			yield "samples", columns
+
+
+# Returns the value a fraction of the way through the frame time histogram, in milliseconds
+def histogram_percentile(histogram, fraction):
+	target = fraction*sum(histogram)
+	seen = 0
+	for bucket, count in enumerate(histogram):
+		seen += count
+		if count and seen >= target:
+			return (bucket + 0.5)*FRAME_BUCKET_US/1000
+	return 0
+
+# Streams over every session file and returns a summary for each game mode
+def summarise(paths):
+	modes = {}
+	for path in paths:
+		mode = None
+		for kind, contents in read_session(path):
+			if kind == "header":
+				game_mode, _, tick_rate = contents
+				mode = modes.setdefault(game_mode, {"sessions": 0, "deaths": 0, "survived_ticks": 0, "ticks": 0, "circle_ticks": 0, "max_circles": 0, "spawns": 0, "hits": 0, "frames": [0]*(MAX_FRAME_BUCKET + 1), "tick_rate": tick_rate})
+				mode["sessions"] += 1
+			elif kind == "samples":
+				mode["ticks"] += len(contents["tick"])
+				mode["circle_ticks"] += sum(contents["circles"])
+				mode["max_circles"] = max(mode["max_circles"], max(contents["circles"]))
+				mode["spawns"] += sum(contents["spawns"])
+				mode["hits"] += sum(contents["hits"])
+				frames = mode["frames"]
+				for frame_us in contents["frame_us"]:
+					frames[min(frame_us//FRAME_BUCKET_US, MAX_FRAME_BUCKET)] += 1
+			else:
+				mode["deaths"] += 1
+				mode["survived_ticks"] += contents
+
+	summaries = {}
+	for game_mode, mode in sorted(modes.items()):
+		ticks, tick_rate = mode["ticks"], mode["tick_rate"]
+		summaries[game_mode] = {
+			"sessions": mode["sessions"],
+			"deaths": mode["deaths"],
+			"mean_survival_seconds": mode["survived_ticks"]/mode["deaths"]/tick_rate if mode["deaths"] else None,
+			"ticks": ticks,
+			"mean_circles": mode["circle_ticks"]/ticks if ticks else 0,
+			"max_circles": mode["max_circles"],
+			"spawns_per_second": mode["spawns"]/ticks*tick_rate if ticks else 0,
+			"hits_per_minute": mode["hits"]/ticks*tick_rate*60 if ticks else 0,
+			"frame_p50_ms": histogram_percentile(mode["frames"], 0.5),
+			"frame_p99_ms": histogram_percentile(mode["frames"], 0.99),
+		}
+	return summaries
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Summarise circle_game telemetry session files")
+	parser.add_argument("paths", nargs = "+", help = "session files to read")
+	parser.add_argument("--json", metavar = "FILE", help = "also write the summary to this JSON file")
+	args = parser.parse_args()
+
+	summaries = summarise(args.paths)
+	print(f"{'mode':>4} {'sessions':>8} {'deaths':>6} {'survival s':>10} {'circles':>7} {'max':>5} {'spawns/s':>8} {'hits/min':>8} {'p50 ms':>7} {'p99 ms':>7}")
+	for game_mode, summary in summaries.items():
+		survival = f"{summary['mean_survival_seconds']:.1f}" if summary["mean_survival_seconds"] is not None else "-"
+		print(f"{game_mode:>4} {summary['sessions']:>8} {summary['deaths']:>6} {survival:>10} {summary['mean_circles']:>7.1f} {summary['max_circles']:>5} {summary['spawns_per_second']:>8.2f} {summary['hits_per_minute']:>8.1f} {summary['frame_p50_ms']:>7.2f} {summary['frame_p99_ms']:>7.2f}")
+	if args.json:
+		with open(args.json, "w") as json_file:
+			json.dump(summaries, json_file, indent = 1)
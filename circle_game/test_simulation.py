@@ -0,0 +1,105 @@
+# Checks that the faster ways circle_game's simulation was rewritten still play out exactly the same games as the straightforward ways they replaced.
+# Run with: python -m unittest (from the circle_game folder). The timings of the same comparisons are in benchmark.py
+
+import unittest
+import headless
+game = headless.game
+
+TICKS = 600 # Ticks played in each game
+SEEDS = (0, 1, 2)
+
+
+# The straightforward way of removing circles, building a new list of the survivors and never putting a circle back in the pool, for checking the pooled compaction against
+def reference_move_circles(mouse, circles, timer):
+	circles[:] = [circle for circle in circles if not circle.move(mouse, timer)]
+	if game.GAME_MODE == game.CROWDED_MODE:
+		game.separate_circles(circles)
+
+def reference_collide_circles(mouse, circles, since_hit):
+	result = ""
+	survivors = []
+	for circle in circles:
+		collision = mouse.collide(circle, since_hit) if result != "dead" else ""
+		if collision == "pop":
+			since_hit = 0
+			result = "pop"
+			continue
+		if collision == "dead":
+			result = "dead"
+		survivors.append(circle)
+	circles[:] = survivors
+	return result
+
+# Returns what can be seen of every circle, in order, for comparing two games that don't share circle objects
+def circle_states(circles):
+	return [(circle.x, circle.y, circle.radius, circle.color, circle.speed) for circle in circles]
+
+
+# Plays games with the list of Circle objects, once with reference_move_circles() and reference_collide_circles() and once with the pooled in-place compaction of move_circles() and collide_circles()
+class CompactionTest(unittest.TestCase):
+	def setUp(self):
+		saved = game.VECTORIZED, game.SCHEDULED_COLLISIONS, game.POOL, game.move_circles, game.collide_circles
+		def restore():
+			game.VECTORIZED, game.SCHEDULED_COLLISIONS, game.POOL, game.move_circles, game.collide_circles = saved
+		self.addCleanup(restore)
+		game.VECTORIZED, game.SCHEDULED_COLLISIONS = False, False # The schedule removes popped circles with list.remove() instead of compacting
+
+	# The circles left after every tick must be the same in both, and the compacted list must never hold a circle twice or a circle that is back in the pool,
+	# which shows compaction never skips a circle or removes one twice
+	def test_compaction_matches_reference(self):
+		for mode_index in range(len(game.GAME_MODES)):
+			for seed in SEEDS:
+				with self.subTest(mode = mode_index, seed = seed):
+					self.check_game(mode_index, seed)
+
+	def check_game(self, mode_index, seed):
+		move_circles, collide_circles = game.move_circles, game.collide_circles
+		reference = []
+		game.POOL = game.CirclePool()
+		game.move_circles, game.collide_circles = reference_move_circles, reference_collide_circles
+		try:
+			headless.run(game.GAME_MODES[mode_index], max_ticks = TICKS, draw = False, min_circles = 100, invincible = True, seed = seed, observe = lambda tick, mouse, circles: reference.append(circle_states(circles)))
+		finally:
+			game.move_circles, game.collide_circles = move_circles, collide_circles
+
+		ticks = []
+		def observe(tick, mouse, circles):
+			ticks.append(tick)
+			pooled = {id(circle) for circle in game.POOL.free}
+			self.assertEqual(len({id(circle) for circle in circles}), len(circles), f"a circle is in the list twice on tick {tick}")
+			self.assertFalse(any(id(circle) in pooled for circle in circles), f"a circle in the list is also in the pool on tick {tick}")
+			self.assertLessEqual(tick, len(reference), "the game outlasted the reference")
+			self.assertEqual(circle_states(circles), reference[tick - 1], f"the circles differ from the reference on tick {tick}")
+		headless.run(game.GAME_MODES[mode_index], max_ticks = TICKS, draw = False, min_circles = 100, invincible = True, seed = seed, observe = observe)
+		self.assertEqual(len(ticks), len(reference))
+
+
+# Plays the same games with the list of Circle objects, checking collisions against every circle every tick and with the collision schedule (see collision_schedule.py)
+class ScheduleTest(unittest.TestCase):
+	def setUp(self):
+		saved = game.VECTORIZED, game.SCHEDULED_COLLISIONS
+		def restore():
+			game.VECTORIZED, game.SCHEDULED_COLLISIONS = saved
+		self.addCleanup(restore)
+		game.VECTORIZED = False # The schedule is only used by the list of Circle objects
+
+	# The circles left after every tick must be the same with both, which shows the schedule pops exactly the same circles as brute force,
+	# with the mouse going round at a steady speed and with it speeding up gradually
+	def test_schedule_matches_brute_force(self):
+		for path_name, path in (("orbit", headless.orbit_path), ("accelerating", headless.accelerating_path)):
+			for count in (100, 500):
+				for seed in SEEDS:
+					with self.subTest(path = path_name, circles = count, seed = seed):
+						games = []
+						for game.SCHEDULED_COLLISIONS in (False, True):
+							states = []
+							headless.run(game.GAME_MODES[0], path = path(), max_ticks = TICKS, draw = False, min_circles = count, invincible = True, seed = seed, observe = lambda tick, mouse, circles: states.append(circle_states(circles)))
+							games.append(states)
+						brute, scheduled = games
+						self.assertEqual(len(scheduled), len(brute))
+						tick = next((tick for tick, (brute_state, scheduled_state) in enumerate(zip(brute, scheduled), 1) if brute_state != scheduled_state), None)
+						self.assertIsNone(tick, f"the schedule left different circles to brute force on tick {tick}")
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,69 @@
+# Caches rendered text so that the font only rasterizes each piece of text once.
+# Whole strings are kept in a bounded memo, and numbers are built out of a pre-rendered atlas of digit images so that a changing timer never needs the font.
+
+from collections import OrderedDict
+import pygame
+
+ATLAS_CHARACTERS = "0123456789.-" # The characters numbers are built from
+
+
+class TextCache:
+	def __init__(self, font, color, max_strings = 64):
+		self.font = font
+		self.color = color
+		self.max_strings = max_strings # Once this many strings are stored, the least recently used one is thrown away for each new one
+		self.strings = OrderedDict() # Maps text to its rendered image. Ordered from least to most recently used
+		self.atlas = None # One image holding every character in ATLAS_CHARACTERS, built the first time a number is drawn
+		self.areas = {} # Maps each character in the atlas to the area of the atlas it is in
+
+		# Counters for checking how well the cache is working
+		self.hits = 0
+		self.misses = 0
+
+	# Returns the rendered image of a string, the same as font.render(text, 1, color)
+	def render(self, text):
+		image = self.strings.get(text)
+		if image is not None:
+			self.hits += 1
+			self.strings.move_to_end(text)
+			return image
+
+		self.misses += 1
+		image = self.font.render(text, 1, self.color)
+		if pygame.display.get_surface() is not None:
+			image = image.convert_alpha() # Match the screen's pixel format so blits don't have to convert every pixel
+		self.strings[text] = image
+		if len(self.strings) > self.max_strings:
+			self.strings.popitem(last = False)
+		return image
+
+	# Renders every atlas character once and packs them side by side into one image
+	def build_atlas(self):
+		glyphs = [self.font.render(character, 1, self.color) for character in ATLAS_CHARACTERS]
+		self.atlas = pygame.Surface((sum(glyph.get_width() for glyph in glyphs), max(glyph.get_height() for glyph in glyphs)), pygame.SRCALPHA)
+		x = 0
+		for character, glyph in zip(ATLAS_CHARACTERS, glyphs):
+			self.areas[character] = self.atlas.blit(glyph, (x, 0))
+			x += glyph.get_width()
+		if pygame.display.get_surface() is not None:
+			self.atlas = self.atlas.convert_alpha()
+
+	# Draws a row of text pieces starting at position and returns the area drawn on.
+	# Strings are drawn from the string memo and numbers are drawn character by character from the atlas, so a changing number never needs the font
+	def draw(self, surface, position, *pieces):
+		x, y = position
+		batch = []
+		for piece in pieces:
+			if isinstance(piece, str):
+				image = self.render(piece)
+				batch.append((image, (x, y)))
+				x += image.get_width()
+				continue
+			if self.atlas is None:
+				self.build_atlas()
+			for character in str(piece):
+				area = self.areas[character]
+				batch.append((self.atlas, (x, y), area))
+				x += area.width
+		surface.blits(batch, False)
+		return pygame.Rect(position[0], y, x - position[0], self.font.get_height())
@@ -0,0 +1,399 @@
+# Measures the platformer without opening a window.
+# Usage: python benchmark.py [--rooms 4 64 1024 4096] [--transitions 200] [--prefetch] [--scroll] [--builder [COLUMNS ...]] [--history [COLUMNS ...]] [--frames 600] [--physics] [--ticks 240] [--assets]
+
+import argparse
+import math
+import time
+import os
+import random
+import sys
+import tempfile
+from time import perf_counter
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # SDL's dummy driver renders to memory instead of opening a window. This must be set before pygame is imported
+import pygame
+import platformer as game
+import level_pack
+import room_cache
+import tile_grid
+import world
+import key_trace
+import edit_history
+
+SCREEN = (1920, 1080) # The dummy driver's screen is 4:3, which is taller than a room, so the benchmark draws to a 16:9 screen instead
+pygame.display.quit() # The dummy driver keeps the size of the fullscreen window the game opened, unless the display is started again
+pygame.display.init()
+game.set_screen(pygame.display.set_mode(SCREEN))
+
+
+# Reads one room the way the platformer used to on every room transition: reading the whole levels file and splitting all of it
+def read_room_from_text(path, level):
+	with open(path, "r") as levels_text:
+		levels = levels_text.read()
+	all_levels = levels.split("|")
+	for row_index, row in enumerate(all_levels):
+		all_levels[row_index] = row.split("-")
+	return all_levels[level[0]][level[1]].split("/")
+
+# Writes a levels file with the given number of rooms, made by repeating the rooms of levels.txt in a square-ish grid
+def write_world(path, room_total):
+	with open("levels.txt", "r") as levels_text:
+		rooms = [room for row in level_pack.parse_levels(levels_text.read()) for room in row]
+	columns = max(1, int(room_total**0.5))
+	rows = [[rooms[(i + j) % len(rooms)] for j in range(min(columns, room_total - i))] for i in range(0, room_total, columns)]
+	with open(path, "w") as levels_text:
+		levels_text.write("|".join("-".join("/".join(room) for room in row) for row in rows))
+	return [len(row) for row in rows]
+
+# Times loading random rooms from worlds of each size, from the text file and from a compiled pack, and checks the two agree
+def transition_sweep(room_totals, transitions):
+	print(f"{'rooms':>6} {'text kB':>8} {'compile ms':>10} {'text ms':>8} {'pack us':>8} {'construct ms':>12}")
+	results = []
+	with tempfile.TemporaryDirectory() as folder:
+		text_path, pack_path = os.path.join(folder, "levels.txt"), os.path.join(folder, "levels.pack")
+		for room_total in room_totals:
+			row_lengths = write_world(text_path, room_total)
+			start = perf_counter()
+			level_pack.compile_pack(text_path, pack_path)
+			compile_time = perf_counter() - start
+			pack = level_pack.LevelPack(pack_path)
+			levels = [[row] for row in random.Random(room_total).choices(range(len(row_lengths)), k = transitions)]
+			for level in levels:
+				level.append(random.randrange(row_lengths[level[0]]))
+
+			start = perf_counter()
+			text_rooms = [read_room_from_text(text_path, level) for level in levels]
+			text_time = perf_counter() - start
+			start = perf_counter()
+			pack_rooms = [pack.room(level) for level in levels]
+			pack_time = perf_counter() - start
+			if text_rooms != pack_rooms:
+				raise SystemExit(f"The level pack of {room_total} rooms holds different rooms to the text")
+
+			# A whole transition also builds the room's tiles and draws its tile screen, which doesn't depend on the size of the world
+			game.LEVELS = pack
+			start = perf_counter()
+			for level in levels[:20]:
+				game.construct_tiles(level)
+			construct_time = perf_counter() - start
+			pack.close()
+
+			result = {"rooms": room_total, "text_kb": os.path.getsize(text_path)/1024, "compile_ms": 1000*compile_time, "text_ms": 1000*text_time/transitions, "pack_us": 1000000*pack_time/transitions, "construct_ms": 1000*construct_time/min(transitions, 20)}
+			results.append(result)
+			print(f"{room_total:>6} {result['text_kb']:>8.0f} {result['compile_ms']:>10.1f} {result['text_ms']:>8.3f} {result['pack_us']:>8.1f} {result['construct_ms']:>12.2f}")
+	return results
+
+# Times building the first room with an empty asset cache and again with a full one, and counts how many times tile images were scaled
+def room_build_benchmark(builds):
+	game.ASSETS = game.assets.AssetCache()
+	start = perf_counter()
+	grid = game.construct_tiles([0, 0])[2]
+	cold_time = perf_counter() - start
+	start = perf_counter()
+	for _ in range(builds):
+		game.construct_tiles([0, 0])
+	warm_time = (perf_counter() - start)/builds
+	tile_total = grid.columns*grid.rows # The room's grid has a place for every tile drawn
+	print(f"First room build: {1000*cold_time:.2f} ms, later builds: {1000*warm_time:.2f} ms")
+	print(f"Scaled {game.ASSETS.scales} images for {tile_total} tiles (scaling every tile type for every tile would be {3*tile_total})")
+	return {"cold_ms": 1000*cold_time, "warm_ms": 1000*warm_time, "scales": game.ASSETS.scales, "tiles": tile_total}
+
+# Walks between neighbouring rooms of a world and times the frame work of each room transition, building rooms on the spot and with the room cache.
+# Before each transition the background thread is given time to finish prefetching, as it would while the player crosses the room
+def prefetch_benchmark(room_total, transitions):
+	with tempfile.TemporaryDirectory() as folder:
+		text_path, pack_path = os.path.join(folder, "levels.txt"), os.path.join(folder, "levels.pack")
+		write_world(text_path, room_total)
+		level_pack.compile_pack(text_path, pack_path)
+		game.LEVELS = level_pack.LevelPack(pack_path)
+		generator = random.Random(room_total)
+		walk = [(0, 0)]
+		for _ in range(transitions):
+			walk.append(generator.choice(list(game.neighbours(walk[-1]))))
+
+		direct_times = []
+		for level in walk[1:]:
+			start = perf_counter()
+			game.construct_tiles(list(level))
+			direct_times.append(perf_counter() - start)
+
+		game.ROOMS = room_cache.RoomCache(game.construct_tiles)
+		game.enter_room(list(walk[0]))
+		cached_times = []
+		for level in walk[1:]:
+			game.ROOMS.wait()
+			start = perf_counter()
+			game.enter_room(list(level))
+			cached_times.append(perf_counter() - start)
+		game.ROOMS.wait() # The background thread reads the pack, so it has to finish before the pack is closed
+		game.LEVELS.close()
+
+	results = {}
+	for name, times in (("built on the spot", direct_times), ("room cache", cached_times)):
+		times.sort()
+		results[name] = {"p50_ms": 1000*times[len(times)//2], "max_ms": 1000*times[-1]}
+		print(f"{name:<18} transition p50 {results[name]['p50_ms']:6.2f} ms   max {results[name]['max_ms']:6.2f} ms")
+	print(f"Room cache: {game.ROOMS.hits} hits, {game.ROOMS.waits} waits for the background thread, {game.ROOMS.misses} misses")
+	return results
+
+# Checks if a tile overlaps the player on an axis ("x", "y" or "both"), the way Tile.colliding() did before rooms had a grid of solid tiles
+def old_colliding(tile, player, axis):
+	if tile.type == "Z":
+		return False
+	if axis == "x":
+		return player.x + player.width > tile.x and player.x < tile.x + tile.width
+	if axis == "y":
+		return player.y + player.height > tile.y and player.y < tile.y + tile.width
+	return old_colliding(tile, player, "x") and old_colliding(tile, player, "y")
+
+# Moves the player out of the tiles around it the way collideplayer() did before rooms had a grid of solid tiles: a pixel at a time, one tile at a time
+def old_collide(player, tiles, grav, vel, tile_size):
+	y_collision = False
+	player_location_x = int(player.x/tile_size)
+	player_location_y = int((game.HEIGHT - player.y)/tile_size)
+	new_tiles = []
+	for j in range(-1, int(game.PLAYER_TO_TILE_Y) + 2):
+		col = player_location_y - j
+		if col < 0 or col >= len(tiles):
+			continue
+		for i in range(-1, int(game.PLAYER_TO_TILE_X) + 2):
+			row = player_location_x + i
+			if row < 0 or row >= len(tiles[col]):
+				continue
+			new_tiles.append(tiles[col][row])
+
+	for tile in new_tiles:
+		if old_colliding(tile, player, "both"):
+			player.x -= vel
+			if old_colliding(tile, player, "both") and grav != 0:
+				while old_colliding(tile, player, "y"):
+					player.y += grav/abs(grav)
+				if grav/abs(grav) == -1:
+					y_collision = True
+				grav = 0
+			player.x += vel
+			player.y += grav
+			if old_colliding(tile, player, "both") and vel != 0:
+				while old_colliding(tile, player, "x"):
+					player.x -= vel/abs(vel)
+				vel = 0
+			player.y -= grav
+	return grav, vel, y_collision
+
+# Builds the Tile objects of a room the way construct_tiles() does, for the old collision code
+def room_tiles(split_tiles, tile_size):
+	return [[game.Tile(round(tile_size*i), round(game.HEIGHT - tile_size*(j + 1)), split_tiles[j][i], tile_size) for i in range(len(split_tiles[0]))] for j in range(int(game.HEIGHT/tile_size) + 1)]
+
+# Returns the keys held down to move in a direction (-1, 0 or 1), jumping too if jump is True, in the form pygame.key.get_pressed() gives
+def held_keys(direction, jump):
+	return key_trace.HeldKeys(("L" if direction < 0 else "R" if direction > 0 else "") + ("U" if jump else ""))
+
+# Plays one tick of the player's movement the way main() does, then collides it with collide(player, grav, vel)
+def physics_tick(player, grav, vel, y_collision, keys, tile_size, collide):
+	grav, vel = game.move_player(keys, player, grav, vel, y_collision, tile_size)
+	return collide(player, grav, vel)
+
+# Yields every run of the player the physics checks play: the room, the Tile objects the old collision code uses, the room's TileGrid, the tile size, where the player starts and the keys held.
+# The player is dropped, walked and jumped from starting points step tiles apart across every room of the pack, skipping the ones inside a tile
+def physics_runs(pack, step = 0.5):
+	for row in range(pack.rows):
+		for column in range(pack.room_count(row)):
+			split_tiles = pack.room((row, column))
+			tile_size = game.WIDTH/len(split_tiles[0])
+			tiles = room_tiles(split_tiles, tile_size)
+			grid = tile_grid.TileGrid(split_tiles, len(tiles), tile_size, game.HEIGHT)
+			width, height = tile_size*game.PLAYER_TO_TILE_X, tile_size*game.PLAYER_TO_TILE_Y
+			for start_x in range(0, game.WIDTH - int(width), int(tile_size*step)):
+				for start_y in range(0, game.HEIGHT - int(height), int(tile_size)):
+					for direction, jump in ((0, False), (-1, False), (1, False), (-1, True), (1, True)):
+						player = pygame.Rect(start_x, start_y, width, height)
+						if any(old_colliding(tile, player, "both") for tile_row in tiles for tile in tile_row):
+							continue # Starting inside a tile isn't possible in the game
+						yield (row, column), tiles, grid, tile_size, player, held_keys(direction, jump)
+
+# Plays every run of physics_runs() in every room of levels.txt with the old and the new collision code and times both, on ticks where the player moved freely and on ticks where it hit something.
+# That the two put the player in the same place on every tick is checked by test_physics.py
+def physics_benchmark(ticks):
+	pack = level_pack.load()
+	times = {"old": [0, 0], "new": [0, 0]} # The seconds spent colliding on ticks where the player moved freely, and on ticks where it hit something
+	counts = {"old": [0, 0], "new": [0, 0]} # How many ticks of each kind there were
+	runs = 0
+	for _, tiles, grid, tile_size, start, keys in physics_runs(pack):
+		runs += 1
+		for name, collide in (("old", lambda player, grav, vel: old_collide(player, tiles, grav, vel, tile_size)), ("new", grid.collide)):
+			player = start.copy()
+			state = (0, 0, False)
+			for _ in range(ticks):
+				grav, vel = game.move_player(keys, player, state[0], state[1], state[2], tile_size)
+				begin = perf_counter()
+				state = collide(player, grav, vel)
+				elapsed = perf_counter() - begin
+				hit = state[0] != grav or state[1] != vel
+				times[name][hit] += elapsed
+				counts[name][hit] += 1
+				if not player.colliderect(game.WIN.get_rect()):
+					break # Left the room
+	pack.close()
+	print(f"{runs} runs, {counts['old'][0]} ticks moving freely and {counts['old'][1]} ticks hitting a floor, ceiling or wall")
+	for name, label in (("old", "Old collisions"), ("new", "Tile grid")):
+		print(f"{label:<15} {1000000*times[name][0]/max(counts[name][0], 1):6.1f} us moving freely, {1000000*times[name][1]/max(counts[name][1], 1):6.1f} us hitting something")
+
+# Scrolls the camera of a scrolling world across worlds of each size at 60 frames per second, like a player running and jumping through them,
+# and times drawing each frame. The chunks the camera reaches are drawn by the background thread in the time between frames, as in the game
+def scroll_benchmark(room_totals, frames):
+	print(f"{'rooms':>6} {'frame p50 ms':>12} {'p99 ms':>7} {'max ms':>7} {'chunks':>7} {'chunk MB':>8} {'waits':>6} {'misses':>6}")
+	results = []
+	tile_size = round(game.WIDTH/30)
+	with tempfile.TemporaryDirectory() as folder:
+		text_path, pack_path = os.path.join(folder, "levels.txt"), os.path.join(folder, "levels.pack")
+		for room_total in room_totals:
+			write_world(text_path, room_total)
+			level_pack.compile_pack(text_path, pack_path)
+			pack = level_pack.LevelPack(pack_path)
+			scrolling_world = world.World(pack, tile_size, game.TILE_IMAGES, game.ASSETS, (game.WIDTH, game.HEIGHT))
+			player = pygame.Rect(0, 0, 1, 1)
+
+			# Runs right across the world at sprinting speed, bobbing up and down a screen's height, so the camera crosses chunk edges both ways
+			def path(frame):
+				return (game.WIDTH//2 + int(frame*game.SPRINT_PEAK) % max(scrolling_world.width - game.WIDTH, 1), game.HEIGHT//2 + int(game.HEIGHT*(1 - math.cos(frame/60))/2))
+			player.center = path(0)
+			scrolling_world.draw(game.WIN, scrolling_world.camera(player)) # The first frame has to draw every chunk onscreen, like entering a room does, so it isn't counted
+			scrolling_world.chunks.misses = 0
+			times = []
+			for frame in range(frames):
+				start = perf_counter()
+				player.center = path(frame)
+				camera = scrolling_world.camera(player)
+				game.WIN.fill("black")
+				scrolling_world.draw(game.WIN, camera)
+				elapsed = perf_counter() - start
+				times.append(elapsed)
+				time.sleep(max(1/60 - elapsed, 0))
+			times.sort()
+			scrolling_world.chunks.wait()
+			result = {"rooms": room_total, "frame_p50_ms": 1000*times[len(times)//2], "frame_p99_ms": 1000*times[int(0.99*len(times))], "frame_max_ms": 1000*times[-1], "chunks": len(scrolling_world.chunks.rooms), "chunk_mb": scrolling_world.chunk_bytes()/1e6, "waits": scrolling_world.chunks.waits, "misses": scrolling_world.chunks.misses}
+			results.append(result)
+			print(f"{room_total:>6} {result['frame_p50_ms']:>12.2f} {result['frame_p99_ms']:>7.2f} {result['frame_max_ms']:>7.2f} {result['chunks']:>7} {result['chunk_mb']:>8.1f} {result['waits']:>6} {result['misses']:>6}")
+			pack.close()
+	return results
+
+# Drags the level builder's mouse around maps with each number of columns, painting as it goes, and times each frame's painting when the whole tile screen is rebuilt
+# (as the builder used to) and when only the changed tiles are redrawn. Also checks the redrawn tile screen matches one built from scratch
+def builder_benchmark(column_counts, frames):
+	import level_builder as builder
+	print(f"{'columns':>7} {'tiles':>6} {'rebuild ms':>10} {'repaint ms':>10} {'changed':>8} {'matches':>8}")
+	results = []
+	for column_count in column_counts:
+		builder.TILE_COUNT_X = column_count
+		builder.TILE_SIZE = builder.WIDTH/column_count
+		tiles = [["Z"]*column_count for _ in range(int(builder.HEIGHT/builder.TILE_SIZE) + 1)]
+		tile_screen = builder.create_tile_screen(tiles)
+		generator = random.Random(column_count)
+		mouse = (column_count//2, len(tiles)//2)
+		rebuild_time = repaint_time = changed = 0
+		for frame in range(frames):
+			last_mouse = mouse
+			mouse = (min(max(mouse[0] + generator.randint(-2, 2), 0), column_count - 1), min(max(mouse[1] + generator.randint(-2, 2), 0), len(tiles) - 1))
+			drawing_mode = "ab"[frame//60 % 2] # Switches between the two tile types every second, so most frames paint over earlier tiles
+			start = perf_counter()
+			changed += builder.paint_line(tile_screen, tiles, last_mouse, mouse, drawing_mode, edit_history.Edit())
+			repaint_time += perf_counter() - start
+			if frame < 120: # Rebuilding is slow, so it is only timed for the first two seconds
+				start = perf_counter()
+				builder.create_tile_screen(tiles)
+				rebuild_time += perf_counter() - start
+		matches = pygame.image.tobytes(tile_screen, "RGBA") == pygame.image.tobytes(builder.create_tile_screen(tiles), "RGBA")
+		result = {"columns": column_count, "tiles": column_count*len(tiles), "rebuild_ms": 1000*rebuild_time/min(frames, 120), "repaint_ms": 1000*repaint_time/frames, "changed": changed, "matches": matches}
+		results.append(result)
+		print(f"{column_count:>7} {result['tiles']:>6} {result['rebuild_ms']:>10.2f} {result['repaint_ms']:>10.3f} {changed:>8} {str(matches):>8}")
+	return results
+
+# Flood fills and rectangle fills maps with each number of columns in the level builder, then undoes and redoes every fill, timing each and checking undoing gets back the exact map and tile screen.
+# Also compares the memory the history uses with keeping a copy of the whole map for every step, and checks the history's memory limit is kept to
+def history_benchmark(column_counts):
+	import level_builder as builder
+	print(f"{'columns':>7} {'tiles':>6} {'edit':>9} {'changed':>7} {'edit ms':>8} {'undo ms':>8} {'redo ms':>8} {'delta B':>8} {'copy B':>8} {'matches':>8}")
+	results = []
+	for column_count in column_counts:
+		builder.TILE_COUNT_X = column_count
+		builder.TILE_SIZE = builder.WIDTH/column_count
+		row_count = int(builder.HEIGHT/builder.TILE_SIZE) + 1
+		generator = random.Random(column_count)
+		tiles = [["a" if generator.random() < 0.2 or i % 10 == 0 else "Z" for i in range(column_count)] for _ in range(row_count)] # Scattered walls with a column of wall every 10 tiles, so flood fills have edges to follow
+		tile_screen = builder.create_tile_screen(tiles)
+		history = edit_history.EditHistory()
+		snapshots = [] # The map and tile screen before each edit
+		edits = [
+			("flood", lambda edit: builder.flood_fill(tiles, next((i, j) for j in range(row_count) for i in range(column_count) if tiles[j][i] == "Z"), "b", edit)),
+			("rectangle", lambda edit: builder.fill_rectangle(tiles, (column_count//4, row_count//4), (3*column_count//4, 3*row_count//4), "a", edit)),
+			("small", lambda edit: builder.fill_rectangle(tiles, (1, 1), (3, 3), "Z", edit)),
+			("whole map", lambda edit: builder.fill_rectangle(tiles, (0, 0), (column_count - 1, row_count - 1), "Z", edit)),
+		]
+		timings = []
+		for name, fill in edits:
+			snapshots.append(([row[:] for row in tiles], pygame.image.tobytes(tile_screen, "RGBA")))
+			edit = edit_history.Edit()
+			start = perf_counter()
+			changed = fill(edit)
+			delta = history.record(edit)
+			builder.redraw_tiles(tile_screen, tiles, changed)
+			timings.append([name, len(changed), perf_counter() - start, delta.bytes()])
+		matches = True
+		for timing, snapshot in zip(reversed(timings), reversed(snapshots)):
+			start = perf_counter()
+			builder.redraw_tiles(tile_screen, tiles, history.undo(tiles, column_count))
+			timing.append(perf_counter() - start)
+			matches = matches and (tiles, pygame.image.tobytes(tile_screen, "RGBA")) == snapshot
+		for timing in timings:
+			start = perf_counter()
+			builder.redraw_tiles(tile_screen, tiles, history.redo(tiles, column_count))
+			timing.append(perf_counter() - start)
+		copy_bytes = sys.getsizeof(tiles) + sum(sys.getsizeof(row) for row in tiles) # A copy of the map shares the tile type strings, but not the lists
+		for name, changed, edit_time, delta_bytes, undo_time, redo_time in timings:
+			print(f"{column_count:>7} {column_count*row_count:>6} {name:>9} {changed:>7} {1000*edit_time:>8.2f} {1000*undo_time:>8.2f} {1000*redo_time:>8.2f} {delta_bytes:>8} {copy_bytes:>8} {str(matches):>8}")
+			results.append({"columns": column_count, "edit": name, "changed": changed, "edit_ms": 1000*edit_time, "undo_ms": 1000*undo_time, "redo_ms": 1000*redo_time, "delta_bytes": delta_bytes, "copy_bytes": copy_bytes, "matches": matches})
+		print(f"history: {history}")
+
+	# A long session of brush strokes has to stay under the memory limit, dropping the oldest strokes first
+	history = edit_history.EditHistory(64*1024)
+	for stroke in range(5000):
+		edit = edit_history.Edit()
+		for index in range(stroke % 50, stroke % 50 + 20):
+			edit.change(index*7, "Z", "a")
+		history.record(edit)
+	print(f"5000 strokes with a 64 KB limit: {history}")
+	return results
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Benchmark the platformer")
+	parser.add_argument("--rooms", type = int, nargs = "+", default = [4, 64, 1024, 4096], help = "world sizes, in rooms, to load rooms from")
+	parser.add_argument("--transitions", type = int, default = 200, help = "rooms to load from each world")
+	parser.add_argument("--prefetch", action = "store_true", help = "time room transitions with and without the room cache, walking through the first of --rooms, instead of loading rooms")
+	parser.add_argument("--scroll", action = "store_true", help = "time drawing frames while scrolling across worlds of each of --rooms, instead of loading rooms")
+	parser.add_argument("--frames", type = int, default = 600, help = "frames to scroll for in each world with --scroll")
+	parser.add_argument("--builder", type = int, nargs = "*", metavar = "COLUMNS", help = "time painting in the level builder on maps with these numbers of columns (30 and 120 if none are given), instead of loading rooms")
+	parser.add_argument("--history", type = int, nargs = "*", metavar = "COLUMNS", help = "time flood and rectangle fills, undo and redo in the level builder on maps with these numbers of columns (30 and 120 if none are given), instead of loading rooms")
+	parser.add_argument("--physics", action = "store_true", help = "time the tile grid collisions against the old collision code in every room of levels.txt, instead of loading rooms")
+	parser.add_argument("--ticks", type = int, default = 240, help = "ticks to play from each starting point with --physics")
+	parser.add_argument("--assets", action = "store_true", help = "time building a room with an empty and a full asset cache instead of loading rooms")
+	args = parser.parse_args()
+
+	if args.prefetch:
+		prefetch_benchmark(args.rooms[0], args.transitions)
+		raise SystemExit
+	if args.builder is not None:
+		builder_benchmark(args.builder or [30, 120], args.frames)
+		raise SystemExit
+	if args.history is not None:
+		history_benchmark(args.history or [30, 120])
+		raise SystemExit
+	if args.scroll:
+		scroll_benchmark(args.rooms, args.frames)
+		raise SystemExit
+	if args.physics:
+		physics_benchmark(args.ticks)
+		raise SystemExit
+	if args.assets:
+		room_build_benchmark(20)
+		raise SystemExit
+	transition_sweep(args.rooms, args.transitions)
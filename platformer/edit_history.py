@@ -0,0 +1,96 @@
+# Keeps the level builder's undo and redo history as the tiles each edit changed, instead of a copy of the whole map for every step.
+# Tiles are numbered row by row, and an edit is stored as runs of neighbouring tiles that went from the same old type to the same new type, so filling a big area is only a few runs.
+# Once the history uses more than its memory limit, the oldest edits are forgotten.
+
+from array import array
+
+MAX_BYTES = 4*1024*1024 # The most memory the undo and redo history may use
+EDIT_BYTES = 200 # The memory each stored edit uses besides its runs, counted so that many tiny edits still count towards the limit
+
+
+# Collects the tiles one action (a brush stroke, a fill or a whole-map change) changes, before it is stored
+class Edit:
+	def __init__(self):
+		self.changes = {} # Maps the number of each changed tile to its (old type, new type)
+
+	def change(self, index, old, new):
+		if index in self.changes:
+			old = self.changes[index][0] # A tile changed twice in one action keeps its type from before the action
+		self.changes[index] = (old, new)
+
+
+# The runs of tiles one action changed
+class Delta:
+	def __init__(self, edit):
+		self.starts = array("I") # The first tile of each run
+		self.lengths = array("I") # The number of tiles in each run
+		self.olds = array("B") # The type each run's tiles had before the action, as a character code
+		self.news = array("B") # The type each run's tiles have after the action
+		for index in sorted(edit.changes):
+			old, new = edit.changes[index]
+			if old == new:
+				continue # Changed and then changed back
+			old, new = ord(old), ord(new)
+			if self.starts and self.starts[-1] + self.lengths[-1] == index and self.olds[-1] == old and self.news[-1] == new:
+				self.lengths[-1] += 1
+			else:
+				self.starts.append(index)
+				self.lengths.append(1)
+				self.olds.append(old)
+				self.news.append(new)
+		self.tiles = sum(self.lengths) # How many tiles the action changed
+
+	def bytes(self):
+		return EDIT_BYTES + sum(len(runs)*runs.itemsize for runs in (self.starts, self.lengths, self.olds, self.news))
+
+	# Sets the tiles the action changed back to their old types (or forward to their new ones if undo is False), and returns the (column, row) of each tile changed
+	def apply(self, tiles, columns, undo = True):
+		types = self.olds if undo else self.news
+		changed = []
+		for start, length, type in zip(self.starts, self.lengths, types):
+			type = chr(type)
+			for index in range(start, start + length):
+				row, column = divmod(index, columns)
+				tiles[row][column] = type
+				changed.append((column, row))
+		return changed
+
+
+class EditHistory:
+	def __init__(self, max_bytes = MAX_BYTES):
+		self.max_bytes = max_bytes
+		self.undos = [] # Deltas that can be undone, oldest first
+		self.redos = [] # Deltas that have been undone and can be redone, most recently undone last
+		self.bytes = 0 # The memory used by every delta in both lists
+
+	# Stores an action so it can be undone. Actions that didn't change anything aren't stored. Returns the delta, or None if nothing changed
+	def record(self, edit):
+		delta = Delta(edit)
+		if not delta.tiles:
+			return None
+		self.bytes -= sum(redo.bytes() for redo in self.redos) # A new action can't be redone past
+		self.redos.clear()
+		self.undos.append(delta)
+		self.bytes += delta.bytes()
+		while self.bytes > self.max_bytes and len(self.undos) > 1:
+			self.bytes -= self.undos.pop(0).bytes()
+		return delta
+
+	# Undoes the latest action and returns the (column, row) of each tile it changed, or an empty list if there is nothing to undo
+	def undo(self, tiles, columns):
+		if not self.undos:
+			return []
+		delta = self.undos.pop()
+		self.redos.append(delta)
+		return delta.apply(tiles, columns, undo = True)
+
+	# Redoes the latest undone action and returns the (column, row) of each tile it changed, or an empty list if there is nothing to redo
+	def redo(self, tiles, columns):
+		if not self.redos:
+			return []
+		delta = self.redos.pop()
+		self.undos.append(delta)
+		return delta.apply(tiles, columns, undo = False)
+
+	def __str__(self):
+		return f"{len(self.undos)} undo and {len(self.redos)} redo steps using {self.bytes/1024:.1f} KB"
@@ -0,0 +1,67 @@
+# Reads and writes traces of the keys held on each tick of the platformer, so a run can be played back exactly by replay.py without a window.
+# A trace is a text file with a line for each stretch of ticks where the same keys were held: the number of ticks, then a letter for each key held, or "-" if none were.
+# Lines starting with "#" are comments.
+
+import pygame
+
+KEYS = { # The letter for each control in a trace, and the keys that work it
+	"L": (pygame.K_LEFT, pygame.K_a), # Left
+	"R": (pygame.K_RIGHT, pygame.K_d), # Right
+	"U": (pygame.K_UP, pygame.K_w), # Jump
+	"S": (pygame.K_LCTRL,), # Sprint
+}
+
+
+# The keys held on one tick of a trace, which can be read the same way as what pygame.key.get_pressed() returns
+class HeldKeys:
+	def __init__(self, letters):
+		self.letters = letters
+		self.held = {key for letter in letters for key in KEYS[letter]}
+
+	def __getitem__(self, key):
+		return key in self.held
+
+
+# Returns the letters of the controls held, from what pygame.key.get_pressed() returns
+def letters(keys):
+	return "".join(letter for letter, codes in KEYS.items() if any(keys[code] for code in codes))
+
+# Returns the keys held on each tick of a trace file
+def read_trace(path):
+	ticks = []
+	with open(path, "r") as trace_file:
+		for line_number, line in enumerate(trace_file, 1):
+			line = line.strip()
+			if not line or line.startswith("#"):
+				continue
+			count, _, held = line.partition(" ")
+			held = held.strip()
+			if not count.isdigit() or not held or set(held) - set(KEYS) - {"-"}:
+				raise ValueError(f"Line {line_number} of {path} should be a number of ticks and the keys held, like \"30 RU\"")
+			ticks += [HeldKeys(held.replace("-", ""))]*int(count) # Each stretch shares one HeldKeys, so long traces stay small
+	return ticks
+
+# Writes the letters of the controls held on each tick to a trace file
+def write_trace(path, ticks):
+	lines = []
+	for held in ticks:
+		held = held or "-"
+		if lines and lines[-1][1] == held:
+			lines[-1][0] += 1
+		else:
+			lines.append([1, held])
+	with open(path, "w") as trace_file:
+		trace_file.write("".join(f"{count} {held}\n" for count, held in lines))
+
+
+# Records the keys held on every tick of a game, and writes them to a trace file when it is saved
+class Recorder:
+	def __init__(self, path):
+		self.path = path
+		self.ticks = [] # The letters of the controls held on each tick
+
+	def record(self, keys):
+		self.ticks.append(letters(keys))
+
+	def save(self):
+		write_trace(self.path, self.ticks)
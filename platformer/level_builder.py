@@ -1,4 +1,5 @@
 # INSTRUCTIONS: Draw or erase tiles by left clicking. To enter drawing mode, press "1" or "2". To enter eraser mode, press "e".
+# Press "f" to flood fill the area you click on, "r" to fill a rectangle by dragging from one corner to the other, and "b" to go back to drawing tile by tile. Undo with Ctrl+Z and redo with Ctrl+Y.
 # To save the current tile configuration, hit "p" and copy and paste the printed console line into the levels file.
 
 
@@ -6,6 +7,10 @@
 #Setup
 import pygame
 import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # The asset module is shared with the other programs, so it lives in the folder above
+import assets
+import edit_history
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 pygame.init()
 
@@ -21,34 +26,19 @@ BG_COLOR = (135, 206, 235) # Background color
 TILE_COUNT_X = 30 # Number of columns
 TILE_SIZE = WIDTH/TILE_COUNT_X # The size of every tile
 
-# Allows the script to load all of the tile types
-def load(type):
-	return pygame.image.load(f"img/{type}.png")
+ASSETS = assets.AssetCache() # Loads each tile image once and keeps it scaled to the tile size
+TILE_IMAGES = {"a": "img/tile_1.png", "b": "img/tile_2.png", "Z": "img/bg_tile.png"} # The image of each tile type
 
-# Gets each tile image and assigns them to a variable
-TILE_1 = load("tile_1")
-TILE_2 = load("tile_2")
-BG_TILE = load("bg_tile")
-
-# Creates the tiles array
+# Creates the tiles array. Each row is a list of tile types, bottom row first, so a tile can be changed without rebuilding its row
 tiles = []
 for i in range(int(HEIGHT/TILE_SIZE) + 1):
-	tiles.append("")
-	for _ in range(TILE_COUNT_X):
-		tiles[i] += "Z" # A background tile is represented with the letter "Z"
+	tiles.append(["Z"] * TILE_COUNT_X) # A background tile is represented with the letter "Z"
+
+CURSOR = pygame.Surface((round(TILE_SIZE), round(TILE_SIZE))) # The semi-transparent block drawn at the mouse position. Created once and only its opacity changes
 
 # Draws a given tile to the screen
 def draw_tile(surface, type, placement, opacity = 255):
-	def scale(type):
-		return pygame.transform.scale(type, (round(TILE_SIZE), round(TILE_SIZE)))
-	
-	# Ensures the correct type of tile is drawn	
-	types = {
-		"a": scale(TILE_1),
-		"b": scale(TILE_2),
-		"Z": scale(BG_TILE)
-	}
-	surface.blit(types[type], placement)
+	surface.blit(ASSETS.scaled(TILE_IMAGES[type], (TILE_SIZE, TILE_SIZE)), placement)
 
 # Draws the tiles and mouse position to the screen
 def draw_screen(tile_screen, mouse_alpha, mouse_x, mouse_y):
@@ -56,11 +46,9 @@ def draw_screen(tile_screen, mouse_alpha, mouse_x, mouse_y):
 
 	WIN.blit(tile_screen, (0, 0))
 
-	# Creates a semi-transparent block at the mouse position to indicate where the block will be placed
-	mouse_block_surface = pygame.Surface((round(TILE_SIZE), round(TILE_SIZE)), pygame.SRCALPHA)
-	pygame.draw.rect(mouse_block_surface, (0, 0, 0), pygame.Rect(0, 0, round(TILE_SIZE), round(TILE_SIZE)))
-	mouse_block_surface.set_alpha(mouse_alpha)
-	WIN.blit(mouse_block_surface, (round(mouse_x * TILE_SIZE), round(HEIGHT - TILE_SIZE * (mouse_y + 1))))
+	# Draws a semi-transparent block at the mouse position to indicate where the block will be placed
+	CURSOR.set_alpha(mouse_alpha)
+	WIN.blit(CURSOR, (round(mouse_x * TILE_SIZE), round(HEIGHT - TILE_SIZE * (mouse_y + 1))))
 
 	# Update the screen so that everything drawn is actually displayed
 	pygame.display.update()
@@ -73,77 +61,198 @@ def create_tile_screen(tiles):
 			draw_tile(tile_screen, tile, (round(tile_index * TILE_SIZE), round(HEIGHT - TILE_SIZE * (row + 1))))
 	return tile_screen
 
+# Returns the area of the tile screen a tile is drawn on
+def tile_rect(column, row):
+	return pygame.Rect(round(column * TILE_SIZE), round(HEIGHT - TILE_SIZE * (row + 1)), round(TILE_SIZE), round(TILE_SIZE))
+
+# Changes one tile and redraws only that tile on the tile screen, adding the change to an edit_history.Edit. Returns False without doing anything if the tile is already that type
+def paint_tile(tile_screen, tiles, column, row, type, edit):
+	if tiles[row][column] == type:
+		return False
+	edit.change(row * TILE_COUNT_X + column, tiles[row][column], type)
+	tiles[row][column] = type
+	redraw_area(tile_screen, tiles, column, row, column, row)
+	return True
+
+# Redraws a rectangle of tiles on the tile screen, from the bottom left tile to the top right tile
+def redraw_area(tile_screen, tiles, left, bottom, right, top):
+	# Tile positions are rounded, so neighbouring tiles can overlap by a pixel. Redrawing the tiles around the area as well in the order create_tile_screen() draws them,
+	# clipped to the area, leaves the tile screen exactly as if it had been rebuilt
+	tile_screen.set_clip(tile_rect(left, bottom).union(tile_rect(right, top)))
+	tile_screen.fill((0, 0, 0, 0))
+	for row in range(max(bottom - 1, 0), min(top + 2, len(tiles))):
+		for column in range(max(left - 1, 0), min(right + 2, TILE_COUNT_X)):
+			draw_tile(tile_screen, tiles[row][column], tile_rect(column, row).topleft)
+	tile_screen.set_clip(None)
+
+# Redraws the tiles at a list of (column, row) positions. Redrawing a tile on its own draws the 9 tiles around it, so if that adds up to more than redrawing
+# every tile in the rectangle around the changed tiles, the rectangle is redrawn instead
+def redraw_tiles(tile_screen, tiles, changed):
+	if not changed:
+		return
+	columns = [column for column, row in changed]
+	rows = [row for column, row in changed]
+	left, bottom, right, top = min(columns), min(rows), max(columns), max(rows)
+	if 9 * len(changed) > (right - left + 3) * (top - bottom + 3):
+		redraw_area(tile_screen, tiles, left, bottom, right, top)
+	else:
+		for column, row in changed:
+			redraw_area(tile_screen, tiles, column, row, column, row)
+
+# Paints every tile on the line between two tiles, so dragging the mouse faster than a tile per frame doesn't leave gaps. Returns the number of tiles changed
+def paint_line(tile_screen, tiles, start, end, type, edit):
+	steps = max(abs(end[0] - start[0]), abs(end[1] - start[1]))
+	changed = 0
+	for step in range(steps + 1):
+		column = start[0] + round((end[0] - start[0]) * step / steps) if steps else end[0]
+		row = start[1] + round((end[1] - start[1]) * step / steps) if steps else end[1]
+		if 0 <= row < len(tiles) and 0 <= column < TILE_COUNT_X:
+			changed += paint_tile(tile_screen, tiles, column, row, type, edit)
+	return changed
+
+# Sets every tile in the rectangle between two corner tiles to one type, adding the changes to an edit. Returns the (column, row) of each tile changed
+def fill_rectangle(tiles, corner, other_corner, type, edit):
+	changed = []
+	for row in range(max(min(corner[1], other_corner[1]), 0), min(max(corner[1], other_corner[1]) + 1, len(tiles))):
+		tile_row = tiles[row]
+		for column in range(max(min(corner[0], other_corner[0]), 0), min(max(corner[0], other_corner[0]) + 1, TILE_COUNT_X)):
+			if tile_row[column] != type:
+				edit.change(row * TILE_COUNT_X + column, tile_row[column], type)
+				tile_row[column] = type
+				changed.append((column, row))
+	return changed
+
+# Sets the tile at start, and every tile of the same type joined to it, to one type, adding the changes to an edit. Returns the (column, row) of each tile changed.
+# Fills a whole stretch of a row at a time, then looks for more of the area in the rows above and below that stretch
+def flood_fill(tiles, start, type, edit):
+	column, row = start
+	if not (0 <= row < len(tiles) and 0 <= column < TILE_COUNT_X):
+		return []
+	target = tiles[row][column]
+	if target == type:
+		return []
+	changed = []
+	seeds = [start]
+	while seeds:
+		column, row = seeds.pop()
+		tile_row = tiles[row]
+		if tile_row[column] != target:
+			continue
+		left = column
+		while left > 0 and tile_row[left - 1] == target:
+			left -= 1
+		right = column
+		while right < TILE_COUNT_X - 1 and tile_row[right + 1] == target:
+			right += 1
+		for fill_column in range(left, right + 1):
+			edit.change(row * TILE_COUNT_X + fill_column, target, type)
+			tile_row[fill_column] = type
+			changed.append((fill_column, row))
+		for next_row in (row - 1, row + 1):
+			if 0 <= next_row < len(tiles):
+				next_tiles = tiles[next_row]
+				for fill_column in range(left, right + 1):
+					if next_tiles[fill_column] == target and (fill_column == left or next_tiles[fill_column - 1] != target): # One seed for each stretch of the area in the next row
+						seeds.append((fill_column, next_row))
+	return changed
+
 # The function that actually runs all the code
 def main(tiles):
 	pygame.display.update()
 	clock = pygame.time.Clock()
 	drawing_mode = "a" # Sets the type of block drawn with the mouse
 	mouse_alpha = 175 # Sets the opacity of the mouse overlay
+	tool = "brush" # What clicking does: "brush" draws tile by tile, "flood" fills an area and "rectangle" fills a rectangle
 	tile_screen = create_tile_screen(tiles) # Creates the tile screen
+	history = edit_history.EditHistory() # Every edit, so it can be undone
+	stroke = None # The edit being made by the brush while the mouse button is held down
+	last_mouse = None # The tile the mouse was over last frame, while the mouse button is held down
+	rectangle_start = None # The tile the rectangle tool was pressed on
 	draw_screen(tile_screen, 0, WIDTH, HEIGHT) # Draws the screen
 
+	# Stores a finished edit, redraws the tiles it changed and shows the history's memory use in the window title
+	def finish(edit, changed):
+		history.record(edit)
+		redraw_tiles(tile_screen, tiles, changed)
+		pygame.display.set_caption(f"{TITLE} - {history}")
+
 	while True:
 		clock.tick(60) # Sets the ticks per second to 60
 
-		# Allows the user to quit the game either by closing it manually or by pressing "q"
+		# Gets information about the mouse to help position the placed blocks
+		mouse_coords = pygame.mouse.get_pos()
+		mouse_coords = (mouse_coords[0], HEIGHT - mouse_coords[1])
+		mouse_x = int(mouse_coords[0]/TILE_SIZE)
+		mouse_y = int(mouse_coords[1]/TILE_SIZE)
+
+		# Allows the user to quit the game either by closing it manually or by pressing "q", and handles the keys and clicks that should only happen once per press
 		for event in pygame.event.get():
 			if event.type == pygame.QUIT:
 				pygame.quit()
 				quit()
+			if event.type == pygame.KEYDOWN:
+				if event.mod & pygame.KMOD_CTRL and event.key in (pygame.K_z, pygame.K_y):
+					changed = history.undo(tiles, TILE_COUNT_X) if event.key == pygame.K_z else history.redo(tiles, TILE_COUNT_X)
+					redraw_tiles(tile_screen, tiles, changed) # Undoing takes as long as redrawing what the edit changed
+					pygame.display.set_caption(f"{TITLE} - {history}")
+				elif event.key == pygame.K_f:
+					tool = "flood"
+				elif event.key == pygame.K_r:
+					tool = "rectangle"
+				elif event.key == pygame.K_b:
+					tool = "brush"
+			if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+				if tool == "flood":
+					edit = edit_history.Edit()
+					finish(edit, flood_fill(tiles, (mouse_x, mouse_y), drawing_mode, edit))
+				elif tool == "rectangle":
+					rectangle_start = (mouse_x, mouse_y)
+			if event.type == pygame.MOUSEBUTTONUP and event.button == 1 and rectangle_start is not None:
+				edit = edit_history.Edit()
+				finish(edit, fill_rectangle(tiles, rectangle_start, (mouse_x, mouse_y), drawing_mode, edit))
+				rectangle_start = None
 		keys = pygame.key.get_pressed()
 		if keys[pygame.K_q]:
 			pygame.quit()
 			quit()
 
-		# Detects the users keypresses in order to use the desired block when drawing
-		keys = pygame.key.get_pressed()
-		if keys[pygame.K_e]:
-			if keys[pygame.K_LCTRL]:
-				for row_index in range(len(tiles)):
-					tiles[row_index] = "Z" * TILE_COUNT_X
-			else:
-				drawing_mode = "Z"
-				mouse_alpha = 50
-		if keys[pygame.K_1]:
-			if keys[pygame.K_LCTRL]:
-				for row_index in range(len(tiles)):
-					tiles[row_index] = "a" * TILE_COUNT_X
-				tile_screen = create_tile_screen(tiles)
-			else:
-				drawing_mode = "a"
-				mouse_alpha = 175
-		if keys[pygame.K_2]:
-			if keys[pygame.K_LCTRL]:
-				for row_index in range(len(tiles)):
-					tiles[row_index] = "b" * TILE_COUNT_X
-				tile_screen = create_tile_screen(tiles)
-			else:
-				drawing_mode = "b"
-				mouse_alpha = 175
+		# Detects the users keypresses in order to use the desired block when drawing. Holding Ctrl fills the whole level with the block instead
+		for key, type, alpha in ((pygame.K_e, "Z", 50), (pygame.K_1, "a", 175), (pygame.K_2, "b", 175)):
+			if keys[key]:
+				if keys[pygame.K_LCTRL]:
+					edit = edit_history.Edit()
+					changed = fill_rectangle(tiles, (0, 0), (TILE_COUNT_X - 1, len(tiles) - 1), type, edit)
+					if changed: # Holding the keys down doesn't change anything after the first frame
+						finish(edit, changed)
+				else:
+					drawing_mode = type
+					mouse_alpha = alpha
 
 		# Print out the current level configuration and close the program if the player presses "p"
 		if keys[pygame.K_p]:
 			level_tiles = ""
 			for row_index, row in enumerate(tiles):
-				level_tiles += row
+				level_tiles += "".join(row)
 				if row_index < len(tiles) - 1:
 					level_tiles += "/"
 			print(level_tiles)
 			pygame.quit()
 			quit()
-		
-		# Gets information about the mouse to help position the placed blocks
-		mouse_coords = pygame.mouse.get_pos()
-		mouse_coords = (mouse_coords[0], HEIGHT - mouse_coords[1])
-		mouse_x = int(mouse_coords[0]/TILE_SIZE)
-		mouse_y = int(mouse_coords[1]/TILE_SIZE)
 
-		# Places a block
-		if pygame.mouse.get_pressed()[0]:
-			if mouse_y < len(tiles) and mouse_x < TILE_COUNT_X:
-				tiles[mouse_y] = tiles[mouse_y][:mouse_x] + drawing_mode + tiles[mouse_y][mouse_x + 1:]
-			tile_screen = create_tile_screen(tiles) # Updates the tile screen to show the new tile
+		# With the brush, places a block on every tile the mouse has passed over since the last frame, redrawing only the tiles that change. The whole stroke is undone together
+		if pygame.mouse.get_pressed()[0] and tool == "brush":
+			if stroke is None:
+				stroke = edit_history.Edit()
+			paint_line(tile_screen, tiles, last_mouse or (mouse_x, mouse_y), (mouse_x, mouse_y), drawing_mode, stroke)
+			last_mouse = (mouse_x, mouse_y)
+		else:
+			if stroke is not None:
+				history.record(stroke)
+				pygame.display.set_caption(f"{TITLE} - {history}")
+				stroke = None
+			last_mouse = None
 		
 		draw_screen(tile_screen, mouse_alpha, mouse_x, mouse_y) # Draws the screen
 
-main(tiles) # Runs the main loop
\ No newline at end of file
+if __name__ == "__main__":
+	main(tiles) # Runs the main loop
@@ -0,0 +1,91 @@
+# Compiles levels.txt into a level pack file, which the platformer memory-maps so that loading a room doesn't mean reading and splitting the whole world.
+# levels.txt holds rows of rooms separated by "|", the rooms of a row separated by "-" and the tile rows of a room (bottom row first) separated by "/".
+# A pack starts with a header, then an index of where each row of rooms starts, then an index of where each room's tiles are, then the tiles themselves at one byte each.
+# Usage: python level_pack.py [levels.txt] [levels.pack]
+
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b"EJLP" # Marks the start of every level pack
+VERSION = 1
+HEADER = struct.Struct("<4sBHH") # Magic, version, the number of rows of rooms and the total number of rooms
+ROW = struct.Struct("<HH") # One row of rooms: the index of its first room and how many rooms it has
+ROOM = struct.Struct("<IHH") # One room: where its tiles start in the file, and its width and height in tiles
+TILE_TYPES = b"abZ" # Every tile a room can hold. "Z" is the background
+
+
+# Splits the text of a levels file into rows of rooms, each room a list of its tile rows
+def parse_levels(text):
+	return [[room.split("/") for room in row.split("-")] for row in text.strip().split("|")]
+
+# Reads a levels file once and writes it to a level pack
+def compile_pack(text_path = "levels.txt", pack_path = "levels.pack"):
+	with open(text_path, "r") as levels_text:
+		world = parse_levels(levels_text.read())
+
+	rows, rooms, tiles = [], [], bytearray()
+	offset = HEADER.size + len(world)*ROW.size + sum(len(row) for row in world)*ROOM.size
+	for row_index, row in enumerate(world):
+		rows.append(ROW.pack(len(rooms), len(row)))
+		for room_index, room in enumerate(row):
+			width = len(room[0])
+			for tile_row in room:
+				if len(tile_row) != width:
+					raise ValueError(f"Room {room_index} of row {row_index} in {text_path} has tile rows of different lengths")
+				if set(tile_row) - set(TILE_TYPES.decode()):
+					raise ValueError(f"Room {room_index} of row {row_index} in {text_path} has an unknown tile type")
+				tiles += tile_row.encode("ascii")
+			rooms.append(ROOM.pack(offset, width, len(room)))
+			offset += width*len(room)
+
+	# Written next to the pack and then moved over it, so a game starting at the same time never reads half a pack
+	temporary_path = pack_path + ".tmp"
+	with open(temporary_path, "wb") as pack_file:
+		pack_file.write(HEADER.pack(MAGIC, VERSION, len(rows), len(rooms)))
+		pack_file.write(b"".join(rows))
+		pack_file.write(b"".join(rooms))
+		pack_file.write(tiles)
+	os.replace(temporary_path, pack_path)
+
+
+class LevelPack:
+	def __init__(self, path = "levels.pack"):
+		with open(path, "rb") as pack_file:
+			self.data = mmap.mmap(pack_file.fileno(), 0, access = mmap.ACCESS_READ) # Only the parts of the pack that are read get loaded from the disk
+		magic, version, self.rows, self.room_total = HEADER.unpack_from(self.data)
+		if magic != MAGIC or version != VERSION:
+			raise ValueError(f"{path} is not a version {VERSION} level pack")
+		self.rooms_start = HEADER.size + self.rows*ROW.size # Where the room index starts
+
+	# Returns the number of rooms in a row of rooms
+	def room_count(self, row):
+		return ROW.unpack_from(self.data, HEADER.size + row*ROW.size)[1]
+
+	# Returns the tile rows of the room at (row, column), bottom row first, as strings of tile types
+	def room(self, level):
+		if not 0 <= level[0] < self.rows:
+			raise IndexError(f"There is no row {level[0]}")
+		first, count = ROW.unpack_from(self.data, HEADER.size + level[0]*ROW.size)
+		if not 0 <= level[1] < count:
+			raise IndexError(f"Row {level[0]} has no room {level[1]}")
+		offset, width, height = ROOM.unpack_from(self.data, self.rooms_start + (first + level[1])*ROOM.size)
+		tiles = self.data[offset:offset + width*height].decode("ascii")
+		return [tiles[i:i + width] for i in range(0, width*height, width)]
+
+	def close(self):
+		self.data.close()
+
+
+# Opens the level pack, compiling it first if levels.txt has changed since it was last compiled (such as after pasting in a room from the level builder)
+def load(text_path = "levels.txt", pack_path = "levels.pack"):
+	if not os.path.exists(pack_path) or os.path.getmtime(pack_path) < os.path.getmtime(text_path):
+		compile_pack(text_path, pack_path)
+	return LevelPack(pack_path)
+
+
+if __name__ == "__main__":
+	compile_pack(*sys.argv[1:3])
+	pack = LevelPack(sys.argv[2] if len(sys.argv) > 2 else "levels.pack")
+	print(f"Compiled {pack.room_total} rooms in {pack.rows} rows ({len(pack.data)} bytes)")
@@ -7,30 +7,46 @@
 #Setup
 import pygame
 import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # The asset module is shared with the other programs, so it lives in the folder above
+import assets
+import level_pack
+import room_cache
+import tile_grid
+import world
+import key_trace
+import argparse
+START_FOLDER = os.getcwd() # The folder the game was started from, so paths given on the command line still work after changing folder
 os.chdir(os.path.dirname(os.path.abspath(__file__))) # Allows referencing other files within the same folder without specifying the exact path to the file
 pygame.init() # Initiates pygame
 
 #Settings
 SCREEN_INFO = pygame.display.Info()
-WIN = pygame.display.set_mode((0, 0), pygame.FULLSCREEN) # Creates the window the game runs in
-WIDTH, HEIGHT = WIN.get_width(), WIN.get_height() # Gets the width and height of the users sceeen and saves them in variables
+
+# Sets the window the game is drawn to, and the sizes and speeds worked out from the size of it. The headless replay and the benchmark use this to play on a screen of a fixed size
+def set_screen(window):
+	global WIN, WIDTH, HEIGHT, RUN_PEAK, SPRINT_PEAK, DIRECTION_SWAP_SPEED, JUMP_HEIGHT
+	WIN = window
+	WIDTH, HEIGHT = WIN.get_width(), WIN.get_height() # Gets the width and height of the users sceeen and saves them in variables
+	RUN_PEAK = WIDTH/200 # The maximum speed (in pixels per tick) of the player horizontally
+	SPRINT_PEAK = WIDTH/150 # The maximum speed (in pixels per tick) of the player vertically
+	DIRECTION_SWAP_SPEED = WIDTH/575 # The rate at which the player accelerates when changing directions
+	JUMP_HEIGHT = HEIGHT/57 # The jump strength of the player
+
+set_screen(pygame.display.set_mode((0, 0), pygame.FULLSCREEN)) # Creates the window the game runs in
 TITLE = "EJR Tile Platformer"
 pygame.display.set_caption(TITLE)
 
-# In case several block types are needed, this function allows that to happen easily.
-def load(type):
-	return pygame.image.load(f"img/{type}.png")
-
-TILE_1 = load("tile_1") # Loads the first tile image
-TILE_2 = load("tile_2") # Loads the second tile image
-BG_TILE = load("bg_tile") # Loads the tile used as the blue background
+ASSETS = assets.AssetCache() # Loads each image once and keeps a copy of it at every size it is drawn at
+TILE_IMAGES = { # The image of each tile type. In case several block types are needed, more can be added here easily.
+	"a": "img/tile_1.png", # The first tile image
+	"b": "img/tile_2.png", # The second tile image
+	"Z": "img/bg_tile.png", # The tile used as the blue background
+}
+LEVELS = level_pack.load() # The compiled levels file, which rooms are read from one at a time
 
 PLAYER_COLOR = (255, 20, 147) # Sets the player color
 PLAYER_TO_TILE_X, PLAYER_TO_TILE_Y = 1.3, 1.98 # Sets the player width and height ratio compared to the size of a tile
-RUN_PEAK = WIDTH/200 # The maximum speed (in pixels per tick) of the player horizontally
-SPRINT_PEAK = WIDTH/150 # The maximum speed (in pixels per tick) of the player vertically
-DIRECTION_SWAP_SPEED = WIDTH/575 # The rate at which the player accelerates when changing directions
-JUMP_HEIGHT = HEIGHT/57 # The jump strength of the player
 
 
 # Creating a tile object for the background and the ground
@@ -48,36 +64,12 @@ class Tile:
 			self.width
 		)
 
-	# This function checks if a tile is colliding with the player at any point
-	def colliding(self, player, axis):
-		if self.type != "Z":
-			if axis == "x":
-				if player.x + player.width > self.x and player.x < self.x + self.width:
-					return True
-			if axis == "y":
-				if player.y + player.height > self.y and player.y < self.y + self.width:
-					return True
-			if axis == "both":
-				if self.colliding(player, "x") and self.colliding(player, "y"):
-					return True
-		return False
-
-	# This function draws the tile to the screen
+	# This function draws the tile to the screen, using the image of its type scaled to the tile size. Each type is only scaled once for each tile size
 	def draw(self, surface):
-		# Scales the tile to the correct size
-		def scale(type):
-			return pygame.transform.scale(type, (round(self.width), round(self.width)))
-		
-		# Ensures the correct type of tile is drawn
-		types = {
-			"a": scale(TILE_1),
-			"b": scale(TILE_2),
-			"Z": scale(BG_TILE),
-		}
-		surface.blit(types[self.type], (self.x, self.y))
+		surface.blit(ASSETS.scaled(TILE_IMAGES[self.type], (self.width, self.width)), (self.x, self.y))
 
 # Handles player collisions and level switching
-def collideplayer(player, tiles, grav, vel, current_level, all_levels, tile_count_x, tile_size, tile_screen):
+def collideplayer(player, grid, grav, vel, current_level, all_levels, tile_count_x, tile_size, tile_screen):
 	y_collision = False # Initiates the y_collision variable. Collisions get checked later in the function
 	grav_backup, vel_backup = grav, vel
 
@@ -87,17 +79,17 @@ def collideplayer(player, tiles, grav, vel, current_level, all_levels, tile_coun
 			current_level[1] -= 1
 			player.x = WIDTH - player.width - 1
 			vel = 0
-			tile_count_x, tile_size, tiles, tile_screen = construct_tiles(current_level)
+			tile_count_x, tile_size, grid, tile_screen = enter_room(current_level)
 		else:
 			player.x = -player.width/2
 			vel = 0
 	# Handles switching a level to the right
 	if player.x + player.width/2 > WIDTH:
-		if current_level[1] < len(all_levels[current_level[0]]) - 1:
+		if current_level[1] < all_levels.room_count(current_level[0]) - 1:
 			current_level[1] += 1
 			player.x = -player.width/2 + 1
 			vel = 0
-			tile_count_x, tile_size, tiles, tile_screen = construct_tiles(current_level)
+			tile_count_x, tile_size, grid, tile_screen = enter_room(current_level)
 		else:
 			player.x = WIDTH - player.width/2
 			vel = 0
@@ -106,55 +98,22 @@ def collideplayer(player, tiles, grav, vel, current_level, all_levels, tile_coun
 		if current_level[0] > 0:
 			current_level[0] -= 1
 			player.y = HEIGHT - player.height/2 - 1
-			tile_count_x, tile_size, tiles, tile_screen = construct_tiles(current_level)
+			tile_count_x, tile_size, grid, tile_screen = enter_room(current_level)
 	# Handles switching a level up
 	if player.y + player.height/2 > HEIGHT:
-		if current_level[0] < len(all_levels) - 1:
+		if current_level[0] < all_levels.rows - 1:
 			current_level[0] += 1
 			player.y = -player.height/2 + 1
-			tile_count_x, tile_size, tiles, tile_screen = construct_tiles(current_level)
+			tile_count_x, tile_size, grid, tile_screen = enter_room(current_level)
 		else:
 			player.y = HEIGHT - player.height/2
 
 
-	# Gets the players rough location relative to the tiles onscreen
-	player_location_x = int(player.x/tile_size)
-	player_location_y = int((HEIGHT - player.y)/tile_size)
-
-	# Assembles a smaller array out of the tiles surrounding the player so that the function doesn't have to check collisions with every single tile, which would cause huge amounts of lag
-	new_tiles = []
-	for j in range(-1, int(PLAYER_TO_TILE_Y) + 2):
-		col = player_location_y - j
-		if col < 0 or col >= len(tiles):
-			continue
-		for i in range(-1, int(PLAYER_TO_TILE_X) + 2):
-			row = player_location_x + i
-		
-			if row < 0 or row >= len(tiles[col]):
-				continue
-			new_tiles.append(tiles[col][row])
-
-	# Checks if player is colliding with any of the tiles and moves the player appropriately
-	for tile in new_tiles:
-		if tile.colliding(player, "both"):
-			player.x -= vel
-			if tile.colliding(player, "both") and grav != 0:
-					while tile.colliding(player, "y"):
-						player.y += grav/abs(grav)
-					if grav/abs(grav) == -1:
-						y_collision = True
-					grav = 0
-			player.x += vel
-			
-			player.y += grav
-			if tile.colliding(player, "both") and vel != 0:
-					while tile.colliding(player, "x"):
-						player.x -= vel/abs(vel)
-					vel = 0
-			player.y -= grav
-			
+	# Moves the player out of any solid tiles it moved into, working out where it touches them from the room's grid of solid tiles
+	grav, vel, y_collision = grid.collide(player, grav, vel)
+
 	# Returns any information the function may have changed
-	return (player, grav, vel, y_collision, current_level, tile_count_x, tile_size, tiles, tile_screen)
+	return (player, grav, vel, y_collision, current_level, tile_count_x, tile_size, grid, tile_screen)
 
 # This function draws the player and tiles to the screen
 def draw_screen(player, tile_screen):
@@ -168,18 +127,8 @@ def draw_screen(player, tile_screen):
 
 # This function constructs the screen the tile configuration is saved on. This avoids the lag of redrawing every single tile 60 times a second
 def construct_tiles(level, starting = False):
-	# Reads the level layout from the levels file
-	with open("levels.txt", "r") as levels_text:
-		levels = levels_text.read()
-	all_levels = levels.split("|")
-	for row_index, row in enumerate(all_levels):
-		all_levels[row_index] = row.split("-")
-
-	# Gets the level the function is drawing
-	current_level_tiles = all_levels[level[0]][level[1]]
-
-	# Split the level file into each row
-	split_tiles = current_level_tiles.split("/")
+	# Reads just the level the function is drawing from the level pack, split into each row
+	split_tiles = LEVELS.room(level)
 
 	tile_count_x = len(split_tiles[0])
 	tile_size = WIDTH/tile_count_x
@@ -207,85 +156,155 @@ def construct_tiles(level, starting = False):
 			if tile.type != "Z":
 				tile.draw(tile_screen)
 
+	grid = tile_grid.TileGrid(split_tiles, len(tiles), tile_size, HEIGHT) # Which tiles are solid, for collisions
+
 	# Checks if the function also needs to set the player size, which it does when it's first called
 	if starting:
 		player_width, player_height = tile_size * PLAYER_TO_TILE_X, tile_size * PLAYER_TO_TILE_Y
 
 	# Return player information if necessary
 	if starting:
-		return (tile_count_x, tile_size, tiles, tile_screen, player_width, player_height, all_levels)
-	return (tile_count_x, tile_size, tiles, tile_screen)
+		return (tile_count_x, tile_size, grid, tile_screen, player_width, player_height, LEVELS)
+	return (tile_count_x, tile_size, grid, tile_screen)
 
+ROOMS = room_cache.RoomCache(construct_tiles) # Rooms that have already been built, so moving into one doesn't have to build it on that frame
 
-# The main game loop
-def main():
-	current_level = [0, 0] # Sets the level to start on (in this case, the top-left)
-	clock = pygame.time.Clock()
+# Returns the rooms next to a level that the player can move into
+def neighbours(level):
+	row, column = level
+	for next_row, next_column in ((row, column - 1), (row, column + 1), (row - 1, column), (row + 1, column)):
+		if 0 <= next_row < LEVELS.rows and 0 <= next_column < LEVELS.room_count(next_row):
+			yield (next_row, next_column)
 
-	tile_count_x, tile_size, tiles, tile_screen, player_width, player_height, all_levels = construct_tiles(current_level, True) # Gets information about the player and tiles
+# Returns the built room for a level, which is usually already built, and starts building the rooms next to it in the background
+def enter_room(level):
+	room = ROOMS.get(level)
+	ROOMS.prefetch(neighbours(level))
+	return room
 
-	vel_peak = RUN_PEAK # Sets the players maximum horizontal speed
-	y_collision = False # The player is not colliding with an object right now
-	grav, vel = 0, 0 # Sets the player's horizontal and vertical speed to 0
+
+# Allows the user to quit the game either by closing it manually or by pressing "q". Returns the keys being held
+def check_quit():
+	for event in pygame.event.get():
+		if event.type == pygame.QUIT:
+			pygame.quit()
+			quit()
+	keys = pygame.key.get_pressed()
+	if keys[pygame.K_q]:
+		pygame.quit()
+		quit()
+	return keys
+
+# Speeds the player up, slows it down and makes it jump according to the keys being held, then moves it. Returns the player's new vertical and horizontal speed
+def move_player(keys, player, grav, vel, y_collision, tile_size):
+	# Allows user control of the player by checking which keys have been pressed and performing the appropriate actions
+	if keys[pygame.K_LCTRL]:
+		vel_peak = SPRINT_PEAK
+	else:
+		vel_peak = RUN_PEAK
+	if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+		if vel >= -vel_peak + DIRECTION_SWAP_SPEED:
+			vel -= DIRECTION_SWAP_SPEED
+		else:
+			vel = -vel_peak
+	if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+		if vel <= vel_peak - DIRECTION_SWAP_SPEED:
+			vel += DIRECTION_SWAP_SPEED
+		else:
+			vel = vel_peak
+	if (keys[pygame.K_UP] or keys[pygame.K_w]) and y_collision:
+		grav = JUMP_HEIGHT
+
+	# Controls the acceleration of gravity
+	grav -= 0.4
+	if grav < -tile_size:
+		grav = -tile_size
+
+	# Applies friction to the player, which stops the player if they're not moving
+	if abs(vel) == vel:
+		vel -= 0.4
+	else:
+		vel += 0.4
+
+	# Change the player's actual position based on their horizontal and vertical speed
+	player.x += vel
+	player.y -= grav
+	return grav, vel
+
+
+# Builds the room the game starts in and puts the player in the middle of it. Returns the player and everything about the room
+def start_game(current_level):
+	tile_count_x, tile_size, grid, tile_screen, player_width, player_height, all_levels = construct_tiles(current_level, True) # Gets information about the player and tiles
+	ROOMS.store(tuple(current_level), (tile_count_x, tile_size, grid, tile_screen))
+	ROOMS.prefetch(neighbours(current_level)) # Starts building the rooms the player could move into next
 
 	player = pygame.Rect( # Create the player object
 		WIDTH/2 - player_width/2, HEIGHT/2 - player_height/2,
 		player_width, player_height
 	)
+	return player, tile_count_x, tile_size, grid, tile_screen, all_levels
 
-	while True:
-		clock.tick(60) # Set the ticks per second of the game, which controls how often everything inside this while loop is run
-		
-		# Allows the user to quit the game either by closing it manually or by pressing "q"
-		for event in pygame.event.get():
-			if event.type == pygame.QUIT:
-				pygame.quit()
-				quit()
-		keys = pygame.key.get_pressed()
-		if keys[pygame.K_q]:
-			pygame.quit()
-			quit()
 
+# The main game loop. If a key_trace.Recorder is given, the keys held on every tick are recorded to it, so the run can be played back with replay.py
+def main(recorder = None):
+	current_level = [0, 0] # Sets the level to start on (in this case, the top-left)
+	clock = pygame.time.Clock()
 
-		# Allows user control of the player by checking which keys have been pressed and performing the appropriate actions
-		if keys[pygame.K_LCTRL]:
-			vel_peak = SPRINT_PEAK
-		else:
-			vel_peak = RUN_PEAK
-		if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-			if vel >= -vel_peak + DIRECTION_SWAP_SPEED:
-				vel -= DIRECTION_SWAP_SPEED
-			else:
-				vel = -vel_peak
-		if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-			if vel <= vel_peak - DIRECTION_SWAP_SPEED:
-				vel += DIRECTION_SWAP_SPEED
-			else:
-				vel = vel_peak
-		if (keys[pygame.K_UP] or keys[pygame.K_w]) and y_collision:
-			grav = JUMP_HEIGHT
-
-
-		# Controls the acceleration of gravity
-		grav -= 0.4
-		if grav < -tile_size:
-			grav = -tile_size
-
-		# Applies friction to the player, which stops the player if they're not moving
-		if abs(vel) == vel:
-			vel -= 0.4
-		else:
-			vel += 0.4
+	player, tile_count_x, tile_size, grid, tile_screen, all_levels = start_game(current_level)
 
-		# Change the player's actual position based on their horizontal and vertical speed
-		player.x += vel
-		player.y -= grav
+	y_collision = False # The player is not colliding with an object right now
+	grav, vel = 0, 0 # Sets the player's horizontal and vertical speed to 0
+
+	try:
+		while True:
+			clock.tick(60) # Set the ticks per second of the game, which controls how often everything inside this while loop is run
+
+			keys = check_quit() # Allows the user to quit the game either by closing it manually or by pressing "q"
+			if recorder is not None:
+				recorder.record(keys)
 
-		# Collide the player with the tiles and switch levels if necessart
-		player, grav, vel, y_collision, current_level, tile_count_x, tile_size, tiles, tile_screen = collideplayer(player, tiles, grav, vel, current_level, all_levels, tile_count_x, tile_size, tile_screen)
-		
-		# Draws the player and the tiles to the screen
-		draw_screen(player, tile_screen)
+			grav, vel = move_player(keys, player, grav, vel, y_collision, tile_size) # Moves the player with the keys being held
+
+			# Collide the player with the tiles and switch levels if necessart
+			player, grav, vel, y_collision, current_level, tile_count_x, tile_size, grid, tile_screen = collideplayer(player, grid, grav, vel, current_level, all_levels, tile_count_x, tile_size, tile_screen)
+			
+			# Draws the player and the tiles to the screen
+			draw_screen(player, tile_screen)
+	finally: # Quitting ends the game by raising SystemExit, so the recording is saved here
+		if recorder is not None:
+			recorder.save()
 
 
-main() # Runs the main game loop
+# The game loop of the scrolling world, where every room is joined into one world and the screen follows the player
+def scroll_main():
+	clock = pygame.time.Clock()
+	tile_size = round(WIDTH/len(LEVELS.room((0, 0))[0])) # Tiles are the same size as in the rooms, rounded to a whole pixel so the chunks line up
+	scrolling_world = world.World(LEVELS, tile_size, TILE_IMAGES, ASSETS, (WIDTH, HEIGHT))
+
+	y_collision = False
+	grav, vel = 0, 0
+	player_width, player_height = tile_size * PLAYER_TO_TILE_X, tile_size * PLAYER_TO_TILE_Y
+	player = pygame.Rect(WIDTH/2 - player_width/2, HEIGHT/2 - player_height/2, player_width, player_height) # Starts in the middle of the top-left room, like in main()
+
+	while True:
+		clock.tick(60)
+		keys = check_quit()
+		grav, vel = move_player(keys, player, grav, vel, y_collision, tile_size)
+		grav, vel, y_collision = scrolling_world.collide(player, grav, vel)
+
+		camera = scrolling_world.camera(player)
+		WIN.fill("black")
+		scrolling_world.draw(WIN, camera)
+		pygame.draw.rect(WIN, PLAYER_COLOR, player.move(-camera[0], -camera[1]))
+		pygame.display.update()
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "A tile platformer")
+	parser.add_argument("--scroll", action = "store_true", help = "join every room into one world that scrolls with the player, instead of moving between rooms a screen at a time")
+	parser.add_argument("--record", metavar = "TRACE", help = "record the keys held on every tick to a trace file, which replay.py can play back without a window")
+	args = parser.parse_args()
+	if args.scroll:
+		scroll_main()
+	else:
+		main(key_trace.Recorder(os.path.abspath(os.path.join(START_FOLDER, args.record))) if args.record else None) # Runs the main game loop
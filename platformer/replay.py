@@ -0,0 +1,116 @@
+# Plays key traces (see key_trace.py) through the platformer's physics without a window, using SDL's dummy driver.
+# Every tick runs move_player() and collideplayer() the way main() does, but nothing is drawn and ticks aren't held to 60 a second unless --paced is given, so this times the physics on its own.
+# The state the player ends in is compared with a golden file next to each trace, so any change to the physics that moves the player somewhere different is caught.
+# Usage: python replay.py [TRACE ...] [--runs 5] [--paced] [--update]
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+from time import perf_counter
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # SDL's dummy driver renders to memory instead of opening a window. This must be set before pygame is imported
+import pygame
+import platformer as game
+import key_trace
+import room_cache
+
+SCREEN = (1920, 1080) # The player's speeds are worked out from the screen size, so traces are always played on a screen of this size
+TRACE_FOLDER = "traces" # Where the traces played when none are given are kept
+
+
+# Returns the path of the golden file of a trace
+def golden_path(trace_path):
+	return os.path.splitext(trace_path)[0] + ".golden.json"
+
+# Plays the keys of each tick of a trace from the start of the game. Returns the state the player ends in, and the times taken
+def play(ticks, paced = False):
+	game.ROOMS = room_cache.RoomCache(game.construct_tiles) # Every run starts with no rooms built, like starting the game does
+	current_level = [0, 0]
+	player, tile_count_x, tile_size, grid, tile_screen, all_levels = game.start_game(current_level)
+	y_collision = False
+	grav, vel = 0, 0
+
+	transitions = [] # The tick, the room entered, the seconds the tick took and how the room cache found the room, for each room change
+	tick_time = 0 # The seconds spent on ticks that didn't change room
+	for tick, keys in enumerate(ticks):
+		start = perf_counter()
+		level = tuple(current_level)
+		counts = (game.ROOMS.waits, game.ROOMS.misses, game.ROOMS.hits)
+		grav, vel = game.move_player(keys, player, grav, vel, y_collision, tile_size)
+		player, grav, vel, y_collision, current_level, tile_count_x, tile_size, grid, tile_screen = game.collideplayer(player, grid, grav, vel, current_level, all_levels, tile_count_x, tile_size, tile_screen)
+		elapsed = perf_counter() - start
+		if tuple(current_level) != level:
+			found = ("wait", "miss", "hit")[[new > old for new, old in zip((game.ROOMS.waits, game.ROOMS.misses, game.ROOMS.hits), counts)].index(True)] # A room waited for is counted as a hit too once it's built
+			transitions.append((tick, tuple(current_level), elapsed, found))
+		else:
+			tick_time += elapsed
+		if paced:
+			time.sleep(max(1/60 - elapsed, 0)) # Gives the background thread the time between ticks to build the next rooms, like the game does
+	game.ROOMS.wait() # The level pack has to stay open until the background thread is done with it
+
+	state = {
+		"screen": list(SCREEN),
+		"ticks": len(ticks),
+		"level": list(current_level),
+		"player": list(player),
+		"grav": grav,
+		"vel": vel,
+		"landed": y_collision,
+		"rooms": [[tick, list(level)] for tick, level, _, _ in transitions], # The tick each room was entered on
+	}
+	return state, tick_time, transitions
+
+# Plays a trace a number of times, prints how fast the ticks ran and what each room change cost, and checks the end state against the trace's golden file.
+# If update is True, the golden file is written instead. Returns False if the end state doesn't match
+def replay(trace_path, runs, paced, update):
+	ticks = key_trace.read_trace(trace_path)
+	results = [play(ticks, paced) for _ in range(runs)]
+	state, _, transitions = results[-1] # Rooms are built from scratch on every run, but images are only scaled on the first, so the last run is the one shown
+	steady_ticks = len(ticks) - len(transitions)
+	rates = [steady_ticks/tick_time for _, tick_time, _ in results if tick_time]
+
+	print(f"{trace_path}: {len(ticks)} ticks, {len(transitions)} room changes")
+	if rates:
+		print(f"  {statistics.median(rates):,.0f} ticks/s median, {max(rates):,.0f} best over {runs} runs ({1000000/statistics.median(rates):.1f} us a tick)")
+	for tick, level, elapsed, found in transitions:
+		print(f"  tick {tick:>6}: entered room {level[0]}, {level[1]} in {1000*elapsed:7.3f} ms ({found})")
+	if any(result[0] != state for result in results):
+		print("  Runs of the same trace ended in different states")
+		return False
+
+	path = golden_path(trace_path)
+	if update:
+		with open(path, "w") as golden_file:
+			json.dump(state, golden_file, indent = "\t")
+			golden_file.write("\n")
+		print(f"  Wrote {path}")
+		return True
+	if not os.path.exists(path):
+		print(f"  No golden file at {path}. Run with --update to write one")
+		return False
+	with open(path, "r") as golden_file:
+		golden = json.load(golden_file)
+	differences = [name for name in golden.keys() | state.keys() if golden.get(name) != state.get(name)]
+	for name in sorted(differences):
+		print(f"  {name} is {state.get(name)}, but the golden file has {golden.get(name)}")
+	print(f"  {'Matches' if not differences else 'Does not match'} {path}")
+	return not differences
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Play key traces through the platformer's physics without a window")
+	parser.add_argument("traces", nargs = "*", help = f"trace files to play (every .trace file in {TRACE_FOLDER} if none are given)")
+	parser.add_argument("--runs", type = int, default = 5, help = "times to play each trace")
+	parser.add_argument("--paced", action = "store_true", help = "hold ticks to 60 a second like the game, so room changes cost what they would in the game")
+	parser.add_argument("--update", action = "store_true", help = "write each trace's golden file from how it ends now, instead of checking against it")
+	args = parser.parse_args()
+
+	traces = [os.path.abspath(os.path.join(game.START_FOLDER, path)) for path in args.traces] or sorted(glob.glob(os.path.join(TRACE_FOLDER, "*.trace")))
+	pygame.display.quit() # The dummy driver keeps the size of the fullscreen window the game opened, unless the display is started again
+	pygame.display.init()
+	game.set_screen(pygame.display.set_mode(SCREEN))
+	matched = [replay(path, args.runs, args.paced, args.update) for path in traces]
+	game.LEVELS.close()
+	raise SystemExit(0 if all(matched) else 1)
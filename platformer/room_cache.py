@@ -0,0 +1,85 @@
+# Keeps the most recently used rooms built, and builds the rooms next to the player's room on a background thread before the player reaches them.
+# Building a room means creating all of its tiles and drawing its tile screen, which takes long enough to make the game stutter if it happens on the frame the player walks into the room.
+
+import queue
+import threading
+import traceback
+from collections import OrderedDict
+
+MAX_ROOMS = 8 # The most built rooms kept at once. Each one holds a full-screen tile screen, so this is 8 screens' worth of memory (about 64 MB at 1920x1080)
+
+
+class RoomCache:
+	def __init__(self, build, max_rooms = MAX_ROOMS):
+		self.build = build # A function that takes a level ([row, column]) and returns its built room
+		self.max_rooms = max_rooms
+		self.rooms = OrderedDict() # Maps (row, column) to its built room. Ordered from least to most recently used
+		self.building = set() # Rooms queued for or being built by the background thread
+		self.lock = threading.Condition() # Guards rooms and building, and is notified whenever the background thread finishes a room
+		self.queue = queue.Queue() # Rooms for the background thread to build
+		self.thread = threading.Thread(target = self.build_rooms, daemon = True)
+		self.thread.start()
+
+		# Counters for checking how well the cache is working
+		self.hits = 0 # Rooms that were already built when they were needed
+		self.waits = 0 # Rooms that were still being built on the background thread when they were needed
+		self.misses = 0 # Rooms that had to be built on the spot
+		self.failures = 0 # Rooms the background thread failed to build
+
+	# Returns the built room for a level, building it now if it hasn't been built already
+	def get(self, level):
+		key = tuple(level)
+		with self.lock:
+			if key not in self.rooms and key in self.building:
+				self.waits += 1
+				while key not in self.rooms and key in self.building: # Waiting for it avoids building the room twice at once
+					self.lock.wait()
+			room = self.rooms.get(key)
+			if room is not None:
+				self.rooms.move_to_end(key)
+				self.hits += 1
+				return room
+			self.misses += 1
+		room = self.build(list(key))
+		self.store(key, room)
+		return room
+
+	# Queues rooms to be built on the background thread, skipping any already built or queued
+	def prefetch(self, levels):
+		with self.lock:
+			for level in levels:
+				key = tuple(level)
+				if key in self.rooms:
+					self.rooms.move_to_end(key) # A room about to be needed shouldn't be the next one thrown away
+				elif key not in self.building:
+					self.building.add(key)
+					self.queue.put(key)
+
+	# Waits until the background thread has built every queued room
+	def wait(self):
+		self.queue.join()
+
+	def store(self, key, room):
+		with self.lock:
+			self.rooms[key] = room
+			self.rooms.move_to_end(key)
+			while len(self.rooms) > self.max_rooms:
+				self.rooms.popitem(last = False)
+
+	# Runs on the background thread, building each queued room.
+	# A room that fails to build is left unbuilt, so get() builds it on the spot and the error is raised in the game's thread, instead of this thread stopping and leaving every room queued after it waited on forever
+	def build_rooms(self):
+		while True:
+			key = self.queue.get()
+			try:
+				room = self.build(list(key))
+				self.store(key, room)
+			except Exception:
+				self.failures += 1
+				print(f"Couldn't build room {key} in the background:")
+				traceback.print_exc()
+			finally:
+				with self.lock:
+					self.building.discard(key)
+					self.lock.notify_all()
+				self.queue.task_done()
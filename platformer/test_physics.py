@@ -0,0 +1,34 @@
+# Checks that the platformer's collisions against the room's grid of solid tiles move the player exactly like the old collision code did.
+# Run with: python -m unittest (from the platformer folder). The timings of the same comparison are in benchmark.py --physics
+
+import unittest
+import benchmark # Sets up the platformer on a 1920x1080 screen with SDL's dummy driver
+import level_pack
+game = benchmark.game
+
+TICKS = 240 # Ticks played from each starting point
+
+
+class PhysicsTest(unittest.TestCase):
+	# Drops, walks and jumps the player from starting points a tile apart in every room of levels.txt with the old and the new collision code.
+	# Both must put the player in the same place with the same speeds on every tick, so it lands on floors and stops at walls in the same places
+	def test_tile_grid_matches_old_collisions(self):
+		pack = level_pack.load()
+		self.addCleanup(pack.close)
+		runs = 0
+		for level, tiles, grid, tile_size, start, keys in benchmark.physics_runs(pack, step = 1):
+			runs += 1
+			old_player, new_player = start.copy(), start.copy()
+			old_state = new_state = (0, 0, False)
+			for tick in range(1, TICKS + 1):
+				old_state = benchmark.physics_tick(old_player, *old_state, keys, tile_size, lambda player, grav, vel: benchmark.old_collide(player, tiles, grav, vel, tile_size))
+				new_state = benchmark.physics_tick(new_player, *new_state, keys, tile_size, grid.collide)
+				if (old_player, old_state) != (new_player, new_state):
+					self.fail(f"Room {level[0]}, {level[1]} from {tuple(start[:2])} holding {keys.letters or 'nothing'}: on tick {tick} the old code has the player at {tuple(old_player)} with {old_state}, the tile grid at {tuple(new_player)} with {new_state}")
+				if not old_player.colliderect(game.WIN.get_rect()):
+					break # Left the room
+		self.assertGreater(runs, 0)
+
+
+if __name__ == "__main__":
+	unittest.main()
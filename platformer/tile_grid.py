@@ -0,0 +1,100 @@
+# Stores which tiles of a room are solid in one byte per tile, and moves the player out of solid tiles by working out where they touch instead of stepping a pixel at a time.
+# Collisions are resolved the way the platformer always has: the vertical move is checked against the tiles the player overlaps at both its old and new x, which lands the player on floors and stops it on ceilings,
+# then the horizontal move is checked against the tiles the player overlaps at both its old and new y, which stops the player at walls.
+# Finding the tiles the player overlaps is a lookup in a table of every pixel position, so no tile is looked at unless the player's edges have reached it.
+
+import math
+
+SOLID, EMPTY = 1, 0
+
+
+# Finds the tiles along one axis of a room that overlap a space, for any space given in whole pixels.
+# The tables cover one room's width (or height) of space past each side of the room, which is further than the player can get before moving to the next room
+class Axis:
+	def __init__(self, edges, tile_size):
+		self.edges = edges # The position of the start of each tile
+		padding = math.ceil(len(edges)*tile_size)
+		self.start = edges[0] - padding # The position of the first entry of each table
+		end = math.ceil(edges[-1] + tile_size) + padding
+
+		self.firsts, self.lasts = [], [] # For each pixel, the first tile that ends after it and the last tile that starts before it
+		ended, started = 0, 0
+		for position in range(self.start, end + 1):
+			while ended < len(edges) and edges[ended] + tile_size <= position:
+				ended += 1
+			while started < len(edges) and edges[started] < position:
+				started += 1
+			self.firsts.append(ended)
+			self.lasts.append(started - 1)
+		every_tile = (1 << len(edges)) - 1
+		self.from_masks = [every_tile & ~((1 << first) - 1) for first in self.firsts] # For each pixel, a bit for each tile from firsts onwards
+		self.to_masks = [(1 << (last + 1)) - 1 for last in self.lasts] # For each pixel, a bit for each tile up to lasts
+
+
+class TileGrid:
+	# split_tiles lists the tile types of each row, bottom row first. The bottom row ends at height and the first column starts at left
+	def __init__(self, split_tiles, row_count, tile_size, height, left = 0):
+		self.tile_size = tile_size
+		self.columns = len(split_tiles[0])
+		self.rows = row_count
+		self.x = Axis([round(left + tile_size*i) for i in range(self.columns)], tile_size) # The left edge of each column
+		self.y = Axis([round(height - tile_size*(self.rows - k)) for k in range(self.rows)], tile_size) # The top edge of each row, top row first
+
+		self.solid = bytearray(self.columns*self.rows) # SOLID or EMPTY for each tile, row by row from the top row down
+		for k in range(self.rows):
+			for i, tile_type in enumerate(split_tiles[self.rows - 1 - k]): # The levels file lists rows bottom row first
+				if tile_type != "Z":
+					self.solid[k*self.columns + i] = SOLID
+		self.row_masks = [sum(self.solid[k*self.columns + i] << i for i in range(self.columns)) for k in range(self.rows)] # A bit for each solid tile of each row
+		self.column_masks = [sum(self.solid[k*self.columns + i] << k for k in range(self.rows)) for i in range(self.columns)] # A bit for each solid tile of each column
+
+	# Moves the player, which has just moved vel pixels right and grav pixels up, out of any solid tiles it moved into.
+	# Returns the new grav and vel, which are 0 if the player hit something in that direction, and whether the player landed on a floor
+	def collide(self, player, grav, vel):
+		x, y, width, height = player
+		landed = False
+		if grav != 0:
+			columns, rows = self.x, self.y
+			old_x = x - vel
+			old_x = int(old_x + 0.5) if old_x >= 0 else -int(0.5 - old_x) # Rounded the way pygame.Rect rounds
+			low, high = max(old_x, x) - columns.start, min(old_x, x) + width - columns.start # The space the player covers at both its old and new x
+			column_mask = columns.from_masks[low] & columns.to_masks[high]
+			if column_mask:
+				first_row, last_row = rows.firsts[y - rows.start], rows.lasts[y + height - rows.start]
+				row_masks = self.row_masks
+				if grav < 0: # Falling, so the player lands on top of the highest solid tile it reached
+					for k in range(first_row, last_row + 1):
+						if row_masks[k] & column_mask:
+							y = player.y = rows.edges[k] - height
+							landed = True
+							grav = 0
+							break
+				else: # Rising, so the player's head stops under the lowest solid tile it reached
+					for k in range(last_row, first_row - 1, -1):
+						if row_masks[k] & column_mask:
+							y = player.y = math.ceil(rows.edges[k] + self.tile_size)
+							grav = 0
+							break
+
+		if vel != 0:
+			columns, rows = self.x, self.y
+			old_y = y + grav
+			old_y = int(old_y + 0.5) if old_y >= 0 else -int(0.5 - old_y)
+			low, high = max(old_y, y) - rows.start, min(old_y, y) + height - rows.start # The space the player covers at both its old and new y
+			row_mask = rows.from_masks[low] & rows.to_masks[high]
+			if row_mask:
+				first_column, last_column = columns.firsts[x - columns.start], columns.lasts[x + width - columns.start]
+				column_masks = self.column_masks
+				if vel > 0: # Moving right, so the player stops against the leftmost solid tile it reached
+					for i in range(first_column, last_column + 1):
+						if column_masks[i] & row_mask:
+							player.x = columns.edges[i] - width
+							vel = 0
+							break
+				else: # Moving left, so the player stops against the rightmost solid tile it reached
+					for i in range(last_column, first_column - 1, -1):
+						if column_masks[i] & row_mask:
+							player.x = math.ceil(columns.edges[i] + self.tile_size)
+							vel = 0
+							break
+		return grav, vel, landed
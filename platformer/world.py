@@ -0,0 +1,118 @@
+# Joins every room of the level pack into one big world that scrolls with the player, instead of a screen of fixed rooms.
+# The world is split into chunks of CHUNK_TILES by CHUNK_TILES tiles. Only the chunks on or next to the screen are drawn, each onto its own small surface on a background thread,
+# and a fixed number of them are kept, so the memory used is the same however big the world is.
+
+import math
+import pygame
+import room_cache
+import tile_grid
+
+CHUNK_TILES = 8 # The width and height of a chunk, in tiles
+PREFETCH_CHUNKS = 1 # Chunks up to this many chunks past the edges of the screen are drawn in the background, before they scroll onscreen
+EDGE_TILE = "a" # Everything outside the world is solid, so the player can't leave it
+
+
+class World:
+	def __init__(self, levels, tile_size, tile_images, assets, screen_size):
+		self.levels = levels # A level_pack.LevelPack. Each room is placed next to the rooms beside it in the pack
+		self.tile_size = tile_size # The width and height of a tile in pixels. A whole number, so chunks line up without gaps
+		self.tile_images = tile_images # Maps each tile type to the path of its image
+		self.assets = assets
+		self.screen_width, self.screen_height = screen_size
+
+		first_room = levels.room((0, 0))
+		self.room_columns, self.room_rows = len(first_room[0]), len(first_room) # Every room is the same size as the first one
+		self.columns = max(levels.room_count(row) for row in range(levels.rows))*self.room_columns
+		self.rows = levels.rows*self.room_rows
+		self.width, self.height = self.columns*tile_size, self.rows*tile_size # The size of the world in pixels
+		self.chunk_size = CHUNK_TILES*tile_size # The width and height of a chunk in pixels
+
+		# Enough chunks to cover the screen wherever it is, plus the chunks being drawn in the background around it
+		chunks_x = math.ceil(self.screen_width/self.chunk_size) + 1 + 2*PREFETCH_CHUNKS
+		chunks_y = math.ceil(self.screen_height/self.chunk_size) + 1 + 2*PREFETCH_CHUNKS
+		self.chunks = room_cache.RoomCache(self.build_chunk, chunks_x*chunks_y) # The surface of each chunk
+		self.grids = room_cache.RoomCache(self.build_grid, 9) # The solid tiles around the chunk the player is in and the chunks next to it, for collisions
+		self.drawn_range = None # The chunks the last frame drew, so the chunks around them are only queued when the screen reaches another chunk
+		self.player_chunk = None # The chunk the player was in on the last tick
+
+	# Returns the tile types of a rectangle of the world, as a string for each row of tiles from the top row down
+	def tile_rows(self, left, top, columns, rows):
+		lines = [[] for _ in range(rows)]
+		rooms = {} # Each room is only read from the pack once
+		x = left
+		while x < left + columns:
+			room_column, offset = divmod(x, self.room_columns)
+			width = min(self.room_columns - offset, left + columns - x) # The part of the rectangle inside this column of rooms
+			for i, line in enumerate(lines):
+				room_row, tile_row = divmod(top + i, self.room_rows)
+				key = (room_row, room_column)
+				if key not in rooms:
+					inside = 0 <= x < self.columns and 0 <= room_row < self.levels.rows and room_column < self.levels.room_count(room_row)
+					rooms[key] = self.levels.room(key) if inside else None
+				room = rooms[key]
+				line.append(room[self.room_rows - 1 - tile_row][offset:offset + width] if room is not None else EDGE_TILE*width) # Rooms list their rows bottom row first
+			x += width
+		return ["".join(line) for line in lines]
+
+	# Draws the tiles of a chunk onto a surface of their own
+	def build_chunk(self, chunk):
+		chunk_x, chunk_y = chunk
+		rows = self.tile_rows(chunk_x*CHUNK_TILES, chunk_y*CHUNK_TILES, CHUNK_TILES, CHUNK_TILES)
+		surface = pygame.Surface((self.chunk_size, self.chunk_size))
+		if pygame.display.get_surface() is not None:
+			surface = surface.convert() # Match the screen's pixel format so drawing the chunk every frame doesn't have to convert it
+		size = (self.tile_size, self.tile_size)
+		for background in (True, False): # The background goes under everything else, like in a room
+			for j, row in enumerate(rows):
+				for i, tile_type in enumerate(row):
+					if (tile_type == "Z") == background:
+						surface.blit(self.assets.scaled(self.tile_images[tile_type], size), (i*self.tile_size, j*self.tile_size))
+		return surface
+
+	# Returns a grid of the solid tiles of a chunk and every chunk next to it. The player is always inside it while they are in the middle chunk
+	def build_grid(self, chunk):
+		chunk_x, chunk_y = chunk
+		rows = self.tile_rows((chunk_x - 1)*CHUNK_TILES, (chunk_y - 1)*CHUNK_TILES, 3*CHUNK_TILES, 3*CHUNK_TILES)
+		rows.reverse() # The grid takes the bottom row first
+		return tile_grid.TileGrid(rows, len(rows), self.tile_size, (chunk_y + 2)*self.chunk_size, (chunk_x - 1)*self.chunk_size)
+
+	# Returns the chunk a position in the world is in
+	def chunk_at(self, x, y):
+		return (int(x//self.chunk_size), int(y//self.chunk_size))
+
+	# Moves the player out of any solid tiles it moved into, like TileGrid.collide()
+	def collide(self, player, grav, vel):
+		chunk = self.chunk_at(*player.center)
+		grid = self.grids.get(chunk)
+		if chunk != self.player_chunk:
+			self.player_chunk = chunk
+			self.grids.prefetch((chunk[0] + i, chunk[1] + j) for i in (-1, 0, 1) for j in (-1, 0, 1) if i or j)
+		return grid.collide(player, grav, vel)
+
+	# Returns the position of the top left of the screen in the world, which keeps the player in the middle of the screen without showing anything past the edges of the world
+	def camera(self, player):
+		x = min(max(player.centerx - self.screen_width//2, 0), max(self.width - self.screen_width, 0))
+		y = min(max(player.centery - self.screen_height//2, 0), max(self.height - self.screen_height, 0))
+		return x, y
+
+	# Draws the part of the world the camera can see onto a surface, and queues the chunks around it to be drawn in the background
+	def draw(self, surface, camera):
+		first_x, first_y = self.chunk_at(*camera)
+		last_x, last_y = self.chunk_at(camera[0] + self.screen_width - 1, camera[1] + self.screen_height - 1)
+		for chunk_y in range(first_y, last_y + 1):
+			for chunk_x in range(first_x, last_x + 1):
+				surface.blit(self.chunks.get((chunk_x, chunk_y)), (chunk_x*self.chunk_size - camera[0], chunk_y*self.chunk_size - camera[1]))
+
+		drawn_range = (first_x, first_y, last_x, last_y)
+		if drawn_range != self.drawn_range:
+			self.drawn_range = drawn_range
+			self.chunks.prefetch(
+				(chunk_x, chunk_y)
+				for chunk_y in range(first_y - PREFETCH_CHUNKS, last_y + PREFETCH_CHUNKS + 1)
+				for chunk_x in range(first_x - PREFETCH_CHUNKS, last_x + PREFETCH_CHUNKS + 1)
+				if not (first_x <= chunk_x <= last_x and first_y <= chunk_y <= last_y) and 0 <= chunk_x*self.chunk_size < self.width and 0 <= chunk_y*self.chunk_size < self.height
+			)
+
+	# Returns the bytes used by the pixels of every chunk surface being kept
+	def chunk_bytes(self):
+		return sum(chunk.get_bytesize()*chunk.get_width()*chunk.get_height() for chunk in list(self.chunks.rooms.values()))